@@ -1,27 +1,76 @@
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response, g
 from dotenv import load_dotenv
 import os
 import json
+import math
 import time
 from datetime import datetime
 
+from src.application.batch import BatchProcessor
+from src.application.fan_out import FanOutExecutor
+from src.application.recorder import RequestRecorder
+from src.application.retention import RetentionJob
+from src.application.router import ModelRouter, RouteCandidate
+from src.application.single_flight import SingleFlight, SharedStreams
+from src.infrastructure.database import DatabaseManager
+from src.infrastructure.metrics import (REGISTRY, HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT,
+                                        PROVIDER_LATENCY, PROVIDER_TTFT, PROVIDER_TOKEN_RATE,
+                                        latency_summary)
+from src.infrastructure.model_registry import ModelRegistry
+from src.infrastructure.rate_limiter import RateLimitGovernor
+from src.infrastructure.resilience import ResilienceLayer
+from src.infrastructure.response_cache import ResponseCache
+from src.infrastructure.token_usage import UsageTracker, blended_price, cached_usage
+from src.infrastructure.write_behind import WriteBehindQueue
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Import de la base de données
+# Base de données et file d'écriture différée
 try:
-    from src.infrastructure.database import DatabaseManager
     db_manager = DatabaseManager()
+    # Écritures différées : les requêtes n'attendent plus le disque
+    write_queue = WriteBehindQueue(db_manager)
     DB_AVAILABLE = True
 except Exception as e:
     print(f"Base de données non disponible: {e}")
     db_manager = None
+    write_queue = None
     DB_AVAILABLE = False
 
+# Cache des réponses IA partagé par les trois clients
+response_cache = ResponseCache() if os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true' else None
+
+# Cache sémantique des prompts quasi identiques (optionnel, nécessite numpy)
+semantic_cache = None
+if os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true':
+    try:
+        from src.infrastructure.semantic_cache import SemanticCache
+        semantic_cache = SemanticCache()
+    except Exception as e:
+        print(f"Cache sémantique non disponible: {e}")
+
+# Gouverneur de débit : limite adaptative par fournisseur/modèle, 429 remis en file
+governor = RateLimitGovernor() if os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true' else None
+
+# Résilience : nouvelles tentatives, requêtes couvertes et disjoncteur par fournisseur
+resilience = ResilienceLayer() if os.getenv('RESILIENCE_ENABLED', 'true').lower() == 'true' else None
+
+# Comptabilité des tokens et des dépenses, budgets quotidiens par fournisseur
+usage_tracker = UsageTracker()
+if DB_AVAILABLE:
+    try:
+        # Reprendre les dépenses du jour déjà enregistrées (Claude est enregistré sous « claude »)
+        usage_tracker.seed({('anthropic' if provider == 'claude' else provider): cost
+                            for provider, cost in db_manager.get_daily_costs().items()})
+    except Exception as e:
+        print(f"Erreur lors de la reprise des dépenses du jour: {e}")
+
 # Import des clients IA
 try:
     from src.infrastructure.openai_client import OpenAIClient
-    openai_client = OpenAIClient()
+    openai_client = OpenAIClient(cache=response_cache, governor=governor, resilience=resilience,
+                                 usage=usage_tracker)
     OPENAI_AVAILABLE = True
 except Exception as e:
     print(f"OpenAI non disponible: {e}")
@@ -30,7 +79,8 @@ except Exception as e:
 
 try:
     from src.infrastructure.claude_client import ClaudeClient
-    claude_client = ClaudeClient()
+    claude_client = ClaudeClient(cache=response_cache, governor=governor, resilience=resilience,
+                                 usage=usage_tracker)
     CLAUDE_AVAILABLE = True
 except Exception as e:
     print(f"Claude non disponible: {e}")
@@ -39,89 +89,408 @@ except Exception as e:
 
 try:
     from src.infrastructure.groq_client import GroqClient
-    groq_client = GroqClient()
+    groq_client = GroqClient(cache=response_cache, governor=governor, resilience=resilience,
+                             usage=usage_tracker)
     GROQ_AVAILABLE = True
 except Exception as e:
     print(f"Groq non disponible: {e}")
     groq_client = None
     GROQ_AVAILABLE = False
 
+# Catalogues de modèles chargés au démarrage et rafraîchis en arrière-plan
+model_registry = ModelRegistry()
+if OPENAI_AVAILABLE:
+    model_registry.register('openai', openai_client.get_available_models)
+if CLAUDE_AVAILABLE:
+    model_registry.register('claude', claude_client.get_available_models)
+if GROQ_AVAILABLE:
+    model_registry.register('groq', groq_client.get_available_models)
+model_registry.start()
+
+# Moteur d'exécution parallèle pour les comparaisons
+fan_out = FanOutExecutor()
+
+# Regroupement des requêtes identiques simultanées (un seul appel amont)
+single_flight = SingleFlight()
+shared_streams = SharedStreams()
+
+# Enregistrement de chaque requête servie (prompt, réponses, latences, tokens) via la file d'écriture
+recorder = RequestRecorder(write_queue)
+
+# Nettoyage de l'historique par lots en arrière-plan (planifié si RETENTION_INTERVAL_HOURS > 0) ;
+# avec RETENTION_ARCHIVE_DIR, les conversations sont déplacées dans une archive froide consultée en repli
+retention = None
+archive = None
+if DB_AVAILABLE:
+    retention = RetentionJob(db_manager)
+    retention.schedule()
+    archive = retention.archive
+
 app = Flask(__name__)
 
+# Jauges Prometheus calculées à chaque lecture de /metrics
+if write_queue is not None:
+    REGISTRY.gauge('db_write_queue_pending', "Enregistrements en attente d'écriture").set_function(
+        lambda: {(): write_queue.stats()['pending']})
+if resilience is not None:
+    REGISTRY.gauge('circuit_breaker_open', 'Disjoncteur ouvert (1) ou fermé (0)', ('provider',)).set_function(
+        lambda: {(provider,): float(not resilience.is_available(provider)) for provider in resilience.stats()})
+if governor is not None:
+    REGISTRY.gauge('rate_limit_concurrency', 'Limite de concurrence adaptative', ('limiter',)).set_function(
+        lambda: {(name,): limiter['concurrency_limit'] for name, limiter in governor.stats().items()})
+
+@app.before_request
+def start_request_metrics():
+    """Démarre la mesure de la requête (route = règle Flask, pour borner les étiquettes)."""
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'non_trouvee'
+    g.metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(route=g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    """Enregistre la requête à la fermeture de la réponse (fin du flux pour le SSE)."""
+    route, start, method = g.metrics_route, g.metrics_start, request.method
+    status = str(response.status_code)
+    
+    def finish():
+        HTTP_IN_FLIGHT.dec(route=route)
+        HTTP_REQUESTS.inc(route=route, method=method, status=status)
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=route, method=method)
+    
+    response.call_on_close(finish)
+    return response
+
+# Routeur multi-fournisseurs : chaîne de repli « fournisseur:modèle » par ordre de préférence
+ROUTER_CHAIN = os.getenv('ROUTER_CHAIN', 'openai:gpt-4o,claude:claude-3-5-sonnet-20241022,'
+                                         'groq:llama3-70b-8192,groq:llama3-8b-8192')
+ROUTER_DEFAULT_POLICY = os.getenv('ROUTER_DEFAULT_POLICY', 'fastest')
+
+# Modèle appelé par défaut pour chaque fournisseur
+PROVIDER_MODELS = {'openai': 'gpt-4o', 'claude': 'claude-3-5-sonnet-20241022', 'groq': 'llama3-8b-8192'}
+
+def build_route_candidate(provider: str, model: str):
+    """Crée le candidat de routage d'un fournisseur configuré (None sinon)."""
+    def generate(prompt, use_cache):
+        if provider == 'openai':
+            call = lambda: openai_client.generate_voice_response(prompt, use_cache=use_cache, model=model)
+        elif provider == 'claude':
+            call = lambda: claude_client.generate_voice_response(prompt, use_cache=use_cache, model=model)
+        else:
+            call = lambda: groq_client.generate_with_model_selection(prompt, model, use_cache=use_cache)
+        return coalesced_voice_response(provider, model, prompt, use_cache, call)
+    
+    available = {'openai': OPENAI_AVAILABLE, 'claude': CLAUDE_AVAILABLE, 'groq': GROQ_AVAILABLE}
+    if not available.get(provider):
+        return None
+    return RouteCandidate(provider, model, generate, cost=blended_price(model))
+
+route_candidates = [build_route_candidate(*entry.strip().split(':', 1))
+                    for entry in ROUTER_CHAIN.split(',') if ':' in entry]
+router = ModelRouter(
+    [candidate for candidate in route_candidates if candidate is not None],
+    is_available=lambda candidate: (
+        not circuit_open('anthropic' if candidate.provider == 'claude' else candidate.provider)
+        and usage_tracker.within_budget('anthropic' if candidate.provider == 'claude' else candidate.provider,
+                                        candidate.model)
+        and model_registry.validate(candidate.provider, candidate.model)['valid'])
+)
+
+def parse_cache_flag(value) -> bool:
+    """Interprète le champ ``cache`` d'une requête : booléen JSON ou chaîne (true/false, 1/0, yes/no).
+    
+    Lève ``ValueError`` pour toute autre valeur.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        normalized = value.strip().lower()
+        if normalized in ('true', '1', 'yes'):
+            return True
+        if normalized in ('false', '0', 'no'):
+            return False
+    raise ValueError(f"Valeur de cache invalide: {value!r} (true ou false attendu)")
+
+def batch_response(item: dict, endpoint: str = '/api/batch') -> dict:
+    """Traite une ligne d'un lot : fournisseur (et modèle) imposés, ou choix du routeur avec ``auto``."""
+    prompt = item['prompt']
+    provider = item.get('provider') or 'auto'
+    try:
+        use_cache = parse_cache_flag(item.get('cache', True))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    start_time = time.time()
+    
+    if provider == 'auto':
+        policy = item.get('policy') or ROUTER_DEFAULT_POLICY
+        if policy not in ModelRouter.POLICIES:
+            return {"success": False, "error": f"Politique inconnue: {policy}"}
+        result = router.route(prompt, policy=policy, use_cache=use_cache)
+        provider = result['routing'].get('provider', 'router')
+        model = result['routing'].get('model')
+    elif provider not in PROVIDER_MODELS:
+        return {"success": False, "error": f"Fournisseur inconnu: {provider}"}
+    else:
+        model = item.get('model') or PROVIDER_MODELS[provider]
+        candidate = build_route_candidate(provider, model)
+        if candidate is None:
+            return {"success": False, "error": f"{provider} n'est pas configuré", "model": model}
+        result = candidate.generate(prompt, use_cache)
+    
+    recorder.record(endpoint, prompt, [recorder.response(provider, model, result, time.time() - start_time)])
+    return {**result, "provider": provider, "model": result.get('model') or model}
+
+# Traitement des lots de prompts (/api/batch et main.py) par un pool de threads borné
+batch_processor = BatchProcessor(batch_response)
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 10000))
+# Taille maximale d'une page d'historique ou de résultats de recherche
+HISTORY_MAX_LIMIT = int(os.getenv('HISTORY_MAX_LIMIT', 200))
+
+def use_response_cache(data: dict) -> bool:
+    """Indique si la requête accepte une réponse en cache.
+    
+    Le cache est contourné avec ``"cache": false`` dans le corps JSON ou
+    l'en-tête ``Cache-Control: no-cache``.
+    """
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return False
+    return bool(data.get('cache', True))
+
+def invalid_model_response(provider: str, model: str):
+    """Réponse 400 si le modèle demandé est absent du catalogue du fournisseur, None sinon."""
+    check = model_registry.validate(provider, model)
+    if check['valid']:
+        return None
+    return jsonify({
+        "success": False,
+        "error": f"Modèle inconnu: {model}",
+        "suggestions": check['suggestions']
+    }), 400
+
+def requested_timeout(data: dict):
+    """Budget global demandé (``timeout`` en secondes), plafonné par COMPARE_TOTAL_TIMEOUT.
+    
+    Retourne None si absent ; lève ``ValueError`` si ce n'est pas un nombre strictement positif.
+    """
+    timeout = data.get('timeout')
+    if timeout is None:
+        return None
+    if (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+            or not math.isfinite(timeout) or timeout <= 0):
+        raise ValueError("Le délai (timeout) doit être un nombre de secondes strictement positif")
+    return min(float(timeout), fan_out.total_timeout)
+
+def requested_limit(default: int) -> int:
+    """Nombre de résultats demandé (paramètre ``limit``), ``default`` si absent.
+    
+    Lève ``ValueError`` si ce n'est pas un entier entre 1 et HISTORY_MAX_LIMIT.
+    """
+    value = request.args.get('limit')
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise ValueError(f"Le nombre de résultats (limit) doit être un entier entre 1 et {HISTORY_MAX_LIMIT}")
+    return limit
+
+def circuit_open(provider: str) -> bool:
+    """Indique si le disjoncteur d'un fournisseur est ouvert (inutile de l'appeler)."""
+    return resilience is not None and not resilience.is_available(provider)
+
+def skipped_response(provider: str, label: str) -> dict:
+    """Réponse d'un fournisseur écarté d'une comparaison car son disjoncteur est ouvert."""
+    return {
+        "success": False,
+        "error": f"{label} indisponible (disjoncteur ouvert)",
+        "provider": provider,
+        "circuit_open": True
+    }
+
+def coalesced_voice_response(provider: str, model: str, prompt: str, use_cache: bool, generate) -> dict:
+    """Génère une réponse en partageant l'appel amont entre requêtes identiques simultanées.
+    
+    Une requête qui contourne le cache demande une génération indépendante :
+    elle n'est pas regroupée avec un appel déjà en cours.
+    """
+    if not use_cache:
+        return semantic_voice_response(provider, model, prompt, use_cache, generate)
+    result, shared = single_flight.do(
+        (provider, model, prompt),
+        lambda: semantic_voice_response(provider, model, prompt, use_cache, generate)
+    )
+    if shared and result.get('usage'):
+        # Les tokens ont été consommés (et comptés) par la requête qui a fait l'appel
+        result = dict(result)
+        result['usage'] = cached_usage()
+    return result
+
+def semantic_voice_response(provider: str, model: str, prompt: str, use_cache: bool, generate) -> dict:
+    """Génère une réponse en consultant d'abord le cache sémantique.
+    
+    Une réponse réutilisée porte une clé ``semantic_cache`` avec le score de
+    similarité et le prompt d'origine, pour le réglage du seuil.
+    """
+    if semantic_cache is None or not use_cache:
+        return generate()
+    
+    match = semantic_cache.lookup(provider, model, prompt)
+    if match is not None:
+        result = dict(match['response'])
+        result['prompt'] = prompt
+        # Réponse réutilisée : aucun token consommé
+        result['usage'] = cached_usage()
+        result['semantic_cache'] = {
+            "hit": True,
+            "score": match['score'],
+            "matched_prompt": match['matched_prompt']
+        }
+        return result
+    
+    result = generate()
+    if result.get('success'):
+        semantic_cache.store(provider, model, prompt, result)
+    return result
+
+def provider_response(endpoint: str, provider: str, model: str, prompt: str, use_cache: bool) -> dict:
+    """Appelle un fournisseur configuré et enregistre le résultat.
+    
+    L'appel passe par tout le pipeline des clients : appels identiques regroupés,
+    cache sémantique, gouverneur de débit, résilience, métriques et budgets.
+    """
+    candidate = build_route_candidate(provider, model)
+    return recorder.call(endpoint, prompt, provider, model, lambda: candidate.generate(prompt, use_cache))
+
+def provider_stream(endpoint: str, provider: str, model: str, prompt: str):
+    """Flux d'un fournisseur configuré, partagé entre requêtes identiques et enregistré à sa fin."""
+    # Consommation remplie à la fin du flux amont (reste vide si le flux est partagé)
+    usage = {}
+    if provider == 'openai':
+        factory = lambda: openai_client.generate_streaming_response(prompt, model, on_usage=usage.update)
+    elif provider == 'claude':
+        factory = lambda: claude_client.generate_streaming_response(prompt, model, on_usage=usage.update)
+    else:
+        factory = lambda: groq_client.generate_streaming_response(prompt, model, on_usage=usage.update)
+    chunks = shared_streams.subscribe((provider, model, prompt), factory)
+    yield from recorder.stream(endpoint, prompt, provider, model, chunks, usage)
+
+def compare_responses(prompt: str, use_cache: bool, total_timeout=None) -> dict:
+    """Interroge en parallèle les fournisseurs configurés dont le disjoncteur est fermé.
+    
+    Returns:
+        dict: Réponse de chaque fournisseur (openai, claude, groq), enregistrées dans l'historique
+    """
+    tasks = {}
+    skipped = {}
+    for name, label, available in (('openai', 'OpenAI', OPENAI_AVAILABLE),
+                                   ('claude', 'Claude', CLAUDE_AVAILABLE),
+                                   ('groq', 'Groq', GROQ_AVAILABLE)):
+        if not available:
+            continue
+        if circuit_open('anthropic' if name == 'claude' else name):
+            skipped[name] = skipped_response(name, label)
+        else:
+            candidate = build_route_candidate(name, PROVIDER_MODELS[name])
+            tasks[name] = lambda candidate=candidate: candidate.generate(prompt, use_cache)
+    
+    results = fan_out.run(tasks, total_timeout=total_timeout)
+    results.update(skipped)
+    
+    recorder.record('/api/compare', prompt, [recorder.response(name, PROVIDER_MODELS[name], result)
+                                             for name, result in results.items()],
+                    model_used='compare')
+    
+    return {
+        'openai': results.get('openai', {"success": False, "error": "OpenAI non configuré"}),
+        'claude': results.get('claude', {"success": False, "error": "Claude non configuré"}),
+        'groq': results.get('groq', {"success": False, "error": "Groq non configuré"})
+    }
+
+def compare_stream_events(prompt: str, groq_model: str, total_timeout=None):
+    """Prépare la comparaison en flux des fournisseurs configurés.
+    
+    Returns:
+        Itérateur des événements de la comparaison (fournisseurs écartés d'abord),
+        ou None si aucun fournisseur n'est configuré
+    """
+    generators = {}
+    skipped = {}
+    models = {**PROVIDER_MODELS, 'groq': groq_model}
+    # Consommation de chaque fournisseur, remplie à la fin de son flux amont
+    usages = {name: {} for name in models}
+    clients = {'openai': openai_client, 'claude': claude_client, 'groq': groq_client}
+    for name, label, available in (('openai', 'OpenAI', OPENAI_AVAILABLE),
+                                   ('claude', 'Claude', CLAUDE_AVAILABLE),
+                                   ('groq', 'Groq', GROQ_AVAILABLE)):
+        if not available:
+            continue
+        if circuit_open('anthropic' if name == 'claude' else name):
+            skipped[name] = skipped_response(name, label)
+        else:
+            generators[name] = lambda name=name: shared_streams.subscribe(
+                (name, models[name], prompt),
+                lambda: clients[name].generate_streaming_response(prompt, models[name],
+                                                                  on_usage=usages[name].update))
+    
+    if not generators and not skipped:
+        return None
+    
+    def events():
+        # Les fournisseurs écartés sont signalés tout de suite, sans attendre leur délai
+        for name, skipped_result in skipped.items():
+            yield {"type": "error", "provider": name, "error": skipped_result["error"],
+                   "circuit_open": True, "success": False}
+        streamed = {name: models[name] for name in generators}
+        for event in recorder.compare_stream('/api/compare/stream', prompt,
+                                             fan_out.stream(generators, total_timeout=total_timeout),
+                                             streamed, usages, skipped):
+            event['success'] = event['type'] not in ('timeout', 'error')
+            yield event
+    
+    return events()
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     response = ''
-    conversation_id = None
     
     # Récupérer l'historique des conversations
     history = []
+    next_cursor = None
     if DB_AVAILABLE:
         try:
-            history = db_manager.get_conversation_history(limit=10)
+            page = db_manager.get_conversation_history_page(limit=10)
+            history, next_cursor = page['history'], page['next_cursor']
         except Exception as e:
             print(f"Erreur lors de la récupération de l'historique: {e}")
     
     if request.method == 'POST':
-        if OPENAI_AVAILABLE:
-            # Utiliser OpenAI pour générer une réponse
+        if router.candidates:
+            # Le routeur choisit le fournisseur (le plus rapide par défaut, avec repli)
             prompt = request.form.get('query', '')
             if prompt:
-                # Sauvegarder la conversation
-                if DB_AVAILABLE:
-                    try:
-                        conversation_id = db_manager.save_conversation(
-                            prompt=prompt,
-                            model_used="openai",
-                            response_success=True
-                        )
-                    except Exception as e:
-                        print(f"Erreur lors de la sauvegarde: {e}")
-                
                 # Mesurer le temps de réponse
                 start_time = time.time()
-                ai_response = openai_client.generate_voice_response(prompt)
+                ai_response = router.route(prompt, policy=ROUTER_DEFAULT_POLICY)
                 response_time = time.time() - start_time
+                routing = ai_response['routing']
                 
                 if ai_response['success']:
                     response = ai_response['text']
-                    
-                    # Sauvegarder la réponse
-                    if DB_AVAILABLE and conversation_id:
-                        try:
-                            db_manager.save_response(
-                                conversation_id=conversation_id,
-                                provider="openai",
-                                model="gpt-4o",
-                                response_text=response,
-                                success=True,
-                                response_time=response_time
-                            )
-                        except Exception as e:
-                            print(f"Erreur lors de la sauvegarde de la réponse: {e}")
                 else:
                     response = f"Erreur: {ai_response['error']}"
-                    
-                    # Sauvegarder l'erreur
-                    if DB_AVAILABLE and conversation_id:
-                        try:
-                            db_manager.save_response(
-                                conversation_id=conversation_id,
-                                provider="openai",
-                                model="gpt-4o",
-                                response_text=None,
-                                success=False,
-                                error_message=ai_response['error'],
-                                response_time=response_time
-                            )
-                        except Exception as e:
-                            print(f"Erreur lors de la sauvegarde de l'erreur: {e}")
+                
+                # Sauvegarder la conversation et sa réponse en arrière-plan
+                recorder.record('/', prompt, [recorder.response(
+                    routing.get('provider', 'router'), routing.get('model'), ai_response, response_time)])
             else:
                 response = "Veuillez saisir une question."
         else:
-            # Réponse statique si OpenAI n'est pas disponible
+            # Réponse statique si aucun fournisseur n'est disponible
             response = "Merci pour votre question, nous aurons bientôt une réponse pour vous !"
     
-    return render_template('index.html', response=response, history=history)
+    return render_template('index.html', response=response, history=history,
+                           next_cursor=next_cursor)
 
 @app.route('/api/chat', methods=['POST'])
 def chat_api():
@@ -143,7 +512,7 @@ def chat_api():
             }), 400
         
         # Générer la réponse avec OpenAI
-        ai_response = openai_client.generate_voice_response(prompt)
+        ai_response = provider_response('/api/chat', 'openai', 'gpt-4o', prompt, use_response_cache(data))
         
         return jsonify(ai_response)
         
@@ -173,7 +542,8 @@ def claude_api():
             }), 400
         
         # Générer la réponse avec Claude
-        claude_response = claude_client.generate_voice_response(prompt)
+        claude_response = provider_response('/api/claude', 'claude', 'claude-3-5-sonnet-20241022', prompt,
+                                            use_response_cache(data))
         
         return jsonify(claude_response)
         
@@ -203,8 +573,13 @@ def groq_api():
                 "error": "Le prompt est requis"
             }), 400
         
+        # Modèle vérifié localement, sans aller-retour réseau
+        invalid = invalid_model_response('groq', model)
+        if invalid:
+            return invalid
+        
         # Générer la réponse avec Groq
-        groq_response = groq_client.generate_with_model_selection(prompt, model)
+        groq_response = provider_response('/api/groq', 'groq', model, prompt, use_response_cache(data))
         
         return jsonify(groq_response)
         
@@ -234,8 +609,13 @@ def groq_stream_api():
                 "error": "Le prompt est requis"
             }), 400
         
+        # Modèle vérifié localement, sans aller-retour réseau
+        invalid = invalid_model_response('groq', model)
+        if invalid:
+            return invalid
+        
         def generate():
-            for chunk in groq_client.generate_streaming_response(prompt, model):
+            for chunk in provider_stream('/api/groq/stream', 'groq', model, prompt):
                 yield f"data: {json.dumps({'text': chunk, 'success': True})}\n\n"
         
         return Response(generate(), mimetype='text/event-stream')
@@ -256,10 +636,13 @@ def groq_models_api():
         }), 400
     
     try:
-        models = groq_client.get_available_models()
+        # Catalogue servi depuis le registre : aucun appel à l'API Groq
+        catalog = model_registry.describe('groq')
         return jsonify({
             "success": True,
-            "models": models
+            "models": catalog['models'] or [],
+            "loaded_at": catalog['loaded_at'],
+            "stale": catalog['stale']
         })
         
     except Exception as e:
@@ -268,6 +651,15 @@ def groq_models_api():
             "error": str(e)
         }), 500
 
+@app.route('/api/models', methods=['GET'])
+def models_api():
+    """API endpoint pour récupérer les catalogues de modèles de tous les fournisseurs."""
+    return jsonify({
+        "success": True,
+        "providers": {provider: model_registry.describe(provider)
+                      for provider in ('openai', 'claude', 'groq')}
+    })
+
 @app.route('/api/claude/stream', methods=['POST'])
 def claude_stream_api():
     """API endpoint pour les appels Claude en streaming."""
@@ -288,7 +680,7 @@ def claude_stream_api():
             }), 400
         
         def generate():
-            for chunk in claude_client.generate_streaming_response(prompt):
+            for chunk in provider_stream('/api/claude/stream', 'claude', 'claude-3-5-sonnet-20241022', prompt):
                 yield f"data: {json.dumps({'text': chunk, 'success': True})}\n\n"
         
         return Response(generate(), mimetype='text/event-stream')
@@ -312,28 +704,16 @@ def compare_apis():
                 "error": "Le prompt est requis"
             }), 400
         
-        responses = {}
-        
-        # Réponse OpenAI
-        if OPENAI_AVAILABLE:
-            openai_response = openai_client.generate_voice_response(prompt)
-            responses['openai'] = openai_response
-        else:
-            responses['openai'] = {"success": False, "error": "OpenAI non configuré"}
-        
-        # Réponse Claude
-        if CLAUDE_AVAILABLE:
-            claude_response = claude_client.generate_voice_response(prompt)
-            responses['claude'] = claude_response
-        else:
-            responses['claude'] = {"success": False, "error": "Claude non configuré"}
+        try:
+            total_timeout = requested_timeout(data)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
-        # Réponse Groq
-        if GROQ_AVAILABLE:
-            groq_response = groq_client.generate_voice_response(prompt)
-            responses['groq'] = groq_response
-        else:
-            responses['groq'] = {"success": False, "error": "Groq non configuré"}
+        # Lancer en parallèle les fournisseurs configurés dont le disjoncteur est fermé
+        responses = compare_responses(prompt, use_response_cache(data), total_timeout)
         
         return jsonify({
             "success": True,
@@ -347,6 +727,140 @@ def compare_apis():
             "error": str(e)
         }), 500
 
+@app.route('/api/compare/stream', methods=['POST'])
+def compare_stream_api():
+    """API endpoint pour comparer OpenAI, Claude et Groq en un seul flux SSE."""
+    try:
+        data = request.get_json()
+        prompt = data.get('prompt', '')
+        groq_model = data.get('groq_model', 'llama3-8b-8192')
+        
+        if not prompt:
+            return jsonify({
+                "success": False,
+                "error": "Le prompt est requis"
+            }), 400
+        
+        invalid = invalid_model_response('groq', groq_model) if GROQ_AVAILABLE else None
+        if invalid:
+            return invalid
+        
+        try:
+            total_timeout = requested_timeout(data)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        events = compare_stream_events(prompt, groq_model, total_timeout)
+        if events is None:
+            return jsonify({
+                "success": False,
+                "error": "Aucun fournisseur IA n'est configuré"
+            }), 400
+        
+        def generate():
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/route', methods=['POST'])
+def route_api():
+    """API endpoint laissant le routeur choisir le fournisseur et le modèle."""
+    try:
+        data = request.get_json()
+        prompt = data.get('prompt', '')
+        policy = data.get('policy', ROUTER_DEFAULT_POLICY)
+        
+        if not prompt:
+            return jsonify({
+                "success": False,
+                "error": "Le prompt est requis"
+            }), 400
+        
+        if policy not in ModelRouter.POLICIES:
+            return jsonify({
+                "success": False,
+                "error": f"Politique inconnue, valeurs possibles: {', '.join(ModelRouter.POLICIES)}"
+            }), 400
+        
+        start_time = time.time()
+        result = router.route(prompt, policy=policy, use_cache=use_response_cache(data))
+        recorder.record('/api/route', prompt, [recorder.response(
+            result['routing'].get('provider', 'router'), result['routing'].get('model'), result,
+            time.time() - start_time)])
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/batch', methods=['POST'])
+def batch_api():
+    """API endpoint traitant un lot de prompts, résultats diffusés en NDJSON dès qu'ils sont prêts.
+    
+    Le corps est du JSONL (une requête ``{"prompt", "provider", "model", "id"}`` par ligne,
+    valeurs par défaut en paramètres d'URL) ou un objet JSON ``{"items": [...]}``. Chaque
+    résultat porte le numéro de ligne de sa requête, dans l'ordre d'achèvement.
+    """
+    try:
+        if request.is_json:
+            data = request.get_json()
+            lines = [json.dumps(item) for item in data.get('items', [])]
+        else:
+            data = request.args
+            lines = request.get_data(as_text=True).splitlines()
+        defaults = {key: data[key] for key in ('provider', 'model', 'policy', 'cache') if key in data}
+        if 'cache' in defaults:
+            try:
+                defaults['cache'] = parse_cache_flag(defaults['cache'])
+            except ValueError as e:
+                return jsonify({
+                    "success": False,
+                    "error": str(e)
+                }), 400
+        if not use_response_cache({}):
+            defaults['cache'] = False
+        
+        count = sum(1 for line in lines if line.strip())
+        if not count:
+            return jsonify({
+                "success": False,
+                "error": "Le lot est vide"
+            }), 400
+        if count > BATCH_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"Lot trop volumineux ({count} prompts, maximum {BATCH_MAX_ITEMS}) : utilisez main.py"
+            }), 413
+        
+        items = ((line_number, {**defaults, **item}) for line_number, item in BatchProcessor.parse(lines))
+        
+        def generate():
+            for result in batch_processor.run(items):
+                yield json.dumps(result) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson', headers={'X-Batch-Size': str(count)})
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """API endpoint pour récupérer l'historique des conversations."""
@@ -357,14 +871,40 @@ def get_history():
         }), 500
     
     try:
-        limit = request.args.get('limit', 50, type=int)
-        offset = request.args.get('offset', 0, type=int)
+        try:
+            limit = requested_limit(50)
+            offset = request.args.get('offset')
+            if offset is not None:
+                offset = int(offset) if offset.isdigit() else -1
+                if offset < 0:
+                    raise ValueError("Le décalage (offset) doit être un entier positif ou nul")
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        cursor = request.args.get('cursor')
         
-        history = db_manager.get_conversation_history(limit=limit, offset=offset)
+        # Ancienne pagination par décalage, conservée pour compatibilité
+        if offset is not None:
+            history = db_manager.get_conversation_history(limit=limit, offset=offset)
+            return jsonify({
+                "success": True,
+                "history": history
+            })
+        
+        try:
+            page = db_manager.get_conversation_history_page(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
-            "history": history
+            "history": page['history'],
+            "next_cursor": page['next_cursor']
         })
         
     except Exception as e:
@@ -384,6 +924,8 @@ def get_conversation_details(conversation_id):
     
     try:
         conversation = db_manager.get_conversation_details(conversation_id)
+        if not conversation and archive is not None:
+            conversation = archive.get(conversation_id)
         
         if not conversation:
             return jsonify({
@@ -413,7 +955,6 @@ def search_history():
     
     try:
         search_term = request.args.get('q', '')
-        limit = request.args.get('limit', 20, type=int)
         
         if not search_term:
             return jsonify({
@@ -421,7 +962,19 @@ def search_history():
                 "error": "Terme de recherche requis"
             }), 400
         
+        try:
+            limit = requested_limit(20)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
         results = db_manager.search_conversations(search_term, limit=limit)
+        # Compléter avec les conversations archivées (les plus récentes d'abord)
+        if archive is not None and len(results) < limit:
+            results += archive.search(search_term, limit - len(results),
+                                      exclude={result['id'] for result in results})
         
         return jsonify({
             "success": True,
@@ -474,6 +1027,29 @@ def get_statistics():
     
     try:
         stats = db_manager.get_statistics()
+        stats['write_queue'] = write_queue.stats()
+        if response_cache is not None:
+            stats['cache'] = response_cache.stats()
+        if semantic_cache is not None:
+            stats['semantic_cache'] = semantic_cache.stats()
+        stats['single_flight'] = single_flight.stats()
+        stats['shared_streams'] = shared_streams.stats()
+        if governor is not None:
+            stats['rate_limits'] = governor.stats()
+        if resilience is not None:
+            stats['resilience'] = resilience.stats()
+        stats['router'] = router.stats()
+        stats['retention'] = retention.status()
+        if archive is not None:
+            stats['archive'] = archive.stats()
+        # Dépenses du jour, budgets et débit de génération (tokens par seconde)
+        stats['usage'] = usage_tracker.stats()
+        stats['usage']['tokens_per_second'] = latency_summary(PROVIDER_TOKEN_RATE)
+        # Centiles de latence par fournisseur/modèle/issue et du premier fragment des flux
+        stats['latency'] = {
+            'providers': latency_summary(PROVIDER_LATENCY),
+            'time_to_first_token': latency_summary(PROVIDER_TTFT)
+        }
         
         return jsonify({
             "success": True,
@@ -486,9 +1062,46 @@ def get_statistics():
             "error": str(e)
         }), 500
 
+@app.route('/api/cache/semantic', methods=['GET'])
+def semantic_cache_probe():
+    """API endpoint pour régler le cache sémantique : prompts proches et scores."""
+    if semantic_cache is None:
+        return jsonify({
+            "success": False,
+            "error": "Cache sémantique non activé"
+        }), 400
+    
+    try:
+        prompt = request.args.get('q', '')
+        k = request.args.get('k', 5, type=int)
+        
+        if not prompt:
+            return jsonify({
+                "success": False,
+                "error": "Le prompt est requis"
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "threshold": semantic_cache.threshold,
+            "neighbors": semantic_cache.probe(prompt, k=k),
+            "statistics": semantic_cache.stats()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques du processus au format texte de Prometheus."""
+    return Response(REGISTRY.render(), content_type=REGISTRY.CONTENT_TYPE)
+
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_old_conversations():
-    """API endpoint pour nettoyer les anciennes conversations."""
+    """API endpoint pour lancer le nettoyage des anciennes conversations en arrière-plan."""
     if not DB_AVAILABLE:
         return jsonify({
             "success": False,
@@ -496,21 +1109,59 @@ def cleanup_old_conversations():
         }), 500
     
     try:
-        days = request.json.get('days', 30)
-        deleted_count = db_manager.cleanup_old_conversations(days=days)
+        data = request.get_json(silent=True) or {}
+        if not retention.start(data.get('days')):
+            return jsonify({
+                "success": False,
+                "error": "Un nettoyage est déjà en cours",
+                "status": retention.status()
+            }), 409
         
         return jsonify({
             "success": True,
-            "deleted_count": deleted_count,
-            "message": f"{deleted_count} conversations supprimées"
-        })
+            "message": "Nettoyage lancé, avancement sur /api/cleanup/status",
+            "status": retention.status()
+        }), 202
         
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@app.route('/api/cleanup/status', methods=['GET'])
+def cleanup_status():
+    """API endpoint pour suivre l'avancement du nettoyage."""
+    if not DB_AVAILABLE:
+        return jsonify({
+            "success": False,
+            "error": "Base de données non disponible"
+        }), 500
+    
+    return jsonify({
+        "success": True,
+        "status": retention.status()
+    })
+
+@app.route('/api/cleanup/cancel', methods=['POST'])
+def cancel_cleanup():
+    """API endpoint pour interrompre le nettoyage en cours (après le lot courant)."""
+    if not DB_AVAILABLE:
+        return jsonify({
+            "success": False,
+            "error": "Base de données non disponible"
+        }), 500
+    
+    return jsonify({
+        "success": retention.cancel(),
+        "status": retention.status()
+    })
+
 if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', 8000))
     app.run(debug=False, host='0.0.0.0', port=port) 
\ No newline at end of file
@@ -0,0 +1,300 @@
+"""Point d'entrée ASGI de l'application.
+
+Les routes qui appellent les fournisseurs IA sont servies par la boucle
+d'événements : la lecture des requêtes et l'envoi des réponses (flux SSE
+compris) ne bloquent pas de thread. Les appels eux-mêmes passent par les mêmes
+fonctions que l'application Flask, exécutées dans un pool de threads borné :
+gouverneur de débit, nouvelles tentatives et disjoncteurs, métriques, appels
+identiques regroupés, caches, budgets et historique s'appliquent à l'identique.
+Toutes les autres routes (interface, historique, statistiques...) sont
+déléguées à l'application Flask via asgiref.
+
+Lancement : ``uvicorn asgi:application --host 0.0.0.0 --port 8000``
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (app as flask_app, CLAUDE_AVAILABLE, GROQ_AVAILABLE, OPENAI_AVAILABLE, PROVIDER_MODELS,
+                 compare_responses, compare_stream_events, model_registry, provider_response, provider_stream,
+                 requested_timeout)
+
+# Pool des appels aux fournisseurs : chaque appel en cours (ou flux en attente d'un fragment) occupe un thread
+executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASGI_THREADS', 64)), thread_name_prefix='asgi')
+
+# Fin d'un itérateur parcouru dans le pool
+_END = object()
+
+
+async def run_in_threadpool(function: Callable[..., Any], *args: Any) -> Any:
+    """Exécute une fonction bloquante dans le pool, sans bloquer la boucle d'événements."""
+    return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+
+async def iterate_in_threadpool(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Parcourt un itérateur bloquant dans le pool.
+
+    À l'abandon (client parti), l'itérateur est fermé dans le pool dès que la
+    lecture en cours se termine : le flux amont est libéré et enregistré.
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        while True:
+            # Protégé de l'annulation : un ``next`` en cours dans un thread ne peut être interrompu
+            pending = loop.run_in_executor(executor, next, iterator, _END)
+            item = await asyncio.shield(pending)
+            if item is _END:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            if pending is not None and not pending.done():
+                pending.add_done_callback(lambda _: loop.run_in_executor(executor, close))
+            else:
+                await loop.run_in_executor(executor, close)
+
+
+async def read_json(receive) -> Dict[str, Any]:
+    """Lit et décode le corps JSON d'une requête HTTP."""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return json.loads(body) if body else {}
+
+
+async def send_json(send, payload: Dict[str, Any], status: int = 200):
+    """Envoie une réponse JSON complète."""
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def use_response_cache(scope, data: Dict[str, Any]) -> bool:
+    """Indique si la requête accepte une réponse en cache (``"cache": false`` ou ``Cache-Control: no-cache``)."""
+    headers = dict(scope.get('headers') or [])
+    if b'no-cache' in headers.get(b'cache-control', b''):
+        return False
+    return bool(data.get('cache', True))
+
+
+def invalid_model(provider: str, model: str):
+    """Réponse 400 si le modèle demandé est absent du catalogue du fournisseur, None sinon."""
+    check = model_registry.validate(provider, model)
+    if check['valid']:
+        return None
+    return {"success": False, "error": f"Modèle inconnu: {model}", "suggestions": check['suggestions']}
+
+
+async def send_sse(send, receive, events: AsyncIterator[Dict[str, Any]]):
+    """Envoie un flux Server-Sent Events à partir d'un itérateur asynchrone d'événements.
+
+    Si le client se déconnecte, le flux est interrompu et l'itérateur fermé.
+    """
+    async def forward():
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')]
+        })
+        async for event in events:
+            data = f"data: {json.dumps(event)}\n\n".encode('utf-8')
+            await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    sender = asyncio.ensure_future(forward())
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({sender, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, watcher):
+            task.cancel()
+        await asyncio.gather(sender, watcher, return_exceptions=True)
+        await events.aclose()
+    if not sender.cancelled() and sender.exception() is not None:
+        raise sender.exception()
+
+
+def single_provider(name: str, endpoint: str, available: bool, label: str):
+    """Construit un handler JSON pour un fournisseur unique (/api/chat, /api/claude, /api/groq)."""
+    async def handler(scope, receive, send):
+        if not available:
+            await send_json(send, {"success": False, "error": f"{label} n'est pas configuré"}, 400)
+            return
+
+        try:
+            data = await read_json(receive)
+            prompt = data.get('prompt', '')
+            if not prompt:
+                await send_json(send, {"success": False, "error": "Le prompt est requis"}, 400)
+                return
+
+            model = PROVIDER_MODELS[name]
+            if name == 'groq':
+                model = data.get('model', model)
+                # Modèle vérifié localement, sans aller-retour réseau
+                invalid = invalid_model('groq', model)
+                if invalid:
+                    await send_json(send, invalid, 400)
+                    return
+            result = await run_in_threadpool(provider_response, endpoint, name, model, prompt,
+                                             use_response_cache(scope, data))
+            await send_json(send, result)
+
+        except Exception as e:
+            await send_json(send, {"success": False, "error": str(e)}, 500)
+
+    return handler
+
+
+def single_stream(name: str, endpoint: str, available: bool, label: str, with_model: bool):
+    """Construit un handler SSE pour un fournisseur unique (/api/groq/stream, /api/claude/stream)."""
+    async def handler(scope, receive, send):
+        if not available:
+            await send_json(send, {"success": False, "error": f"{label} n'est pas configuré"}, 400)
+            return
+
+        try:
+            data = await read_json(receive)
+            prompt = data.get('prompt', '')
+            if not prompt:
+                await send_json(send, {"success": False, "error": "Le prompt est requis"}, 400)
+                return
+
+            model = PROVIDER_MODELS[name]
+            if with_model:
+                model = data.get('model', model)
+                invalid = invalid_model(name, model)
+                if invalid:
+                    await send_json(send, invalid, 400)
+                    return
+
+            def events():
+                for chunk in provider_stream(endpoint, name, model, prompt):
+                    yield {'text': chunk, 'success': True}
+
+            await send_sse(send, receive, iterate_in_threadpool(events()))
+
+        except Exception as e:
+            await send_json(send, {"success": False, "error": str(e)}, 500)
+
+    return handler
+
+
+async def compare(scope, receive, send):
+    """Compare OpenAI, Claude et Groq en parallèle avec délais par fournisseur."""
+    try:
+        data = await read_json(receive)
+        prompt = data.get('prompt', '')
+        if not prompt:
+            await send_json(send, {"success": False, "error": "Le prompt est requis"}, 400)
+            return
+
+        try:
+            total_timeout = requested_timeout(data)
+        except ValueError as e:
+            await send_json(send, {"success": False, "error": str(e)}, 400)
+            return
+
+        responses = await run_in_threadpool(compare_responses, prompt, use_response_cache(scope, data),
+                                            total_timeout)
+        await send_json(send, {"success": True, "prompt": prompt, "responses": responses})
+
+    except Exception as e:
+        await send_json(send, {"success": False, "error": str(e)}, 500)
+
+
+async def compare_stream(scope, receive, send):
+    """Compare les trois fournisseurs en un seul flux SSE multiplexé."""
+    try:
+        data = await read_json(receive)
+        prompt = data.get('prompt', '')
+        if not prompt:
+            await send_json(send, {"success": False, "error": "Le prompt est requis"}, 400)
+            return
+
+        groq_model = data.get('groq_model', 'llama3-8b-8192')
+        invalid = invalid_model('groq', groq_model) if GROQ_AVAILABLE else None
+        if invalid:
+            await send_json(send, invalid, 400)
+            return
+
+        try:
+            total_timeout = requested_timeout(data)
+        except ValueError as e:
+            await send_json(send, {"success": False, "error": str(e)}, 400)
+            return
+
+        events = compare_stream_events(prompt, groq_model, total_timeout)
+        if events is None:
+            await send_json(send, {"success": False, "error": "Aucun fournisseur IA n'est configuré"}, 400)
+            return
+
+        await send_sse(send, receive, iterate_in_threadpool(events))
+
+    except Exception as e:
+        await send_json(send, {"success": False, "error": str(e)}, 500)
+
+
+class Application:
+    """Application ASGI : routes IA servies par la boucle d'événements, reste délégué à Flask."""
+
+    def __init__(self):
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.routes = {
+            ('POST', '/api/chat'): single_provider('openai', '/api/chat', OPENAI_AVAILABLE, 'OpenAI'),
+            ('POST', '/api/claude'): single_provider('claude', '/api/claude', CLAUDE_AVAILABLE, 'Claude'),
+            ('POST', '/api/groq'): single_provider('groq', '/api/groq', GROQ_AVAILABLE, 'Groq'),
+            ('POST', '/api/claude/stream'): single_stream('claude', '/api/claude/stream', CLAUDE_AVAILABLE,
+                                                          'Claude', with_model=False),
+            ('POST', '/api/groq/stream'): single_stream('groq', '/api/groq/stream', GROQ_AVAILABLE,
+                                                        'Groq', with_model=True),
+            ('POST', '/api/compare'): compare,
+            ('POST', '/api/compare/stream'): compare_stream,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+            if handler is not None:
+                await handler(scope, receive, send)
+                return
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """Gère le démarrage et l'arrêt propre du serveur (fin du pool d'appels)."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = Application()
@@ -0,0 +1,164 @@
+"""Benchmark de l'application Flask contre le serveur LLM factice.
+
+Mesure le débit, les latences p50/p95/p99 et le délai avant le premier
+fragment (flux) des routes IA, de l'historique et des statistiques, sans
+appel facturé. L'application est lancée dans le processus avec une base
+SQLite temporaire ; ``--url`` mesure à la place un serveur déjà lancé
+(ex. Gunicorn configuré avec les variables affichées par ``mock_llm_server``).
+
+    python -m benchmarks.bench_app --requests 200 --concurrency 16
+    python -m benchmarks.bench_app --baseline benchmarks/results/bench_app-20240101-120000.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from benchmarks.mock_llm_server import MockLLMServer, add_config_arguments, config_from_args
+from benchmarks.report import compare_reports, summarize, write_report
+
+# Scénario : (méthode, chemin, corps JSON à partir d'un prompt unique, réponse en flux)
+SCENARIOS: Dict[str, Tuple[str, str, Optional[Callable[[str], Dict[str, Any]]], bool]] = {
+    'chat': ('POST', '/api/chat', lambda prompt: {'prompt': prompt}, False),
+    'claude': ('POST', '/api/claude', lambda prompt: {'prompt': prompt}, False),
+    'groq': ('POST', '/api/groq', lambda prompt: {'prompt': prompt, 'model': 'llama3-8b-8192'}, False),
+    'compare': ('POST', '/api/compare', lambda prompt: {'prompt': prompt}, False),
+    'groq_stream': ('POST', '/api/groq/stream', lambda prompt: {'prompt': prompt, 'model': 'llama3-8b-8192'}, True),
+    'claude_stream': ('POST', '/api/claude/stream', lambda prompt: {'prompt': prompt}, True),
+    'compare_stream': ('POST', '/api/compare/stream', lambda prompt: {'prompt': prompt}, True),
+    'history': ('GET', '/api/history?limit=50', None, False),
+    'stats': ('GET', '/api/stats', None, False),
+}
+
+
+def start_app(mock: MockLLMServer, use_cache: bool) -> Tuple[str, Any]:
+    """Lance l'application dans un thread, clients IA redirigés vers le serveur factice."""
+    os.environ.update(mock.environment())
+    os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'true' if use_cache else 'false')
+    os.environ.setdefault('SEMANTIC_CACHE_ENABLED', 'false')
+    # Base SQLite temporaire : l'historique réel n'est pas touché
+    os.chdir(tempfile.mkdtemp(prefix='bench-app-'))
+
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def request_once(client: httpx.Client, base_url: str, scenario: str) -> Dict[str, Any]:
+    """Envoie une requête et mesure sa durée (et le premier fragment pour un flux)."""
+    method, path, body, streaming = SCENARIOS[scenario]
+    # Prompt unique : ni cache ni regroupement des requêtes identiques
+    payload = body(f"Question de benchmark {scenario} {uuid.uuid4().hex}") if body else None
+    start = time.perf_counter()
+    first_chunk = None
+    try:
+        if streaming:
+            with client.stream(method, base_url + path, json=payload) as response:
+                ok = response.status_code < 400
+                for line in response.iter_lines():
+                    if not line.startswith('data: '):
+                        continue
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    event = json.loads(line[6:])
+                    if event.get('success') is False or str(event.get('text', '')).startswith('Erreur:'):
+                        ok = False
+        else:
+            response = client.request(method, base_url + path, json=payload)
+            ok = response.status_code < 400 and response.json().get('success', True) is not False
+    except httpx.HTTPError:
+        ok = False
+    return {"ok": ok, "latency": time.perf_counter() - start, "ttft": first_chunk}
+
+
+def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Exécute ``requests`` requêtes avec ``concurrency`` clients simultanés."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with httpx.Client(timeout=120, limits=limits) as client, ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        samples = list(pool.map(lambda _: request_once(client, base_url, scenario), range(requests)))
+        duration = time.perf_counter() - start
+
+    ttft = [sample['ttft'] for sample in samples if sample['ttft'] is not None]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for sample in samples if not sample['ok']),
+        "duration": duration,
+        "throughput": requests / duration if duration else None,
+        "latency": summarize([sample['latency'] for sample in samples]),
+        "ttft": summarize(ttft) if SCENARIOS[scenario][3] else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de l'application contre un serveur LLM factice")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Scénarios séparés par des virgules (défaut: tous : {', '.join(SCENARIOS)})")
+    parser.add_argument('--requests', type=int, default=100, help="Requêtes par scénario (défaut: 100)")
+    parser.add_argument('--concurrency', type=int, default=10, help="Clients simultanés (défaut: 10)")
+    parser.add_argument('--warmup', type=int, default=5, help="Requêtes d'échauffement non mesurées (défaut: 5)")
+    parser.add_argument('--url', help="Mesurer un serveur déjà lancé au lieu de l'application dans le processus")
+    parser.add_argument('--cache', action='store_true', help="Laisser le cache de réponses actif")
+    parser.add_argument('--output', help="Fichier JSON des résultats (défaut: benchmarks/results/)")
+    parser.add_argument('--baseline', help="Rapport JSON de référence à comparer")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Dégradation tolérée par rapport à la référence (défaut: 0.2 = 20 %%)")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénarios inconnus: {', '.join(unknown)}")
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    mock = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        mock = MockLLMServer(config_from_args(args)).start()
+        base_url, _ = start_app(mock, args.cache)
+
+    results = {}
+    for scenario in scenarios:
+        if args.warmup:
+            run_scenario(base_url, scenario, args.warmup, min(args.warmup, args.concurrency))
+        result = run_scenario(base_url, scenario, args.requests, args.concurrency)
+        results[scenario] = result
+        latency, ttft = result['latency'], result['ttft']
+        line = (f"{scenario:<16} {result['throughput']:8.1f} req/s  p50 {latency['p50'] * 1000:7.1f} ms  "
+                f"p99 {latency['p99'] * 1000:7.1f} ms  erreurs {result['errors']}")
+        if ttft and ttft['count']:
+            line += f"  TTFT p50 {ttft['p50'] * 1000:.1f} ms"
+        print(line)
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+    print(f"\nRésultats : {write_report('bench_app', config, results, output)}")
+    if mock is not None:
+        mock.stop()
+
+    if baseline:
+        regressions = compare_reports(results, baseline, ['latency.p50', 'latency.p99', 'ttft.p50'],
+                                      args.max_regression)
+        if regressions:
+            print(f"Régressions au-delà de {args.max_regression:.0%} : {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
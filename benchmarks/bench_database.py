@@ -0,0 +1,192 @@
+"""Micro-benchmarks de ``DatabaseManager`` sur des historiques synthétiques.
+
+Pour chaque volume (10k, 1M, 10M conversations par défaut), une base est
+générée une fois (``benchmarks/data/history-<volume>.db``, réutilisée ensuite),
+puis chaque méthode est chronométrée et les plans d'exécution (EXPLAIN QUERY
+PLAN) des requêtes qu'elle émet sont relevés : un parcours complet de table ou
+un B-tree temporaire signale une requête qui ne tiendra pas la volumétrie.
+
+    python -m benchmarks.bench_database --sizes 10000,1000000
+    python -m benchmarks.bench_database --sizes 10000 --baseline benchmarks/results/bench_database-<date>.json
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+from benchmarks.generate_history import HistoryGenerator
+from benchmarks.report import compare_reports, summarize, write_report
+from src.infrastructure.database import DatabaseManager
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+HISTORY_DAYS = 90
+
+
+def open_history(size: int, rebuild: bool = False) -> DatabaseManager:
+    """Ouvre la base synthétique d'un volume donné, générée au premier appel."""
+    path = os.path.join(DATA_DIR, f'history-{size}.db')
+    if rebuild and os.path.exists(path):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    db_manager = DatabaseManager(path)
+    count = db_manager._connect().execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+    if count < size:
+        print(f"Génération de {size - count} conversations dans {path}", file=sys.stderr)
+        HistoryGenerator(HISTORY_DAYS, seed=size).populate(db_manager, size - count, bulk=True, progress=True)
+    # Statistiques relues à chaque appel : on mesure les requêtes, pas le cache
+    db_manager.stats_cache_ttl = 0
+    return db_manager
+
+
+def query_plans(db_manager: DatabaseManager, operation: Callable[[], Any]) -> List[Dict[str, Any]]:
+    """Exécute une opération en relevant les requêtes émises et leur plan d'exécution."""
+    conn = db_manager._connect()
+    statements: List[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        operation()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in dict.fromkeys(statements):
+        # Corps de triggers, pragmas et contrôle de transaction : pas de plan utile
+        if sql.lstrip().startswith('--') or sql.split(None, 1)[0].upper() in ('PRAGMA', 'BEGIN', 'COMMIT',
+                                                                               'ROLLBACK', 'ANALYZE'):
+            continue
+        try:
+            details = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        except sqlite3.Error as e:
+            details = [f"plan indisponible: {e}"]
+        warnings = [detail for detail in details
+                    if (detail.startswith('SCAN ') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail)
+                    or 'TEMP B-TREE' in detail]
+        plans.append({"sql": ' '.join(sql.split())[:300], "plan": details, "warnings": warnings})
+    return plans
+
+
+def time_operation(operation: Callable[[], Any], repeat: int, budget: float) -> List[float]:
+    """Chronomètre ``repeat`` exécutions, en s'arrêtant une fois le budget de temps dépassé."""
+    durations = []
+    deadline = time.perf_counter() + budget
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return durations
+
+
+def sample_records(count: int) -> List[Dict[str, Any]]:
+    """Enregistrements au format de la file d'écriture, pour mesurer le chemin d'écriture."""
+    return [{
+        "prompt": f"Question de benchmark {index} sur les index sqlite",
+        "endpoint": '/api/compare',
+        "model_used": 'compare',
+        "response_success": True,
+        "responses": [{"provider": provider, "model": None, "response_text": "réponse de benchmark " * 20,
+                       "success": True, "response_time": 1.2, "prompt_tokens": 40, "completion_tokens": 80,
+                       "cost": 0.0001}
+                      for provider in ('openai', 'claude', 'groq')],
+    } for index in range(count)]
+
+
+def run_size(size: int, repeat: int, budget: float, rebuild: bool) -> Dict[str, Dict[str, Any]]:
+    """Chronomètre chaque méthode de ``DatabaseManager`` sur une base de ``size`` conversations."""
+    db_manager = open_history(size, rebuild)
+    conn = db_manager._connect()
+    total = conn.execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+    max_id = conn.execute('SELECT MAX(id) FROM conversations').fetchone()[0]
+    middle = conn.execute('SELECT timestamp, id FROM conversations ORDER BY timestamp, id LIMIT 1 OFFSET ?',
+                          (total // 2,)).fetchone()
+    middle_cursor = db_manager.encode_cursor(middle[0], middle[1])
+    rng = random.Random(size)
+    saved_ids: List[int] = []
+
+    operations: Dict[str, Callable[[], Any]] = {
+        'history_first_page': lambda: db_manager.get_conversation_history(50, 0),
+        'history_deep_offset': lambda: db_manager.get_conversation_history(50, total // 2),
+        'history_deep_cursor': lambda: db_manager.get_conversation_history_page(50, middle_cursor),
+        'conversation_details': lambda: db_manager.get_conversation_details(rng.randint(1, max_id)),
+        'search_common_term': lambda: db_manager.search_conversations('docker'),
+        'search_two_terms': lambda: db_manager.search_conversations('kubernetes conteneur'),
+        'search_prefix': lambda: db_manager.search_conversations('optim'),
+        'statistics': db_manager.get_statistics,
+        'daily_costs': db_manager.get_daily_costs,
+        'save_batch_100': lambda: saved_ids.extend(db_manager.save_conversations_batch(sample_records(100))),
+        'delete_conversation': lambda: db_manager.delete_conversation(saved_ids.pop()),
+    }
+
+    results = {}
+    for name, operation in operations.items():
+        plans = query_plans(db_manager, operation)
+        durations = time_operation(operation, repeat, budget)
+        results[name] = {"rows": total, "latency": summarize(durations), "plans": plans}
+
+    # Nettoyage : 1 % de conversations plus anciennes que l'historique, supprimées en une fois
+    old = max(1, total // 100)
+    end = HistoryGenerator(HISTORY_DAYS).end - timedelta(days=HISTORY_DAYS + 2)
+    HistoryGenerator(1, seed=size).populate(db_manager, old, start=end - timedelta(days=1), end=end)
+    cleanup = {}
+
+    def cleanup_old():
+        start = time.perf_counter()
+        cleanup["deleted"] = db_manager.cleanup_old_conversations(HISTORY_DAYS + 1)
+        cleanup["duration"] = time.perf_counter() - start
+
+    plans = query_plans(db_manager, cleanup_old)
+    results['cleanup_old_1pct'] = {"rows": total, "deleted": cleanup["deleted"],
+                                   "latency": summarize([cleanup["duration"]]), "plans": plans}
+
+    # Retirer les conversations ajoutées par la mesure d'écriture : la base reste réutilisable
+    for conversation_id in saved_ids:
+        db_manager.delete_conversation(conversation_id)
+    db_manager.close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de DatabaseManager sur des historiques synthétiques")
+    parser.add_argument('--sizes', default='10000,1000000,10000000',
+                        help="Volumes en conversations, séparés par des virgules (défaut: 10000,1000000,10000000)")
+    parser.add_argument('--repeat', type=int, default=20, help="Exécutions par méthode (défaut: 20)")
+    parser.add_argument('--budget', type=float, default=10.0,
+                        help="Temps maximum par méthode en secondes, au moins une exécution (défaut: 10)")
+    parser.add_argument('--rebuild', action='store_true', help="Régénérer les bases synthétiques")
+    parser.add_argument('--output', help="Fichier JSON des résultats (défaut: benchmarks/results/)")
+    parser.add_argument('--baseline', help="Rapport JSON de référence à comparer")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Dégradation tolérée par rapport à la référence (défaut: 0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = {}
+    for size in sizes:
+        print(f"\n{size:,} conversations")
+        for name, result in run_size(size, args.repeat, args.budget, args.rebuild).items():
+            results[f"{name}@{size}"] = result
+            latency = result['latency']
+            warnings = sorted({warning for plan in result['plans'] for warning in plan['warnings']})
+            print(f"  {name:<22} p50 {latency['p50'] * 1000:10.2f} ms  p99 {latency['p99'] * 1000:10.2f} ms"
+                  + (f"  ⚠ {'; '.join(warnings)}" if warnings else ''))
+
+    config = {"sizes": sizes, "repeat": args.repeat, "budget": args.budget,
+              "sqlite": sqlite3.sqlite_version, "history_days": HISTORY_DAYS}
+    print(f"\nRésultats : {write_report('bench_database', config, results, args.output)}")
+
+    if args.baseline:
+        regressions = compare_reports(results, args.baseline, ['latency.p50', 'latency.p99'], args.max_regression)
+        if regressions:
+            print(f"Régressions au-delà de {args.max_regression:.0%} : {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Générateur d'historique synthétique pour les benchmarks de la base.
+
+Remplit une base SQLite (schéma de ``DatabaseManager``, migrations comprises)
+avec des conversations et réponses réalistes : répartition des fournisseurs
+et des routes, comparaisons à trois réponses, taux d'échec, latences et tokens
+par fournisseur, horodatages chronologiques sur plusieurs jours avec un
+profil horaire. L'insertion passe par ``executemany`` par lots, dans les
+mêmes tables et triggers (FTS, agrégats) que l'application.
+
+    python -m benchmarks.generate_history --conversations 1000000 --db benchmarks/data/history.db
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.infrastructure.database import DatabaseManager
+from src.infrastructure.token_usage import request_cost
+
+# Fournisseur : (modèles, part des conversations, taux de succès, latence médiane en s, tokens/s)
+PROVIDERS = {
+    'openai': (['gpt-4o'], 0.35, 0.96, 2.4, 60),
+    'claude': (['claude-3-5-sonnet-20241022'], 0.25, 0.94, 3.0, 50),
+    'groq': (['llama3-8b-8192', 'llama3-70b-8192'], 0.25, 0.98, 0.6, 300),
+}
+# Part des comparaisons (une réponse par fournisseur)
+COMPARE_SHARE = 0.15
+
+ENDPOINTS = {
+    'openai': ['/', '/api/chat', '/api/route', '/api/batch'],
+    'claude': ['/api/claude', '/api/claude/stream', '/api/route'],
+    'groq': ['/api/groq', '/api/groq/stream', '/api/route', '/api/batch'],
+    'compare': ['/api/compare', '/api/compare/stream'],
+}
+
+# Activité relative par heure de la journée (creux la nuit, pics en fin de matinée et d'après-midi)
+HOURLY_PROFILE = [0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.4, 0.7, 1.0, 1.3, 1.5, 1.4,
+                  1.1, 1.2, 1.5, 1.6, 1.4, 1.2, 1.0, 0.9, 0.8, 0.6, 0.4, 0.3]
+
+VOCABULARY = (
+    "comment expliquer le fonctionnement des réseaux de neurones python docker flask base de données "
+    "requête optimisation performance latence cache index sqlite recherche texte modèle langage "
+    "traduction résumé article code fonction classe erreur exception test déploiement serveur "
+    "kubernetes conteneur image volume réseau sécurité authentification jeton api client réponse "
+    "question histoire géographie mathématiques équation intégrale probabilité statistique données "
+    "analyse tableau graphique visualisation rapport synthèse recette cuisine voyage santé sport"
+).split()
+
+
+class HistoryGenerator:
+    """Produit des conversations synthétiques et les insère par lots."""
+
+    def __init__(self, days: int = 90, seed: Optional[int] = None, end: Optional[datetime] = None):
+        """
+        Args:
+            days (int): Période couverte par l'historique, en jours jusqu'à ``end``
+            seed (int): Graine aléatoire, pour des bases reproductibles
+            end (datetime): Date de la conversation la plus récente (défaut: maintenant, UTC)
+        """
+        self.days = days
+        self.random = random.Random(seed)
+        self.end = end or datetime.now(timezone.utc).replace(tzinfo=None)
+        self._providers = list(PROVIDERS)
+        self._weights = [PROVIDERS[name][1] for name in self._providers] + [COMPARE_SHARE]
+        # Répartition cumulée des minutes de la journée selon le profil horaire
+        total = sum(HOURLY_PROFILE)
+        self._hour_cdf = [sum(HOURLY_PROFILE[:hour + 1]) / total for hour in range(24)]
+        # Textes tirés par tranches d'un corpus aléatoire : variés, et bien plus rapides que mot à mot
+        self._corpus = self.random.choices(VOCABULARY, k=1 << 16)
+
+    def _text(self, low: int, high: int) -> str:
+        length = self.random.randint(low, high)
+        start = self.random.randrange(len(self._corpus) - length)
+        return ' '.join(self._corpus[start:start + length])
+
+    def _minute_of_day(self) -> float:
+        draw = self.random.random()
+        hour = next(hour for hour, bound in enumerate(self._hour_cdf) if draw <= bound)
+        return hour * 60 + self.random.random() * 60
+
+    def timestamps(self, count: int, start: datetime, end: datetime) -> Iterator[str]:
+        """Horodatages chronologiques répartis entre ``start`` et ``end`` selon le profil horaire.
+        
+        Produits jour par jour : la mémoire reste bornée par le volume d'une journée.
+        """
+        days = max(1, math.ceil((end - start).total_seconds() / 86400))
+        for day in range(days):
+            # Conversations de ce jour : indices i tels que i * days // count == day
+            day_count = (day + 1) * count // days - day * count // days
+            midnight = (start + timedelta(days=day)).replace(hour=0, minute=0, second=0, microsecond=0)
+            values = sorted(min(max(midnight + timedelta(minutes=self._minute_of_day()), start), end)
+                            for _ in range(day_count))
+            for value in values:
+                yield value.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _response(self, conversation_id: int, provider: str) -> Tuple:
+        models, _, success_rate, median_latency, tokens_per_second = PROVIDERS[provider]
+        model = self.random.choice(models)
+        prompt_tokens = self.random.randint(20, 400)
+        if self.random.random() < success_rate:
+            text = self._text(20, 160)
+            completion_tokens = int(len(text.split()) * 1.3)
+            response_time = median_latency * self.random.lognormvariate(0, 0.45) + \
+                completion_tokens / tokens_per_second * 0.2
+            first_token = min(response_time, median_latency * self.random.lognormvariate(-1.2, 0.4))
+            return (conversation_id, provider, model, text, True, None, round(response_time, 3),
+                    prompt_tokens + completion_tokens, prompt_tokens, completion_tokens,
+                    request_cost(model, prompt_tokens, completion_tokens), round(first_token, 3))
+        error = self.random.choice(["Rate limit exceeded", "Request timed out", "Service unavailable",
+                                    f"Délai dépassé ({median_latency * 10:.1f}s)"])
+        return (conversation_id, provider, model, None, False, error,
+                round(median_latency * self.random.uniform(1, 10), 3), None, None, None, None, None)
+
+    def conversations(self, count: int, first_id: int, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Iterator[Tuple[Tuple, List[Tuple]]]:
+        """
+        Produit ``count`` conversations et leurs réponses (identifiants explicites à partir de ``first_id``).
+
+        Yields:
+            Tuple[Tuple, List[Tuple]]: Ligne de ``conversations`` et lignes de ``responses``
+        """
+        end = end or self.end
+        start = start or end - timedelta(days=self.days)
+        for offset, timestamp in enumerate(self.timestamps(count, start, end)):
+            conversation_id = first_id + offset
+            choice = self.random.choices(self._providers + ['compare'], self._weights)[0]
+            providers = self._providers if choice == 'compare' else [choice]
+            responses = [self._response(conversation_id, provider) for provider in providers]
+            success = any(response[4] for response in responses)
+            conversation = (conversation_id, self._text(5, 40), timestamp, None, choice, success,
+                            self.random.choice(ENDPOINTS[choice]))
+            yield conversation, responses
+
+    def populate(self, db_manager: DatabaseManager, count: int, batch_size: int = 10000,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 bulk: bool = False, progress: bool = False) -> Dict[str, Any]:
+        """
+        Insère ``count`` conversations par lots de ``batch_size`` (une transaction par lot).
+
+        Args:
+            bulk (bool): Charger sans les triggers (index plein texte, agrégats), puis tout recalculer
+                en une passe avec ``DatabaseManager.rebuild_aggregates`` ; plusieurs fois plus rapide
+                pour des millions de lignes, à réserver à une base que l'application n'utilise pas
+
+        Returns:
+            Dict[str, Any]: Conversations et réponses insérées, durée et débit
+        """
+        conn = db_manager._connect()
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall() \
+            if bulk else []
+        for name, _ in triggers:
+            conn.execute(f'DROP TRIGGER {name}')
+        first_id = (conn.execute('SELECT MAX(id) FROM conversations').fetchone()[0] or 0) + 1
+        inserted = {"conversations": 0, "responses": 0}
+        started = time.perf_counter()
+        batch: List[Tuple] = []
+        responses: List[Tuple] = []
+
+        def flush():
+            with conn:
+                conn.executemany('''
+                    INSERT INTO conversations (id, prompt, timestamp, user_session, model_used,
+                                               response_success, endpoint)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+                conn.executemany('''
+                    INSERT INTO responses (conversation_id, provider, model, response_text, success,
+                                           error_message, response_time, tokens_used, prompt_tokens,
+                                           completion_tokens, cost, time_to_first_token)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', responses)
+            inserted["conversations"] += len(batch)
+            inserted["responses"] += len(responses)
+            batch.clear()
+            responses.clear()
+            if progress:
+                rate = inserted["conversations"] / (time.perf_counter() - started)
+                print(f"  {inserted['conversations']:>10} / {count} conversations ({rate:,.0f}/s)",
+                      file=sys.stderr)
+
+        for conversation, conversation_responses in self.conversations(count, first_id, start, end):
+            batch.append(conversation)
+            responses.extend(conversation_responses)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        if triggers:
+            for _, sql in triggers:
+                conn.execute(sql)
+            if progress:
+                print("  recalcul de l'index plein texte et des agrégats", file=sys.stderr)
+            db_manager.rebuild_aggregates()
+
+        # Statistiques du planificateur à jour après un chargement massif
+        conn.execute('ANALYZE')
+        elapsed = time.perf_counter() - started
+        return {**inserted, "elapsed": elapsed,
+                "rate": inserted["conversations"] / elapsed if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère un historique synthétique de conversations")
+    parser.add_argument('--conversations', type=int, default=100000, help="Nombre de conversations (défaut: 100000)")
+    parser.add_argument('--db', default='benchmarks/data/history.db', help="Base SQLite à remplir")
+    parser.add_argument('--days', type=int, default=90, help="Période couverte en jours (défaut: 90)")
+    parser.add_argument('--batch-size', type=int, default=10000, help="Conversations par transaction (défaut: 10000)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (défaut: 42)")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Charger sans triggers puis recalculer index et agrégats (base hors service)")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    result = HistoryGenerator(args.days, args.seed).populate(db_manager, args.conversations,
+                                                             args.batch_size, bulk=args.bulk,
+                                                             progress=True)
+    db_manager.close()
+    print(f"{result['conversations']} conversations et {result['responses']} réponses insérées "
+          f"en {result['elapsed']:.1f}s ({result['rate']:,.0f} conversations/s) dans {args.db} "
+          f"({os.path.getsize(args.db) / 1e6:.0f} Mo)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""Serveur LLM factice parlant les protocoles OpenAI, Anthropic et Groq.
+
+Sert de remplaçant local aux API réelles pour les benchmarks : latence,
+vitesse de streaming et taux d'erreur sont configurables, et aucun appel
+n'est facturé. Les SDK officiels y sont redirigés par leurs variables
+d'environnement ::
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8900
+    GROQ_BASE_URL=http://127.0.0.1:8900
+
+Lancement autonome : ``python -m benchmarks.mock_llm_server --latency 300 --tokens-per-second 80``
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+
+MODELS = {
+    'openai': ['gpt-4o', 'gpt-4o-mini'],
+    'anthropic': ['claude-3-5-sonnet-20241022', 'claude-3-5-haiku-20241022'],
+    'groq': ['llama3-8b-8192', 'llama3-70b-8192'],
+}
+
+WORDS = ("le modèle répond à la question posée avec une réponse factice générée localement "
+         "pour mesurer les performances de l'application sans appeler de fournisseur réel").split()
+
+
+class MockConfig:
+    """Comportement simulé des fournisseurs."""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, tokens_per_second: float = 100.0,
+                 completion_tokens: int = 60, error_rate: float = 0.0, throttle_rate: float = 0.0):
+        """
+        Args:
+            latency (float): Délai avant la réponse (ou le premier fragment) en secondes
+            jitter (float): Variation aléatoire maximum du délai, en secondes
+            tokens_per_second (float): Vitesse de génération en streaming (0 : instantané)
+            completion_tokens (int): Nombre de tokens (mots) de chaque réponse
+            error_rate (float): Proportion de réponses 500
+            throttle_rate (float): Proportion de réponses 429 (avec ``retry-after``)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def token_interval(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def words(self) -> list:
+        return [random.choice(WORDS) for _ in range(self.completion_tokens)]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Routes des trois fournisseurs ; ``self.server.config`` porte le comportement simulé."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> MockConfig:
+        return self.server.config
+
+    def _provider(self) -> str:
+        if self.path.startswith('/openai/'):
+            return 'groq'
+        # OpenAI et Anthropic partagent /v1/models : Anthropic s'identifie par ses en-têtes
+        if 'anthropic-version' in self.headers or self.path.startswith('/v1/messages'):
+            return 'anthropic'
+        return 'openai'
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            provider = self._provider()
+            if provider == 'anthropic':
+                data = [{"type": "model", "id": model, "display_name": model,
+                         "created_at": "2024-10-22T00:00:00Z"} for model in MODELS[provider]]
+                self._json(200, {"data": data, "has_more": False,
+                                 "first_id": data[0]["id"], "last_id": data[-1]["id"]})
+            else:
+                self._json(200, {"object": "list", "data": [
+                    {"id": model, "object": "model", "created": 0, "owned_by": provider}
+                    for model in MODELS[provider]]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        provider = self._provider()
+        if not self.path.endswith(('/chat/completions', '/messages')):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+
+        time.sleep(self.config.delay())
+        draw = random.random()
+        if draw < self.config.throttle_rate:
+            self._json(429, {"error": {"type": "rate_limit_error", "message": "Rate limit exceeded"}},
+                       {"retry-after": "1"})
+            return
+        if draw < self.config.throttle_rate + self.config.error_rate:
+            self._json(500, {"error": {"type": "api_error", "message": "Erreur simulée"}})
+            return
+
+        prompt_tokens = len(json.dumps(body.get('messages', []))) // 4
+        words = self.config.words()
+        model = body.get('model', MODELS[provider][0])
+        if body.get('stream'):
+            events = (self._anthropic_events(model, words, prompt_tokens) if provider == 'anthropic'
+                      else self._openai_events(provider, model, words, prompt_tokens, body))
+            self._stream(events)
+        elif provider == 'anthropic':
+            self._json(200, {
+                "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": ' '.join(words)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": len(words)},
+            })
+        else:
+            self._json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": ' '.join(words)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                          "total_tokens": prompt_tokens + len(words)},
+            })
+
+    def _openai_events(self, provider: str, model: str, words: list, prompt_tokens: int,
+                       body: Dict[str, Any]) -> Iterator[Optional[Dict[str, Any]]]:
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> Dict[str, Any]:
+            return {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra}
+
+        for index, word in enumerate(words):
+            yield chunk({"content": word if index == 0 else f" {word}"})
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        if provider == 'groq':
+            yield chunk({}, "stop", x_groq={"id": chunk_id, "usage": usage})
+        else:
+            yield chunk({}, "stop")
+            if (body.get('stream_options') or {}).get('include_usage'):
+                yield {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [], "usage": usage}
+        yield None
+
+    def _anthropic_events(self, model: str, words: list, prompt_tokens: int) -> Iterator[Dict[str, Any]]:
+        yield {"type": "message_start", "message": {
+            "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": model,
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": prompt_tokens, "output_tokens": 1}}}
+        yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+        for index, word in enumerate(words):
+            yield {"type": "content_block_delta", "index": 0,
+                   "delta": {"type": "text_delta", "text": word if index == 0 else f" {word}"}}
+        yield {"type": "content_block_stop", "index": 0}
+        yield {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+               "usage": {"output_tokens": len(words)}}
+        yield {"type": "message_stop"}
+
+    def _stream(self, events: Iterator[Optional[Dict[str, Any]]]):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        interval = self.config.token_interval()
+        try:
+            for event in events:
+                if event is None:
+                    data = b'data: [DONE]\n\n'
+                elif 'object' in event:
+                    data = f"data: {json.dumps(event)}\n\n".encode()
+                else:
+                    data = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+                if self._is_token(event):
+                    time.sleep(interval)
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # Client déconnecté (flux abandonné)
+            self.close_connection = True
+
+    @staticmethod
+    def _is_token(event: Optional[Dict[str, Any]]) -> bool:
+        # Fragment de texte : espacé selon la vitesse de génération simulée
+        if event is None:
+            return False
+        if event.get('type') == 'content_block_delta':
+            return True
+        return bool(event.get('choices')) and 'content' in event['choices'][0]['delta']
+
+    def _json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockLLMServer:
+    """Serveur factice lancé dans un thread, pour un benchmark dans le même processus."""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), MockLLMHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or MockConfig()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-llm', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self) -> Dict[str, str]:
+        """Variables d'environnement redirigeant les SDK vers ce serveur."""
+        return {
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'ANTHROPIC_BASE_URL': self.url,
+            'GROQ_BASE_URL': self.url,
+            'OPENAI_API_KEY': 'mock',
+            'ANTHROPIC_API_KEY': 'mock',
+            'GROQ_API_KEY': 'mock',
+        }
+
+    def start(self) -> 'MockLLMServer':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Options de comportement du serveur factice, communes aux scripts de benchmark."""
+    parser.add_argument('--latency', type=float, default=200, help="Délai avant réponse en ms (défaut: 200)")
+    parser.add_argument('--jitter', type=float, default=50, help="Variation du délai en ms (défaut: 50)")
+    parser.add_argument('--tokens-per-second', type=float, default=100,
+                        help="Vitesse de streaming, 0 = instantané (défaut: 100)")
+    parser.add_argument('--completion-tokens', type=int, default=60, help="Tokens par réponse (défaut: 60)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proportion de réponses 500 (défaut: 0)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Proportion de réponses 429 (défaut: 0)")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                      tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+                      error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur LLM factice (OpenAI, Anthropic, Groq)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(config_from_args(args), args.host, args.port)
+    print(f"Serveur factice sur {server.url}")
+    for name, value in server.environment().items():
+        print(f"  {name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
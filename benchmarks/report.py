@@ -0,0 +1,110 @@
+"""Statistiques et rapports JSON communs aux scripts de benchmark."""
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentile ``q`` (0-100) par rang le plus proche, None si aucune mesure."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Résumé d'une série de durées en secondes : moyenne, p50, p95, p99 et maximum."""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit courant du dépôt, pour rattacher les résultats à une version du code."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_report(name: str, config: Dict[str, Any], results: Dict[str, Any],
+                 output: Optional[str] = None) -> str:
+    """
+    Écrit les résultats d'un benchmark en JSON.
+
+    Args:
+        name (str): Nom du benchmark (préfixe du fichier)
+        config (Dict[str, Any]): Paramètres du run
+        results (Dict[str, Any]): Résultats par scénario
+        output (str): Fichier de sortie (défaut: benchmarks/results/<nom>-<date>.json)
+
+    Returns:
+        str: Chemin du fichier écrit
+    """
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    report = {
+        "benchmark": name,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return output
+
+
+def compare_reports(results: Dict[str, Any], baseline_path: str, metrics: List[str],
+                    max_regression: float) -> List[str]:
+    """
+    Compare des résultats à un rapport de référence et affiche l'écart de chaque métrique.
+
+    Args:
+        results (Dict[str, Any]): Résultats par scénario du run courant
+        baseline_path (str): Rapport JSON de référence
+        metrics (List[str]): Chemins des métriques comparées (ex. ``latency.p99``), plus bas = meilleur
+        max_regression (float): Dégradation tolérée, en proportion (0.2 = 20 %)
+
+    Returns:
+        List[str]: Régressions dépassant la tolérance
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    def lookup(data: Dict[str, Any], path: str) -> Optional[float]:
+        for key in path.split('.'):
+            if not isinstance(data, dict) or data.get(key) is None:
+                return None
+            data = data[key]
+        return data
+
+    regressions = []
+    print(f"\nComparaison avec {baseline_path}")
+    for scenario, current in results.items():
+        for metric in metrics:
+            before, after = lookup(baseline.get(scenario, {}), metric), lookup(current, metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            print(f"  {scenario:<16} {metric:<14} {before:10.4f} -> {after:10.4f}  ({change:+.1%})")
+            if change > max_regression:
+                regressions.append(f"{scenario} {metric} {change:+.1%}")
+    return regressions
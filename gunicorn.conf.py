@@ -0,0 +1,56 @@
+# Configuration Gunicorn pour la production
+#
+# Lancement : gunicorn -c gunicorn.conf.py
+# (sans application en ligne de commande : elle primerait sur wsgi_app ci-dessous)
+#
+# Toutes les valeurs sont lues depuis l'environnement, comme FLASK_PORT dans
+# app.py. Le type de worker est choisi selon l'usage :
+#   - gthread (défaut) : threads natifs, aucune dépendance supplémentaire
+#   - gevent           : greenlets, adapté aux nombreux flux SSE longs
+#   - uvicorn          : workers ASGI servant asgi:application
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+# Adresse d'écoute
+bind = f"0.0.0.0:{int(os.getenv('FLASK_PORT', 8000))}"
+
+# Un processus par cœur disponible par défaut ; les appels IA sont limités par
+# les entrées/sorties, la concurrence vient des threads/greenlets de chaque worker
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count())))
+
+_worker_type = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+worker_class = WORKER_CLASSES.get(_worker_type, _worker_type)
+
+# Threads par worker (gthread) : chaque requête ou flux SSE en cours occupe un thread
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+# Connexions simultanées par worker (gevent / uvicorn)
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Application servie selon le type de worker : les workers uvicorn attendent
+# l'application ASGI, les autres l'application Flask (WSGI)
+wsgi_app = 'asgi:application' if _worker_type == 'uvicorn' else 'app:app'
+
+# Chaque worker importe l'application et démarre ses propres threads d'arrière-plan :
+# file d'écriture différée, rafraîchissement du registre de modèles et planificateur
+# de rétention (ce dernier ne tourne que dans un worker, voir RetentionJob.schedule)
+
+# Délais : les réponses IA peuvent prendre plusieurs dizaines de secondes
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recyclage périodique des workers pour contenir la croissance mémoire
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Journaux sur la sortie standard (collectés par Docker)
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
@@ -1,6 +1,69 @@
-def main():
-    print("Hello from prompt assistant IA!")
+import argparse
+import os
+import sys
+
+from src.application.batch import BatchProcessor
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Analyse les arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(
+        description="Traitement par lots de prompts (JSONL) avec OpenAI, Claude et Groq.",
+        epilog="Chaque ligne d'entrée est un objet JSON : "
+               '{"prompt": "...", "provider": "groq", "model": "llama3-8b-8192", "id": "..."}. '
+               "Relancer la même commande reprend le lot là où il s'était arrêté."
+    )
+    parser.add_argument('input', help="Fichier JSONL des prompts")
+    parser.add_argument('-o', '--output', help="Fichier JSONL des résultats (défaut: <entrée>.results.jsonl)")
+    parser.add_argument('--provider', help="Fournisseur par défaut : openai, claude, groq ou auto (routeur)")
+    parser.add_argument('--model', help="Modèle par défaut")
+    parser.add_argument('--policy', help="Politique du routeur pour provider=auto")
+    parser.add_argument('--workers', type=int, help="Prompts traités simultanément (défaut: BATCH_MAX_WORKERS ou 8)")
+    parser.add_argument('--rate', type=float, help="Débit maximum en prompts par seconde (défaut: BATCH_RATE_LIMIT ou 0)")
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache de réponses")
+    parser.add_argument('--restart', action='store_true', help="Recommencer le lot depuis le début (remplace les résultats)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"Fichier introuvable: {args.input}", file=sys.stderr)
+        return 2
+    output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+
+    defaults = {key: value for key, value in
+                (('provider', args.provider), ('model', args.model), ('policy', args.policy))
+                if value}
+    if args.no_cache:
+        defaults['cache'] = False
+
+    # Import différé : charge la configuration et les clients IA de l'application
+    from app import batch_response
+    processor = BatchProcessor(lambda item: batch_response(item, endpoint='main.py'),
+                               max_workers=args.workers, rate_limit=args.rate)
+
+    counts = {'done': 0}
+
+    def progress(result):
+        counts['done'] += 1
+        if counts['done'] % 100 == 0:
+            print(f"{counts['done']} prompts traités", file=sys.stderr)
+
+    try:
+        summary = processor.process_file(args.input, output, resume=not args.restart,
+                                         defaults=defaults, on_result=progress)
+    except KeyboardInterrupt:
+        print(f"Interrompu après {counts['done']} prompts : relancez la commande pour reprendre",
+              file=sys.stderr)
+        processor.shutdown()
+        return 130
+
+    print(f"{summary['processed']} prompts traités ({summary['succeeded']} réussis, "
+          f"{summary['failed']} en échec, {summary['skipped']} déjà faits) "
+          f"en {summary['elapsed']:.1f}s -> {output}")
+    return 0 if summary['failed'] == 0 else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
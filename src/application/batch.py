@@ -0,0 +1,217 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from src.infrastructure.rate_limiter import TokenBucket
+
+
+class BatchProcessor:
+    """Traite des lots de prompts (JSONL) avec un pool de threads borné.
+
+    Chaque ligne d'entrée est un objet JSON ``{"prompt": ..., "provider": ...,
+    "model": ..., "id": ...}``. Les résultats sont produits au fur et à mesure
+    qu'ils se terminent (donc dans le désordre), chacun portant le numéro de sa
+    ligne d'entrée : un fichier de résultats interrompu permet de reprendre le
+    lot en sautant les lignes déjà traitées. Le nombre de requêtes en cours est
+    borné, ce qui permet de traiter des fichiers de plusieurs dizaines de
+    milliers de lignes sans les charger en mémoire.
+    """
+
+    def __init__(self, generate: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 max_workers: Optional[int] = None, rate_limit: Optional[float] = None):
+        """
+        Initialise le processeur.
+
+        Args:
+            generate (Callable): Traite une ligne du lot et retourne un dictionnaire de réponse
+            max_workers (int): Nombre maximum de prompts traités simultanément (défaut: BATCH_MAX_WORKERS ou 8)
+            rate_limit (float): Débit maximum en prompts par seconde, 0 sans limite (défaut: BATCH_RATE_LIMIT ou 0).
+                Les limites de chaque fournisseur restent appliquées par le gouverneur de débit des clients
+        """
+        self.generate = generate
+        self.max_workers = max_workers or int(os.getenv('BATCH_MAX_WORKERS', 8))
+        self.rate_limit = rate_limit if rate_limit is not None else float(os.getenv('BATCH_RATE_LIMIT', 0))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch')
+
+    @staticmethod
+    def parse(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Lit les lignes JSONL d'un lot.
+
+        Args:
+            lines (Iterable[str]): Lignes du fichier (les lignes vides sont ignorées)
+
+        Yields:
+            Tuple[int, Dict[str, Any]]: Numéro de ligne (à partir de 1) et requête ;
+            une ligne invalide donne une requête portant ``error``
+        """
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, {"error": f"JSON invalide: {e}"}
+                continue
+            if not isinstance(item, dict):
+                yield line_number, {"error": "Chaque ligne doit être un objet JSON"}
+            elif not item.get('prompt'):
+                yield line_number, {**item, "error": "Le prompt est requis"}
+            else:
+                yield line_number, item
+
+    @staticmethod
+    def completed_lines(path: str) -> Set[int]:
+        """
+        Retourne les lignes d'entrée déjà traitées d'après un fichier de résultats.
+
+        Une dernière ligne tronquée (arrêt pendant l'écriture) est ignorée.
+        """
+        completed: Set[int] = set()
+        if not os.path.exists(path):
+            return completed
+        with open(path, encoding='utf-8') as results:
+            for line in results:
+                try:
+                    completed.add(int(json.loads(line)['line']))
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return completed
+
+    def run(self, items: Iterable[Tuple[int, Dict[str, Any]]],
+            skip: Optional[Set[int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Traite les requêtes du lot et produit chaque résultat dès qu'il est prêt.
+
+        Args:
+            items (Iterable[Tuple[int, Dict[str, Any]]]): Requêtes numérotées (voir ``parse``)
+            skip (Set[int]): Numéros de ligne à ne pas traiter (reprise)
+
+        Yields:
+            Dict[str, Any]: Résultat avec ``line``, ``id``, ``provider``, ``model``,
+            ``success``, ``text`` ou ``error``, ``usage`` et ``response_time``
+        """
+        skip = skip or set()
+        bucket = TokenBucket(self.rate_limit, max(1.0, self.rate_limit))
+        # Au plus deux requêtes en attente par thread : le fichier est lu au fil de l'eau
+        max_pending = self.max_workers * 2
+        pending: Dict[Any, Tuple[int, Dict[str, Any]]] = {}
+
+        def drain(block: bool) -> Iterator[Dict[str, Any]]:
+            done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                line_number, item = pending.pop(future)
+                yield self._result(line_number, item, future.result())
+
+        try:
+            for line_number, item in items:
+                if line_number in skip:
+                    continue
+                if 'error' in item:
+                    yield self._result(line_number, item, {"success": False, "error": item['error']})
+                    continue
+                while len(pending) >= max_pending:
+                    yield from drain(block=True)
+                while not bucket.try_take(time.monotonic()):
+                    time.sleep(bucket.wait_time(time.monotonic()))
+                pending[self.executor.submit(self._timed, item)] = (line_number, item)
+                yield from drain(block=False)
+            while pending:
+                yield from drain(block=True)
+        finally:
+            # Lot abandonné (client déconnecté) : les prompts pas encore commencés sont annulés
+            for future in pending:
+                future.cancel()
+
+    def process_file(self, input_path: str, output_path: str, resume: bool = True,
+                     defaults: Optional[Dict[str, Any]] = None,
+                     on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Traite un fichier JSONL et ajoute chaque résultat au fichier de sortie dès qu'il est prêt.
+
+        Args:
+            input_path (str): Fichier JSONL des prompts
+            output_path (str): Fichier JSONL des résultats
+            resume (bool): Reprendre un fichier de résultats existant (sinon il est remplacé)
+            defaults (Dict[str, Any]): Valeurs par défaut des requêtes (ex. ``provider``, ``model``)
+            on_result (Callable): Appelé avec chaque résultat écrit (suivi de progression)
+
+        Returns:
+            Dict[str, Any]: Nombre de résultats écrits, réussis, en échec et de lignes sautées
+        """
+        skip = self.completed_lines(output_path) if resume else set()
+        if resume:
+            self._truncate_partial_line(output_path)
+        summary = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": len(skip)}
+        start = time.monotonic()
+
+        with open(input_path, encoding='utf-8') as source, \
+                open(output_path, 'a' if resume else 'w', encoding='utf-8') as output:
+            items = ((line_number, {**(defaults or {}), **item}) for line_number, item in self.parse(source))
+            for result in self.run(items, skip):
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                # Chaque résultat est écrit immédiatement : un arrêt ne perd que les prompts en cours
+                output.flush()
+                summary["processed"] += 1
+                summary["succeeded" if result['success'] else "failed"] += 1
+                if on_result is not None:
+                    on_result(result)
+
+        summary["elapsed"] = time.monotonic() - start
+        return summary
+
+    def shutdown(self):
+        """Arrête le pool de threads."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _timed(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            result = dict(self.generate(item))
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        result.setdefault("response_time", time.monotonic() - start)
+        return result
+
+    @staticmethod
+    def _result(line_number: int, item: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Résultat écrit pour une ligne du lot."""
+        return {
+            "line": line_number,
+            "id": item.get('id'),
+            "provider": result.get('provider', item.get('provider')),
+            "model": result.get('model', item.get('model')),
+            "success": bool(result.get('success')),
+            "text": result.get('text'),
+            "error": None if result.get('success') else result.get('error'),
+            "usage": result.get('usage'),
+            "response_time": result.get('response_time'),
+        }
+
+    @staticmethod
+    def _truncate_partial_line(path: str):
+        # Retirer une dernière ligne incomplète avant d'ajouter de nouveaux résultats
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as results:
+            end = results.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            results.seek(end - 1)
+            if results.read(1) == b'\n':
+                return
+            # Remonter bloc par bloc jusqu'au dernier saut de ligne
+            position = end
+            while position > 0:
+                size = min(4096, position)
+                position -= size
+                results.seek(position)
+                block = results.read(size)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    results.truncate(position + newline + 1)
+                    return
+            results.truncate(0)
@@ -0,0 +1,224 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Any, Iterable, Iterator, Optional
+
+from src.application.recorder import STREAM_ERROR_PREFIX
+
+
+class FanOutExecutor:
+    """Exécute les appels à plusieurs fournisseurs IA en parallèle.
+
+    Chaque fournisseur dispose de son propre délai maximum et l'ensemble de la
+    requête est borné par un budget global : la latence d'une comparaison est
+    celle du fournisseur le plus lent (plafonnée), et non la somme des trois.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 provider_timeout: Optional[float] = None,
+                 total_timeout: Optional[float] = None):
+        """
+        Initialise le pool de threads partagé.
+
+        Args:
+            max_workers (int): Nombre maximum d'appels simultanés (défaut: FAN_OUT_MAX_WORKERS ou 32)
+            provider_timeout (float): Délai par fournisseur en secondes (défaut: COMPARE_PROVIDER_TIMEOUT ou 30)
+            total_timeout (float): Budget global de la requête en secondes (défaut: COMPARE_TOTAL_TIMEOUT ou 45)
+        """
+        self.max_workers = max_workers or int(os.getenv('FAN_OUT_MAX_WORKERS', 32))
+        self.provider_timeout = provider_timeout or float(os.getenv('COMPARE_PROVIDER_TIMEOUT', 30))
+        self.total_timeout = total_timeout or float(os.getenv('COMPARE_TOTAL_TIMEOUT', 45))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='fan-out')
+
+    def run(self, tasks: Dict[str, Callable[[], Dict[str, Any]]],
+            provider_timeouts: Optional[Dict[str, float]] = None,
+            total_timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Lance toutes les tâches simultanément et collecte les résultats.
+
+        Args:
+            tasks (Dict[str, Callable]): Fonctions sans argument par fournisseur, retournant un dictionnaire de réponse
+            provider_timeouts (Dict[str, float]): Délais spécifiques par fournisseur (optionnel)
+            total_timeout (float): Budget global pour cette requête (optionnel, plafonné par la configuration)
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Résultats par fournisseur, dans l'ordre des tâches ;
+            les fournisseurs hors délai reçoivent un marqueur ``timeout``
+        """
+        provider_timeouts = provider_timeouts or {}
+        budget = min(total_timeout or self.total_timeout, self.total_timeout)
+        start = time.monotonic()
+
+        futures = {}
+        deadlines = {}
+        for name, task in tasks.items():
+            futures[name] = self.executor.submit(self._timed, task)
+            timeout = min(provider_timeouts.get(name, self.provider_timeout), budget)
+            deadlines[name] = start + timeout
+
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = dict(futures)
+        while pending:
+            now = time.monotonic()
+
+            # Marquer les fournisseurs dont le délai est écoulé
+            for name in [n for n in pending if deadlines[n] <= now]:
+                pending.pop(name).cancel()
+                results[name] = self._timeout_result(name, deadlines[name] - start)
+
+            if not pending:
+                break
+
+            next_deadline = min(deadlines[n] for n in pending)
+            done, _ = wait(list(pending.values()),
+                           timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            for name in [n for n, f in pending.items() if f in done]:
+                future = pending.pop(name)
+                results[name] = self._collect(name, future)
+
+        return {name: results[name] for name in tasks}
+
+    def stream(self, generators: Dict[str, Callable[[], Iterable[str]]],
+               provider_timeouts: Optional[Dict[str, float]] = None,
+               total_timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lance tous les flux simultanément et entrelace leurs fragments.
+
+        Args:
+            generators (Dict[str, Callable]): Fonctions sans argument par fournisseur, retournant un itérable de fragments
+            provider_timeouts (Dict[str, float]): Délais spécifiques par fournisseur (optionnel)
+            total_timeout (float): Budget global pour cette requête (optionnel, plafonné par la configuration)
+
+        Yields:
+            Dict[str, Any]: Événements ``delta`` (fragment d'un fournisseur), ``done``, ``error`` ou
+            ``timeout`` (fin d'un fournisseur), puis un unique événement ``summary`` récapitulatif
+        """
+        provider_timeouts = provider_timeouts or {}
+        budget = min(total_timeout or self.total_timeout, self.total_timeout)
+        start = time.monotonic()
+        events: queue.Queue = queue.Queue()
+        # Un signal d'arrêt par fournisseur : levé à son délai, ou pour tous à la fin du flux
+        cancelled = {name: threading.Event() for name in generators}
+
+        summary: Dict[str, Dict[str, Any]] = {}
+        deadlines = {}
+        for name, generator in generators.items():
+            summary[name] = {"success": None, "chunks": 0, "characters": 0,
+                             "time_to_first_token": None, "response_time": None}
+            deadlines[name] = start + min(provider_timeouts.get(name, self.provider_timeout), budget)
+            self.executor.submit(self._pump, name, generator, events, cancelled[name])
+
+        pending = set(generators)
+        try:
+            while pending:
+                now = time.monotonic()
+                for name in [n for n in pending if deadlines[n] <= now]:
+                    pending.discard(name)
+                    cancelled[name].set()
+                    error = self._timeout_result(name, deadlines[name] - start)["error"]
+                    summary[name].update({"success": False, "timeout": True, "error": error})
+                    yield {"type": "timeout", "provider": name, "error": error}
+
+                if not pending:
+                    break
+
+                next_deadline = min(deadlines[n] for n in pending)
+                try:
+                    kind, name, payload = events.get(timeout=max(0.0, next_deadline - time.monotonic()))
+                except queue.Empty:
+                    continue
+
+                if name not in pending:
+                    # Fragment arrivé après l'expiration du délai du fournisseur
+                    continue
+
+                elapsed = time.monotonic() - start
+                stats = summary[name]
+                if kind == "delta":
+                    if stats["time_to_first_token"] is None:
+                        stats["time_to_first_token"] = elapsed
+                    stats["chunks"] += 1
+                    stats["characters"] += len(payload)
+                    yield {"type": "delta", "provider": name, "text": payload}
+                else:
+                    pending.discard(name)
+                    stats["response_time"] = elapsed
+                    stats["success"] = kind == "done"
+                    if kind == "error":
+                        stats["error"] = payload
+                        yield {"type": "error", "provider": name, "error": payload}
+                    else:
+                        yield {"type": "done", "provider": name}
+        finally:
+            # Prévenir les producteurs encore actifs (client déconnecté)
+            for event in cancelled.values():
+                event.set()
+
+        yield {"type": "summary", "summary": summary,
+               "response_time": time.monotonic() - start}
+
+    @staticmethod
+    def _pump(name: str, generator: Callable[[], Iterable[str]],
+              events: queue.Queue, cancelled: threading.Event):
+        """Consomme le flux d'un fournisseur et publie ses fragments dans la file commune.
+
+        Le flux est fermé dès le premier fragment reçu après l'annulation (délai du
+        fournisseur dépassé ou client parti) : pour un abonné à un flux partagé, la
+        fermeture le désabonne, et le flux amont est fermé s'il n'en reste aucun.
+        """
+        chunks = None
+        try:
+            chunks = generator()
+            for chunk in chunks:
+                if cancelled.is_set():
+                    return
+                if chunk.startswith(STREAM_ERROR_PREFIX):
+                    # Les clients signalent une erreur de flux par un dernier fragment « Erreur: ... »
+                    events.put(("error", name, chunk[len(STREAM_ERROR_PREFIX):]))
+                    return
+                if chunk:
+                    events.put(("delta", name, chunk))
+            events.put(("done", name, None))
+        except Exception as e:
+            events.put(("error", name, str(e)))
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _timed(task: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Exécute une tâche en mesurant sa durée réelle."""
+        start = time.monotonic()
+        result = dict(task())
+        result.setdefault("response_time", time.monotonic() - start)
+        return result
+
+    def _collect(self, name: str, future) -> Dict[str, Any]:
+        """Récupère le résultat d'une tâche terminée en convertissant les exceptions."""
+        try:
+            return future.result()
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "provider": name
+            }
+
+    def _timeout_result(self, name: str, timeout: float) -> Dict[str, Any]:
+        """Construit le marqueur retourné pour un fournisseur hors délai."""
+        return {
+            "success": False,
+            "error": f"Délai dépassé ({timeout:.1f}s)",
+            "timeout": True,
+            "provider": name
+        }
+
+    def shutdown(self):
+        """Arrête le pool sans attendre les appels encore en cours."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,180 @@
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Préfixe des fragments d'erreur émis par les clients en streaming
+STREAM_ERROR_PREFIX = "Erreur: "
+
+
+class RequestRecorder:
+    """Enregistre chaque requête servie (prompt et résultat de chaque fournisseur) dans l'historique.
+
+    Les enregistrements passent par la file d'écriture différée : aucune route
+    n'attend le disque. Pour les flux, le texte assemblé est enregistré à la fin
+    du flux (ou à la déconnexion du client, avec ce qui a déjà été reçu).
+    """
+
+    def __init__(self, write_queue=None):
+        """
+        Args:
+            write_queue (WriteBehindQueue): File d'écriture différée (None : rien n'est enregistré)
+        """
+        self.write_queue = write_queue
+
+    @staticmethod
+    def response(provider: str, model: Optional[str], result: Dict[str, Any],
+                 response_time: Optional[float] = None,
+                 time_to_first_token: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Convertit le résultat d'un fournisseur en réponse à enregistrer.
+
+        Args:
+            provider (str): Fournisseur IA (openai, claude, groq)
+            model (str): Modèle appelé
+            result (Dict[str, Any]): Dictionnaire de réponse (``success``, ``text``, ``error``, ``usage``...)
+            response_time (float): Durée de l'appel, si le résultat ne la porte pas
+            time_to_first_token (float): Délai avant le premier fragment (flux)
+
+        Returns:
+            Dict[str, Any]: Réponse au format de ``DatabaseManager.save_conversations_batch``
+        """
+        usage = result.get('usage') or {}
+        return {
+            "provider": provider,
+            "model": result.get('model') or model,
+            "response_text": result.get('text'),
+            "success": bool(result.get('success')),
+            "error_message": None if result.get('success') else result.get('error'),
+            "response_time": result.get('response_time', response_time),
+            "time_to_first_token": result.get('time_to_first_token', time_to_first_token),
+            "prompt_tokens": usage.get('prompt_tokens'),
+            "completion_tokens": usage.get('completion_tokens'),
+            "cost": usage.get('cost'),
+        }
+
+    def record(self, endpoint: str, prompt: str, responses: List[Dict[str, Any]],
+               model_used: Optional[str] = None) -> bool:
+        """
+        Soumet une conversation et ses réponses à la file d'écriture.
+
+        Args:
+            endpoint (str): Route ayant servi la requête (ex. chat, compare, groq_stream)
+            prompt (str): Le prompt de l'utilisateur
+            responses (List[Dict[str, Any]]): Réponses construites par ``response``
+            model_used (str): Fournisseur ou mode retenu (défaut: fournisseur de l'unique réponse)
+
+        Returns:
+            bool: True si l'enregistrement a été accepté
+        """
+        if self.write_queue is None or not prompt:
+            return False
+        if model_used is None:
+            model_used = responses[0]['provider'] if len(responses) == 1 else endpoint
+        try:
+            return self.write_queue.submit({
+                "prompt": prompt,
+                "endpoint": endpoint,
+                "model_used": model_used,
+                "response_success": any(response['success'] for response in responses),
+                "responses": responses,
+            })
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de la requête: {e}")
+            return False
+
+    def call(self, endpoint: str, prompt: str, provider: str, model: Optional[str],
+             generate: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Appelle un fournisseur, enregistre le résultat et le retourne."""
+        start = time.monotonic()
+        result = generate()
+        self.record(endpoint, prompt, [self.response(provider, model, result, time.monotonic() - start)])
+        return result
+
+    def stream(self, endpoint: str, prompt: str, provider: str, model: Optional[str],
+               chunks: Iterable[str], usage: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Relaie un flux et l'enregistre à sa fin avec le texte assemblé.
+
+        Args:
+            chunks (Iterable[str]): Fragments de la réponse
+            usage (Dict[str, Any]): Dictionnaire rempli par le client à la fin du flux (``on_usage``),
+                vide si le flux amont a été partagé avec une autre requête
+
+        Yields:
+            str: Les fragments, inchangés
+        """
+        start = time.monotonic()
+        first_token = None
+        parts: List[str] = []
+        completed = False
+        try:
+            for chunk in chunks:
+                if first_token is None:
+                    first_token = time.monotonic() - start
+                parts.append(chunk)
+                yield chunk
+            completed = True
+        finally:
+            self._record_stream(endpoint, prompt, provider, model, parts, completed, usage,
+                                time.monotonic() - start, first_token)
+
+    def compare_stream(self, endpoint: str, prompt: str, events: Iterable[Dict[str, Any]],
+                       models: Dict[str, str], usages: Optional[Dict[str, Dict[str, Any]]] = None,
+                       skipped: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Relaie les événements d'une comparaison en flux (``FanOutExecutor.stream``) et
+        enregistre une conversation avec une réponse par fournisseur à la fin.
+
+        Args:
+            events (Iterable[Dict[str, Any]]): Événements delta, done, error, timeout et summary
+            models (Dict[str, str]): Modèle de chaque fournisseur
+            usages (Dict[str, Dict[str, Any]]): Consommation de chaque fournisseur, remplie à la fin de son flux
+            skipped (Dict[str, Dict[str, Any]]): Fournisseurs écartés (disjoncteur ouvert)
+
+        Yields:
+            Dict[str, Any]: Les événements, inchangés
+        """
+        texts: Dict[str, List[str]] = {name: [] for name in models}
+        summary: Dict[str, Dict[str, Any]] = {}
+        try:
+            for event in events:
+                if event['type'] == 'delta':
+                    texts[event['provider']].append(event['text'])
+                elif event['type'] == 'summary':
+                    summary = event['summary']
+                yield event
+        finally:
+            self._record_compare(endpoint, prompt, texts, summary, models, usages, skipped)
+
+    def _record_stream(self, endpoint: str, prompt: str, provider: str, model: Optional[str],
+                       parts: List[str], completed: bool, usage: Optional[Dict[str, Any]],
+                       elapsed: float, first_token: Optional[float]):
+        result = self._stream_result(parts, completed, None if completed else "Flux interrompu")
+        result['usage'] = usage
+        self.record(endpoint, prompt, [self.response(provider, model, result, elapsed, first_token)])
+
+    def _record_compare(self, endpoint: str, prompt: str, texts: Dict[str, List[str]],
+                        summary: Dict[str, Dict[str, Any]], models: Dict[str, str],
+                        usages: Optional[Dict[str, Dict[str, Any]]],
+                        skipped: Optional[Dict[str, Dict[str, Any]]]):
+        usages = usages or {}
+        responses = [self.response(name, None, result) for name, result in (skipped or {}).items()]
+        for name, parts in texts.items():
+            stats = summary.get(name, {})
+            result = self._stream_result(parts, bool(stats.get('success')),
+                                         stats.get('error', "Flux interrompu"))
+            result['usage'] = usages.get(name)
+            responses.append(self.response(name, models[name], result, stats.get('response_time'),
+                                           stats.get('time_to_first_token')))
+        if responses:
+            self.record(endpoint, prompt, responses, model_used='compare')
+
+    @staticmethod
+    def _stream_result(parts: List[str], completed: bool, error: Optional[str]) -> Dict[str, Any]:
+        """Résultat d'un flux à partir de ses fragments ; les clients signalent une erreur par un dernier fragment « Erreur: ... »."""
+        if parts and parts[-1].startswith(STREAM_ERROR_PREFIX):
+            return {"success": False, "text": ''.join(parts[:-1]) or None,
+                    "error": parts[-1][len(STREAM_ERROR_PREFIX):]}
+        text = ''.join(parts) or None
+        if completed:
+            return {"success": True, "text": text}
+        return {"success": False, "text": text, "error": error}
@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.infrastructure.archive import ConversationArchive
+
+# Verrou de fichier entre processus (absent sous Windows : chaque processus planifie)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class RetentionJob:
+    """Nettoyage de l'historique par lots, en arrière-plan.
+
+    Les conversations plus anciennes que la rétention sont supprimées par lots
+    de ``batch_size``, une courte transaction par lot suivie d'une pause : les
+    écritures de l'application passent entre deux lots au lieu d'attendre la
+    fin d'une suppression géante. Chaque lot peut être déplacé dans l'archive
+    froide (segments compressés toujours consultables) avant d'être supprimé,
+    et les pages libérées sont rendues au disque par VACUUM incrémental à la
+    fin du nettoyage. L'avancement est consultable pendant l'exécution ; un
+    planificateur optionnel relance le nettoyage à intervalle régulier.
+    """
+
+    def __init__(self, db_manager, days: Optional[int] = None, batch_size: Optional[int] = None,
+                 pause: Optional[float] = None, interval: Optional[float] = None,
+                 archive: Optional[ConversationArchive] = None, vacuum: Optional[bool] = None,
+                 vacuum_pages: Optional[int] = None):
+        """
+        Initialise la tâche (sans la démarrer).
+
+        Args:
+            db_manager (DatabaseManager): Gestionnaire de base de données à nettoyer
+            days (int): Rétention par défaut en jours (défaut: RETENTION_DAYS ou 30)
+            batch_size (int): Conversations supprimées par transaction (défaut: RETENTION_BATCH_SIZE ou 500)
+            pause (float): Pause entre deux lots en secondes (défaut: RETENTION_PAUSE_MS ou 50 ms)
+            interval (float): Intervalle du planificateur en heures, 0 pour le désactiver
+                (défaut: RETENTION_INTERVAL_HOURS ou 0)
+            archive (ConversationArchive): Archive froide des conversations supprimées (défaut: archive
+                dans RETENTION_ARCHIVE_DIR si défini, sinon suppression sans archivage)
+            vacuum (bool): VACUUM incrémental après le nettoyage (défaut: RETENTION_VACUUM ou true)
+            vacuum_pages (int): Pages rendues au disque par étape de VACUUM (défaut: RETENTION_VACUUM_PAGES ou 1000)
+        """
+        self.db_manager = db_manager
+        self.days = days if days is not None else int(os.getenv('RETENTION_DAYS', 30))
+        self.batch_size = batch_size or int(os.getenv('RETENTION_BATCH_SIZE', 500))
+        self.pause = pause if pause is not None else int(os.getenv('RETENTION_PAUSE_MS', 50)) / 1000
+        self.interval = interval if interval is not None else float(os.getenv('RETENTION_INTERVAL_HOURS', 0))
+        if archive is None and os.getenv('RETENTION_ARCHIVE_DIR'):
+            archive = ConversationArchive(os.getenv('RETENTION_ARCHIVE_DIR'))
+        self.archive = archive
+        self.vacuum = vacuum if vacuum is not None else os.getenv('RETENTION_VACUUM', 'true').lower() == 'true'
+        self.vacuum_pages = vacuum_pages or int(os.getenv('RETENTION_VACUUM_PAGES', 1000))
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._scheduler: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._stop = threading.Event()
+        self._scheduler_lock = None
+        self._status: Dict[str, Any] = {"state": "idle", "runs": 0}
+
+    def start(self, days: Optional[int] = None) -> bool:
+        """
+        Lance un nettoyage dans un thread d'arrière-plan.
+
+        Args:
+            days (int): Rétention en jours (défaut: celle de la tâche)
+
+        Returns:
+            bool: False si un nettoyage est déjà en cours
+        """
+        days = self._validate_days(days)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._begin(days)
+            self._thread = threading.Thread(target=self._execute, name='retention', daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self, days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Exécute un nettoyage dans le thread courant et retourne son bilan.
+
+        Args:
+            days (int): Rétention en jours (défaut: celle de la tâche)
+
+        Returns:
+            Dict[str, Any]: Avancement final (voir ``status``), ``state`` à ``busy`` si un
+            nettoyage est déjà en cours
+        """
+        days = self._validate_days(days)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return {**self._status, "state": "busy"}
+            self._begin(days)
+            self._thread = threading.current_thread()
+        try:
+            self._execute()
+        finally:
+            with self._lock:
+                self._thread = None
+        return self.status()
+
+    def cancel(self) -> bool:
+        """Interrompt le nettoyage en cours après le lot courant ; False si aucun n'est en cours."""
+        with self._lock:
+            if self._status["state"] != "running":
+                return False
+        self._cancel.set()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'avancement du nettoyage en cours ou du dernier nettoyage.
+
+        Returns:
+            Dict[str, Any]: ``state`` (idle, running, completed, cancelled, failed), rétention et date
+            limite, conversations à supprimer (estimées au départ), supprimées et archivées, lots,
+            résultat du VACUUM, dates de début et de fin, erreur éventuelle
+        """
+        with self._lock:
+            status = dict(self._status)
+        if status.get("total"):
+            status["progress"] = round(min(1.0, status["deleted"] / status["total"]), 4)
+        return status
+
+    def schedule(self) -> bool:
+        """Démarre le planificateur si un intervalle est configuré ; False sinon.
+
+        Avec plusieurs workers Gunicorn, seul le processus qui obtient le verrou
+        ``retention.lock`` (à côté de la base) planifie le nettoyage, gardé jusqu'à sa fin.
+        """
+        if self.interval <= 0 or (self._scheduler is not None and self._scheduler.is_alive()):
+            return False
+        if not self._acquire_scheduler_lock():
+            return False
+        self._scheduler = threading.Thread(target=self._run_scheduler, name='retention-scheduler', daemon=True)
+        self._scheduler.start()
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Arrête le planificateur et interrompt le nettoyage en cours."""
+        self._stop.set()
+        self._cancel.set()
+        for thread in (self._scheduler, self._thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _acquire_scheduler_lock(self) -> bool:
+        """Verrou exclusif non bloquant sur ``retention.lock`` ; True si ce processus planifie."""
+        if fcntl is None:
+            return True
+        path = os.path.join(os.path.dirname(self.db_manager.db_path), 'retention.lock')
+        handle = open(path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # Descripteur gardé ouvert : le verrou est libéré à la fin du processus
+        self._scheduler_lock = handle
+        return True
+
+    def _validate_days(self, days: Optional[int]) -> int:
+        days = self.days if days is None else days
+        if isinstance(days, bool) or not isinstance(days, int) or days < 1:
+            raise ValueError("days doit être un entier positif")
+        return days
+
+    def _begin(self, days: int):
+        """Réinitialise l'avancement pour un nouveau nettoyage (verrou tenu par l'appelant)."""
+        self._cancel.clear()
+        self._status = {
+            "state": "running",
+            "runs": self._status["runs"] + 1,
+            "days": days,
+            "cutoff": self.db_manager.retention_cutoff(days),
+            "total": None,
+            "deleted": 0,
+            "archived": 0,
+            "batches": 0,
+            "vacuum": None,
+            "started_at": datetime.now().isoformat(timespec='seconds'),
+            "finished_at": None,
+            "error": None,
+            "next_run_at": self._status.get("next_run_at"),
+        }
+
+    def _update(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def _execute(self):
+        """Boucle de nettoyage : un lot, une pause, jusqu'à épuisement ou interruption."""
+        cutoff = self._status["cutoff"]
+        state = "completed"
+        try:
+            self._update(total=self.db_manager.count_conversations_before(cutoff))
+            while not self._cancel.is_set():
+                deleted = self.db_manager.delete_conversations_before(
+                    cutoff, self.batch_size, self._write_archive if self.archive is not None else None)
+                if not deleted:
+                    break
+                with self._lock:
+                    self._status["deleted"] += deleted
+                    self._status["batches"] += 1
+                self._cancel.wait(self.pause)
+            if self._cancel.is_set():
+                state = "cancelled"
+            elif self.vacuum:
+                self._update(vacuum=self._incremental_vacuum())
+        except Exception as e:
+            state = "failed"
+            self._update(error=str(e))
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+            self._update(state=state, finished_at=datetime.now().isoformat(timespec='seconds'))
+
+    def _write_archive(self, conversations: List[Dict[str, Any]]):
+        """Déplace un lot dans l'archive froide, sur disque avant que sa suppression soit validée."""
+        archived = self.archive.write(conversations)
+        with self._lock:
+            self._status["archived"] += archived
+
+    def _incremental_vacuum(self) -> Dict[str, Any]:
+        """Rend les pages libérées au disque par étapes, avec une pause entre deux étapes."""
+        freed = 0
+        while True:
+            result = self.db_manager.incremental_vacuum(self.vacuum_pages)
+            freed += result["freed_pages"]
+            if not result["freed_pages"] or not result["free_pages"] or self._cancel.wait(self.pause):
+                return {**result, "freed_pages": freed}
+
+    def _run_scheduler(self):
+        """Relance le nettoyage toutes les ``interval`` heures avec la rétention par défaut."""
+        while True:
+            next_run = time.time() + self.interval * 3600
+            self._update(next_run_at=datetime.fromtimestamp(next_run).isoformat(timespec='seconds'))
+            if self._stop.wait(self.interval * 3600):
+                return
+            self.run()
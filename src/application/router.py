@@ -0,0 +1,247 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from src.infrastructure.token_usage import MODEL_PRICES, blended_price
+
+# Coût indicatif (dollars par million de tokens, moyenne entrée/sortie) utilisé par « cheapest »
+MODEL_COSTS = {model: blended_price(model) for model in MODEL_PRICES}
+
+
+class RouteCandidate:
+    """Couple fournisseur/modèle pouvant répondre à une requête routée."""
+
+    def __init__(self, provider: str, model: str,
+                 generate: Callable[[str, bool], Dict[str, Any]], cost: Optional[float] = None):
+        """
+        Args:
+            provider (str): Fournisseur IA (openai, claude, groq)
+            model (str): Modèle appelé
+            generate (Callable): Fonction (prompt, use_cache) retournant un dictionnaire de réponse
+            cost (float): Coût indicatif en dollars par million de tokens (None : tarif inconnu)
+        """
+        self.provider = provider
+        self.model = model
+        self.generate = generate
+        self.cost = cost
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+class CandidateStats:
+    """Moyennes mobiles exponentielles (EWMA) de la latence et du taux d'erreur d'un candidat."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, latency: float, success: bool):
+        self.requests += 1
+        if not success:
+            self.failures += 1
+        self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if success else 1.0)
+        if success:
+            # Seules les réponses réussies renseignent la latence (une erreur rapide n'est pas « rapide »)
+            self.latency = latency if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * latency
+
+
+class ModelRouter:
+    """Routeur multi-fournisseurs : choisit le fournisseur/modèle de chaque requête.
+
+    Politiques disponibles :
+
+    - ``fastest``  : latence EWMA la plus basse, pénalisée par le taux d'erreur
+    - ``cheapest`` : coût le plus bas parmi les modèles au tarif connu, pénalisé par le taux d'erreur
+    - ``fallback`` : ordre fixe de la chaîne de repli
+    - ``best_of_n``: interroge les ``n`` meilleurs candidats en parallèle et garde la première réponse réussie
+
+    Quel que soit le choix, un échec bascule sur le candidat suivant du classement.
+    """
+
+    POLICIES = ('fastest', 'cheapest', 'fallback', 'best_of_n')
+
+    def __init__(self, candidates: List[RouteCandidate],
+                 is_available: Optional[Callable[[RouteCandidate], bool]] = None,
+                 alpha: Optional[float] = None, exploration: Optional[float] = None,
+                 best_of: Optional[int] = None, max_attempts: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        Initialise le routeur.
+
+        Args:
+            candidates (List[RouteCandidate]): Candidats, dans l'ordre de la chaîne de repli
+            is_available (Callable): Indique si un candidat peut être appelé (ex. disjoncteur fermé)
+            alpha (float): Poids des nouvelles mesures dans les EWMA (défaut: ROUTER_EWMA_ALPHA ou 0.2)
+            exploration (float): Probabilité d'essayer un autre candidat pour rafraîchir ses mesures (défaut: ROUTER_EXPLORATION ou 0.05)
+            best_of (int): Candidats interrogés par ``best_of_n`` (défaut: ROUTER_BEST_OF ou 2)
+            max_attempts (int): Candidats essayés au maximum par requête (défaut: ROUTER_MAX_ATTEMPTS ou 3)
+            timeout (float): Attente maximale de ``best_of_n``, en secondes (défaut: COMPARE_PROVIDER_TIMEOUT ou 30)
+        """
+        self.candidates = candidates
+        self.is_available = is_available or (lambda candidate: True)
+        self.alpha = alpha or float(os.getenv('ROUTER_EWMA_ALPHA', 0.2))
+        self.exploration = exploration if exploration is not None else float(os.getenv('ROUTER_EXPLORATION', 0.05))
+        self.best_of = best_of or int(os.getenv('ROUTER_BEST_OF', 2))
+        self.max_attempts = max_attempts or int(os.getenv('ROUTER_MAX_ATTEMPTS', 3))
+        self.timeout = timeout or float(os.getenv('COMPARE_PROVIDER_TIMEOUT', 30))
+
+        self._stats = {candidate.name: CandidateStats(self.alpha) for candidate in candidates}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(candidates), 1) * 4,
+                                            thread_name_prefix='router')
+
+    def rank(self, policy: str = 'fastest') -> List[RouteCandidate]:
+        """
+        Classe les candidats disponibles selon une politique.
+
+        Args:
+            policy (str): fastest, cheapest, fallback ou best_of_n
+
+        Returns:
+            List[RouteCandidate]: Candidats du meilleur au moins bon
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Politique de routage inconnue: {policy}")
+
+        available = [candidate for candidate in self.candidates if self.is_available(candidate)]
+        if policy == 'fallback':
+            return available
+
+        with self._lock:
+            if policy == 'cheapest':
+                # Un modèle sans tarif n'est pas « gratuit » : il ne peut pas être classé par coût
+                available = [candidate for candidate in available if candidate.cost is not None]
+                ranked = sorted(available, key=lambda c: (self._penalized(c, c.cost), self._expected_latency(c)))
+            else:
+                ranked = sorted(available, key=lambda c: self._penalized(c, self._expected_latency(c)))
+
+        # Exploration : un candidat délaissé est parfois essayé pour que ses mesures restent à jour
+        if policy == 'fastest' and len(ranked) > 1 and random.random() < self.exploration:
+            explored = ranked.pop(random.randrange(1, len(ranked)))
+            ranked.insert(0, explored)
+        return ranked
+
+    def route(self, prompt: str, policy: str = 'fastest', use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Génère une réponse avec le candidat choisi par la politique, avec repli en cas d'échec.
+
+        Args:
+            prompt (str): Le prompt de l'utilisateur
+            policy (str): Politique de routage
+            use_cache (bool): Autoriser les réponses en cache
+
+        Returns:
+            Dict[str, Any]: Réponse du candidat retenu, avec ``provider``, ``model`` et le détail ``routing``
+        """
+        ranked = self.rank(policy)
+        if not ranked:
+            return {"success": False, "error": "Aucun fournisseur IA disponible", "prompt": prompt,
+                    "routing": {"policy": policy, "attempts": []}}
+
+        attempts: List[Dict[str, Any]] = []
+        result, candidate, remaining = None, None, ranked
+        if policy == 'best_of_n':
+            result, candidate = self._race(ranked[:self.best_of], prompt, use_cache, attempts)
+            remaining = ranked[self.best_of:]
+
+        # Repli : les candidats suivants sont essayés tant qu'aucune réponse n'a réussi
+        for fallback in remaining:
+            if (result is not None and result.get('success')) or len(attempts) >= self.max_attempts:
+                break
+            candidate = fallback
+            result, attempt = self._call(candidate, prompt, use_cache)
+            attempts.append(attempt)
+
+        result = dict(result)
+        result.setdefault('provider', candidate.provider)
+        result['model'] = candidate.model
+        result['routing'] = {"policy": policy, "provider": candidate.provider,
+                             "model": candidate.model, "attempts": attempts}
+        return result
+
+    def _call(self, candidate: RouteCandidate, prompt: str, use_cache: bool):
+        """Appelle un candidat, enregistre sa latence et son issue, et retourne (résultat, tentative)."""
+        start = time.monotonic()
+        try:
+            result = candidate.generate(prompt, use_cache)
+        except Exception as e:
+            result = {"success": False, "error": str(e), "prompt": prompt}
+        elapsed = time.monotonic() - start
+
+        success = bool(result.get('success'))
+        # Une réponse servie par un cache (exact, sémantique ou appel partagé) ne mesure pas le fournisseur
+        if not result.get('semantic_cache') and not (result.get('usage') or {}).get('cached'):
+            with self._lock:
+                self._stats[candidate.name].record(elapsed, success)
+        attempt = {"provider": candidate.provider, "model": candidate.model,
+                   "success": success, "response_time": elapsed,
+                   "error": None if success else result.get('error')}
+        return result, attempt
+
+    def _race(self, candidates: List[RouteCandidate], prompt: str, use_cache: bool,
+              attempts: List[Dict[str, Any]]):
+        """Interroge plusieurs candidats en parallèle et retourne la première réponse réussie.
+
+        Seules les tentatives terminées avant le retour sont ajoutées à ``attempts`` ;
+        les appels perdants continuent en arrière-plan et n'alimentent que les EWMA.
+        """
+        futures = {self._executor.submit(self._call, candidate, prompt, use_cache): candidate
+                   for candidate in candidates}
+        pending = set(futures)
+        deadline = time.monotonic() + self.timeout
+        last = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            winner = None
+            for future in done:
+                result, attempt = future.result()
+                attempts.append(attempt)
+                last = (result, futures[future])
+                if winner is None and result.get('success'):
+                    winner = last
+            if winner is not None:
+                return winner
+        if last is None:
+            candidate = candidates[0]
+            return {"success": False, "error": f"Délai dépassé ({self.timeout:.0f}s)",
+                    "prompt": prompt, "timeout": True}, candidate
+        return last
+
+    def _expected_latency(self, candidate: RouteCandidate) -> float:
+        # Un candidat jamais essayé passe en tête pour être évalué ; un candidat
+        # qui n'a encore jamais réussi est compté au délai maximum
+        stats = self._stats[candidate.name]
+        if stats.latency is None:
+            return 0.0 if stats.requests == 0 else self.timeout
+        return stats.latency
+
+    def _penalized(self, candidate: RouteCandidate, value: float) -> float:
+        """Divise par la probabilité de succès : un candidat qui échoue une fois sur deux coûte le double."""
+        error_rate = min(self._stats[candidate.name].error_rate, 0.95)
+        return value / (1 - error_rate)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne, par candidat, la latence EWMA, le taux d'erreur, le coût et la disponibilité."""
+        with self._lock:
+            return {
+                candidate.name: {
+                    'latency_ewma': self._stats[candidate.name].latency,
+                    'error_rate': round(self._stats[candidate.name].error_rate, 4),
+                    'requests': self._stats[candidate.name].requests,
+                    'failures': self._stats[candidate.name].failures,
+                    'cost': candidate.cost,
+                    'available': self.is_available(candidate),
+                }
+                for candidate in self.candidates
+            }
@@ -0,0 +1,241 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from src.application.recorder import STREAM_ERROR_PREFIX
+
+
+class _Call:
+    """Appel en cours partagé entre plusieurs requêtes identiques."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Regroupe les appels identiques simultanés en un seul appel amont.
+
+    La première requête pour une clé exécute la fonction ; les requêtes
+    identiques qui arrivent pendant l'appel attendent et reçoivent le même
+    résultat (ou la même exception). Une fois l'appel terminé, la clé est
+    libérée : il ne s'agit pas d'un cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Exécute ``fn`` une seule fois pour tous les appelants simultanés de ``key``.
+
+        Args:
+            key (Hashable): Clé identifiant la requête, ex. (fournisseur, modèle, prompt)
+            fn (Callable): Fonction sans argument réalisant l'appel amont
+
+        Returns:
+            Tuple[Any, bool]: Le résultat et True si l'appel a été partagé avec une requête en cours
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._counters['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._counters['calls'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne le nombre d'appels amont et de requêtes regroupées."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class _SharedStream:
+    """Flux amont en cours : fragments déjà émis et abonnés en attente."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.condition = threading.Condition()
+
+
+class _Subscription:
+    """Abonnement à un flux partagé : itérateur de fragments, désabonné à sa fermeture ou à sa fin."""
+
+    def __init__(self, chunks: Iterator[str], release: Callable[[], None]):
+        self._chunks = chunks
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """Se désabonne du flux (sans effet s'il est déjà fermé)."""
+        release, self._release = self._release, None
+        if release is not None:
+            self._chunks.close()
+            release()
+
+    def __del__(self):
+        self.close()
+
+
+class SharedStreams:
+    """Partage un flux de réponse amont entre plusieurs abonnés identiques.
+
+    Le premier abonné démarre le flux dans un pool de threads borné ; un abonné
+    arrivant en cours de route reçoit d'abord tous les fragments déjà émis, puis
+    la suite en direct. Les abonnés sont comptés : quand le dernier se ferme
+    (client parti, délai dépassé), le flux amont est fermé dès le fragment
+    suivant et cesse d'être consommé (et facturé). Un abonné qui n'a rien reçu
+    depuis ``idle_timeout`` secondes abandonne le flux avec un fragment
+    d'erreur, sans attendre un flux amont bloqué.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            idle_timeout (float): Attente maximale d'un fragment, en secondes
+                (défaut: COMPARE_PROVIDER_TIMEOUT ou 30)
+            max_workers (int): Nombre maximum de flux amont lus simultanément
+                (défaut: SHARED_STREAMS_MAX_WORKERS ou 32)
+        """
+        self.idle_timeout = idle_timeout or float(os.getenv('COMPARE_PROVIDER_TIMEOUT', 30))
+        self.max_workers = max_workers or int(os.getenv('SHARED_STREAMS_MAX_WORKERS', 32))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='shared-stream')
+        self._streams: Dict[Hashable, _SharedStream] = {}
+        self._lock = threading.Lock()
+        self._counters = {'streams': 0, 'attached': 0, 'abandoned': 0}
+
+    def subscribe(self, key: Hashable, factory: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        S'abonne au flux de ``key``, en le démarrant si aucun n'est en cours.
+
+        L'abonnement est compté dès l'appel ; il prend fin à l'épuisement de
+        l'itérateur retourné ou à sa fermeture (``close()``).
+
+        Args:
+            key (Hashable): Clé identifiant la requête, ex. (fournisseur, modèle, prompt)
+            factory (Callable): Fonction sans argument retournant l'itérable de fragments amont
+
+        Returns:
+            Iterator[str]: Fragments de la réponse, depuis le début du flux
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = _SharedStream()
+                self._streams[key] = stream
+                self._counters['streams'] += 1
+                # Pool saturé : le flux attend un thread libre, ses abonnés au plus idle_timeout
+                self.executor.submit(self._produce, key, stream, factory)
+            else:
+                self._counters['attached'] += 1
+            stream.subscribers += 1
+
+        return _Subscription(self._consume(stream), lambda: self._unsubscribe(key, stream))
+
+    def _unsubscribe(self, key: Hashable, stream: _SharedStream):
+        """Retire un abonné ; le flux amont est abandonné s'il n'en reste aucun avant sa fin."""
+        with self._lock:
+            stream.subscribers -= 1
+            if stream.subscribers > 0 or stream.finished:
+                return
+            stream.abandoned = True
+            self._counters['abandoned'] += 1
+            # Un nouvel abonné démarrera un flux complet plutôt que rejoindre un flux tronqué
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def _produce(self, key: Hashable, stream: _SharedStream, factory: Callable[[], Iterable[str]]):
+        """Consomme le flux amont et notifie les abonnés à chaque fragment.
+
+        Le flux amont est fermé dès le fragment reçu après le départ du dernier
+        abonné ; il n'est pas démarré si tous sont partis avant qu'un thread se libère.
+        """
+        chunks = None
+        try:
+            if stream.abandoned:
+                return
+            chunks = iter(factory())
+            for chunk in chunks:
+                with stream.condition:
+                    stream.chunks.append(chunk)
+                    stream.condition.notify_all()
+                if stream.abandoned:
+                    return
+        except BaseException as e:
+            stream.error = e
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            with self._lock:
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+            with stream.condition:
+                stream.finished = True
+                stream.condition.notify_all()
+
+    def _consume(self, stream: _SharedStream) -> Iterator[str]:
+        """Rejoue les fragments déjà émis puis suit le flux jusqu'à sa fin (ou jusqu'au délai d'inactivité)."""
+        position = 0
+        while True:
+            with stream.condition:
+                ready = stream.condition.wait_for(
+                    lambda: position < len(stream.chunks) or stream.finished, self.idle_timeout)
+                pending = stream.chunks[position:]
+                finished = stream.finished
+            if not ready:
+                yield f"{STREAM_ERROR_PREFIX}Délai dépassé ({self.idle_timeout:.1f}s sans fragment)"
+                return
+            position += len(pending)
+            yield from pending
+            if finished and position >= len(stream.chunks):
+                if stream.error is not None:
+                    raise stream.error
+                return
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne le nombre de flux amont, d'abonnés rattachés à un flux en cours et de flux abandonnés."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._streams)
+        return stats
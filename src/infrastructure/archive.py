@@ -0,0 +1,430 @@
+import bisect
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+# Compression zstd optionnelle (pip install zstandard) ; à défaut, gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = {'zstd': '.jsonl.zst', 'gzip': '.jsonl.gz'}
+INDEX_SUFFIX = '.idx.json'
+
+
+def normalize_terms(text: str) -> List[str]:
+    """Mots d'un texte en minuscules et sans accents (comme le tokenizer unicode61 de la recherche FTS5)."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return re.findall(r'\w+', stripped)
+
+
+class ConversationArchive:
+    """Stockage froid des conversations sorties de la base SQLite.
+
+    Les conversations (réponses comprises) sont écrites dans des segments JSONL
+    compressés, partitionnés par jour (``<racine>/AAAA/MM/JJ/``). Un segment est
+    une suite de blocs compressés indépendamment (trames zstd ou membres gzip,
+    lisibles aussi par ``zstdcat``/``zcat``) ; son index JSON voisin donne la
+    position et les identifiants de chaque bloc ainsi que le vocabulaire du
+    segment. Retrouver une conversation ne décompresse qu'un bloc, et une
+    recherche ne lit que les segments dont le vocabulaire contient tous les mots.
+    """
+
+    def __init__(self, root: str, segment_size: Optional[int] = None, block_size: Optional[int] = None,
+                 compression: Optional[str] = None, cache_size: int = 32):
+        """
+        Initialise l'archive (le dossier est créé à la première écriture).
+
+        Args:
+            root (str): Dossier racine de l'archive
+            segment_size (int): Conversations maximum par segment (défaut: ARCHIVE_SEGMENT_SIZE ou 5000)
+            block_size (int): Conversations par bloc compressé (défaut: ARCHIVE_BLOCK_SIZE ou 200)
+            compression (str): zstd ou gzip (défaut: ARCHIVE_COMPRESSION, zstd si le module zstandard
+                est installé, sinon gzip)
+            cache_size (int): Index de segments gardés en mémoire
+        """
+        self.root = root
+        self.segment_size = segment_size or int(os.getenv('ARCHIVE_SEGMENT_SIZE', 5000))
+        self.block_size = block_size or int(os.getenv('ARCHIVE_BLOCK_SIZE', 200))
+        self.compression = compression or os.getenv('ARCHIVE_COMPRESSION', 'zstd' if zstandard else 'gzip')
+        if self.compression not in EXTENSIONS:
+            raise ValueError(f"Compression d'archive inconnue: {self.compression}")
+        if self.compression == 'zstd' and zstandard is None:
+            raise ValueError("La compression zstd nécessite le module zstandard (pip install zstandard)")
+        self.cache_size = cache_size
+        self._compressor = zstandard.ZstdCompressor(level=int(os.getenv('ARCHIVE_ZSTD_LEVEL', 10))) \
+            if self.compression == 'zstd' else None
+
+        self._lock = threading.RLock()
+        # Résumé de chaque segment (chemin de l'index -> bornes d'identifiants et de dates)
+        self._segments: Dict[str, Dict[str, Any]] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._indexes: OrderedDict = OrderedDict()
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._sequence = 0
+        self._refreshed_at = 0.0
+        self.refresh()
+
+    # Écriture
+
+    def write(self, conversations: List[Dict[str, Any]]) -> int:
+        """
+        Ajoute des conversations à l'archive, dans le segment ouvert de leur jour.
+
+        Chaque appel écrit des blocs complets et synchronisés sur disque, puis
+        remplace l'index du segment : une interruption ne laisse au pire que des
+        octets non référencés en fin de segment.
+
+        Args:
+            conversations (List[Dict[str, Any]]): Lignes de ``conversations`` avec leurs ``responses``
+
+        Returns:
+            int: Nombre de conversations archivées
+        """
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for conversation in conversations:
+            by_day.setdefault(str(conversation['timestamp'])[:10], []).append(conversation)
+
+        with self._lock:
+            for day, rows in sorted(by_day.items()):
+                while rows:
+                    segment = self._open_segment(day)
+                    room = self.segment_size - segment['index']['count']
+                    self._append(segment, rows[:room])
+                    rows = rows[room:]
+        return len(conversations)
+
+    def close(self):
+        """Scelle les segments ouverts : les écritures suivantes commencent de nouveaux segments."""
+        with self._lock:
+            for segment in self._open.values():
+                segment['index']['sealed'] = True
+                self._write_index(segment)
+            self._open.clear()
+
+    def _open_segment(self, day: str) -> Dict[str, Any]:
+        """Segment ouvert du jour, créé s'il n'existe pas ou s'il est plein."""
+        segment = self._open.get(day)
+        if segment is not None and segment['index']['count'] < self.segment_size:
+            return segment
+        if segment is not None:
+            segment['index']['sealed'] = True
+            self._write_index(segment)
+
+        directory = os.path.join(self.root, *day.split('-'))
+        os.makedirs(directory, exist_ok=True)
+        self._sequence += 1
+        # Nom unique même avec plusieurs processus (workers) qui archivent en parallèle
+        name = f"segment-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._sequence}"
+        segment = {
+            'path': os.path.join(directory, name + EXTENSIONS[self.compression]),
+            'index_path': os.path.join(directory, name + INDEX_SUFFIX),
+            'terms': set(),
+            'index': {
+                'version': 1,
+                'segment': name + EXTENSIONS[self.compression],
+                'compression': self.compression,
+                'day': day,
+                'count': 0,
+                'min_id': None,
+                'max_id': None,
+                'first_timestamp': None,
+                'last_timestamp': None,
+                'sealed': False,
+                'blocks': [],
+                'terms': [],
+            },
+        }
+        self._open[day] = segment
+        return segment
+
+    def _append(self, segment: Dict[str, Any], rows: List[Dict[str, Any]]):
+        """Écrit des conversations en blocs compressés à la fin d'un segment, puis met à jour son index."""
+        index = segment['index']
+        with open(segment['path'], 'ab') as f:
+            offset = f.tell()
+            for start in range(0, len(rows), self.block_size):
+                block = rows[start:start + self.block_size]
+                data = self._compress(''.join(json.dumps(row, ensure_ascii=False, default=str) + '\n'
+                                              for row in block).encode('utf-8'))
+                f.write(data)
+                index['blocks'].append({'offset': offset, 'length': len(data), 'ids': [row['id'] for row in block]})
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        for row in rows:
+            segment['terms'].update(normalize_terms(self._text(row)))
+        timestamps = [str(row['timestamp']) for row in rows]
+        ids = [row['id'] for row in rows]
+        if index['count']:
+            timestamps += [index['first_timestamp'], index['last_timestamp']]
+            ids += [index['min_id'], index['max_id']]
+        index['first_timestamp'], index['last_timestamp'] = min(timestamps), max(timestamps)
+        index['min_id'], index['max_id'] = min(ids), max(ids)
+        index['count'] += len(rows)
+        self._write_index(segment)
+
+    def _write_index(self, segment: Dict[str, Any]):
+        """Remplace atomiquement l'index d'un segment et met à jour les résumés en mémoire."""
+        index = segment['index']
+        index['terms'] = sorted(segment['terms'])
+        temporary = segment['index_path'] + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, segment['index_path'])
+
+        self._segments[segment['index_path']] = self._summary(index)
+        self._mtimes[segment['index_path']] = os.path.getmtime(segment['index_path'])
+        self._indexes.pop(segment['index_path'], None)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._compressor is not None:
+            return self._compressor.compress(data)
+        return gzip.compress(data)
+
+    # Lecture
+
+    def refresh(self, min_interval: float = 0.0) -> bool:
+        """
+        Relit les index ajoutés ou modifiés sur disque (par ce processus ou un autre).
+
+        Args:
+            min_interval (float): Ne rien faire si la dernière relecture date de moins de ``min_interval`` secondes
+
+        Returns:
+            bool: True si les index ont été relus
+        """
+        with self._lock:
+            if time.monotonic() - self._refreshed_at < min_interval:
+                return False
+            self._refreshed_at = time.monotonic()
+            paths = glob.glob(os.path.join(self.root, '*', '*', '*', '*' + INDEX_SUFFIX))
+            for path in paths:
+                try:
+                    mtime = os.path.getmtime(path)
+                    if self._mtimes.get(path) == mtime:
+                        continue
+                    index = self._read_index(path)
+                except (OSError, ValueError):
+                    continue
+                self._segments[path] = self._summary(index)
+                self._mtimes[path] = mtime
+            for path in set(self._segments) - set(paths):
+                self._forget(path)
+            return True
+
+    def get(self, conversation_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Retrouve une conversation archivée (format de ``DatabaseManager.get_conversation_details``).
+
+        Args:
+            conversation_id (int): Identifiant de la conversation
+
+        Returns:
+            Optional[Dict[str, Any]]: Conversation et réponses, ou None si elle n'est pas archivée
+        """
+        for attempt in range(2):
+            with self._lock:
+                candidates = [path for path, summary in self._segments.items()
+                              if summary['min_id'] is not None
+                              and summary['min_id'] <= conversation_id <= summary['max_id']]
+            for path in candidates:
+                index = self._load_index(path)
+                if index is None:
+                    continue
+                for block in index['blocks']:
+                    if conversation_id in block['ids']:
+                        for row in self._read_block(path, index, block):
+                            if row['id'] == conversation_id:
+                                return self._details(row)
+            # Conversation archivée depuis la dernière lecture des index (par un autre processus)
+            if attempt or not self.refresh(min_interval=1.0):
+                return None
+        return None
+
+    def search(self, search_term: str, limit: int = 20, exclude: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Recherche dans les prompts et réponses archivés, les plus récents d'abord.
+
+        Comme la recherche FTS5 : tous les mots sont requis, le dernier est
+        recherché comme préfixe, sans tenir compte de la casse ni des accents.
+
+        Args:
+            search_term (str): Texte recherché
+            limit (int): Nombre maximum de résultats
+            exclude (set): Identifiants à ignorer (déjà trouvés dans la base)
+
+        Returns:
+            List[Dict[str, Any]]: Conversations trouvées, avec un extrait ``snippet``
+        """
+        words = normalize_terms(search_term)
+        if not words or limit <= 0:
+            return []
+        self.refresh(min_interval=1.0)
+        exclude = set(exclude or ())
+
+        with self._lock:
+            paths = sorted(self._segments, key=lambda path: self._segments[path]['last_timestamp'] or '',
+                           reverse=True)
+        results = []
+        for path in paths:
+            index = self._load_index(path)
+            if index is None or not self._may_contain(index['terms'], words):
+                continue
+            for block in reversed(index['blocks']):
+                for row in reversed(list(self._read_block(path, index, block))):
+                    if row['id'] in exclude:
+                        continue
+                    snippet = self._match(row, words)
+                    if snippet is None:
+                        continue
+                    exclude.add(row['id'])
+                    results.append({
+                        'id': row['id'],
+                        'prompt': row['prompt'],
+                        'timestamp': row['timestamp'],
+                        'model_used': row.get('model_used'),
+                        'response_success': bool(row.get('response_success')),
+                        'snippet': snippet,
+                        'archived': True
+                    })
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne la taille de l'archive : segments, conversations, octets et compression."""
+        with self._lock:
+            summaries = list(self._segments.items())
+        size = 0
+        for path, summary in summaries:
+            try:
+                size += os.path.getsize(os.path.join(os.path.dirname(path), summary['segment']))
+            except OSError:
+                pass
+        return {
+            'root': self.root,
+            'compression': self.compression,
+            'segments': len(summaries),
+            'conversations': sum(summary['count'] for _, summary in summaries),
+            'bytes': size,
+            'first_timestamp': min((s['first_timestamp'] for _, s in summaries if s['first_timestamp']), default=None),
+            'last_timestamp': max((s['last_timestamp'] for _, s in summaries if s['last_timestamp']), default=None),
+        }
+
+    @staticmethod
+    def _summary(index: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: index[key] for key in ('segment', 'count', 'min_id', 'max_id', 'first_timestamp', 'last_timestamp')}
+
+    @staticmethod
+    def _read_index(path: str) -> Dict[str, Any]:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load_index(self, path: str) -> Optional[Dict[str, Any]]:
+        """Index complet d'un segment, gardé dans un petit cache LRU."""
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is not None:
+                self._indexes.move_to_end(path)
+                return index
+        try:
+            index = self._read_index(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._indexes[path] = index
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _forget(self, path: str):
+        self._segments.pop(path, None)
+        self._mtimes.pop(path, None)
+        self._indexes.pop(path, None)
+
+    def _read_block(self, index_path: str, index: Dict[str, Any], block: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Décompresse un seul bloc d'un segment."""
+        path = os.path.join(os.path.dirname(index_path), index['segment'])
+        with open(path, 'rb') as f:
+            f.seek(block['offset'])
+            data = f.read(block['length'])
+        if index['compression'] == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("Segment zstd illisible sans le module zstandard (pip install zstandard)")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        for line in data.decode('utf-8').splitlines():
+            if line:
+                yield json.loads(line)
+
+    @staticmethod
+    def _may_contain(terms: List[str], words: List[str]) -> bool:
+        """Indique si le vocabulaire trié d'un segment contient tous les mots (le dernier comme préfixe)."""
+        for word in words[:-1]:
+            position = bisect.bisect_left(terms, word)
+            if position == len(terms) or terms[position] != word:
+                return False
+        position = bisect.bisect_left(terms, words[-1])
+        return position < len(terms) and terms[position].startswith(words[-1])
+
+    @staticmethod
+    def _text(row: Dict[str, Any]) -> str:
+        return ' '.join([row.get('prompt') or ''] + [response.get('response_text') or ''
+                                                     for response in row.get('responses', [])])
+
+    def _match(self, row: Dict[str, Any], words: List[str]) -> Optional[str]:
+        """Extrait de la conversation autour du premier mot trouvé (``<mark>``), None si elle ne correspond pas."""
+        tokens = [(match.group(), normalize_terms(match.group()))
+                  for match in re.finditer(r'\S+', self._text(row))]
+        terms = {term for _, normalized in tokens for term in normalized}
+        if any(word not in terms for word in words[:-1]) or not any(term.startswith(words[-1]) for term in terms):
+            return None
+
+        def hit(normalized: List[str]) -> bool:
+            return any(term in words[:-1] or term.startswith(words[-1]) for term in normalized)
+
+        first = next(position for position, (_, normalized) in enumerate(tokens) if hit(normalized))
+        start = max(0, first - 8)
+        window = [f'<mark>{token}</mark>' if hit(normalized) else token
+                  for token, normalized in tokens[start:start + 16]]
+        return ('…' if start else '') + ' '.join(window) + ('…' if start + 16 < len(tokens) else '')
+
+    @staticmethod
+    def _details(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertit une conversation archivée au format des détails de l'historique."""
+        return {
+            'id': row['id'],
+            'prompt': row['prompt'],
+            'timestamp': row['timestamp'],
+            'model_used': row.get('model_used'),
+            'response_success': bool(row.get('response_success')),
+            'endpoint': row.get('endpoint'),
+            'archived': True,
+            'responses': [{
+                'provider': response['provider'],
+                'model': response.get('model'),
+                'response_text': response.get('response_text'),
+                'success': bool(response.get('success')),
+                'error_message': response.get('error_message'),
+                'response_time': response.get('response_time'),
+                'tokens_used': response.get('tokens_used'),
+                'prompt_tokens': response.get('prompt_tokens'),
+                'completion_tokens': response.get('completion_tokens'),
+                'cost': response.get('cost'),
+                'time_to_first_token': response.get('time_to_first_token')
+            } for response in row.get('responses', [])]
+        }
@@ -1,76 +1,159 @@
 import os
+import time
 import anthropic
 from dotenv import load_dotenv
+from contextlib import contextmanager, nullcontext
 from typing import Optional, Dict, Any
 
+from src.infrastructure.metrics import track_first_token, track_provider_call
+from src.infrastructure.token_usage import UsageTracker, cached_usage
+
 # Charger les variables d'environnement
 load_dotenv()
 
+# Prompt système et paramètres de génération (inclus dans la clé du cache de réponses)
+SYSTEM_PROMPT = "Vous êtes un assistant vocal intelligent et utile. Répondez de manière claire et concise."
+GENERATION_PARAMS = {"max_tokens": 500, "temperature": 0.7}
+
 class ClaudeClient:
     """Client pour interagir avec l'API Claude (Anthropic)."""
     
-    def __init__(self):
+    def __init__(self, cache=None, governor=None, resilience=None, usage=None):
         """Initialise le client Claude avec la clé API."""
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY non trouvée dans les variables d'environnement")
         
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # La couche de résilience gère les nouvelles tentatives : celles du SDK sont désactivées
+        options = {"max_retries": 0} if resilience is not None else {}
+        self.client = anthropic.Anthropic(api_key=api_key, **options)
+        self.cache = cache
+        self.governor = governor
+        self.resilience = resilience
+        # Comptabilité des tokens et budgets (partagée entre les clients par l'application)
+        self.usage = usage if usage is not None else UsageTracker()
     
-    def generate_response(self, prompt: str, model: str = "claude-3-5-sonnet-20241022") -> Optional[str]:
+    @contextmanager
+    def _request(self, model: str, **kwargs):
+        """
+        Envoie une requête à l'API, sous le contrôle du gouverneur de débit et de la
+        couche de résilience s'ils sont configurés.
+        
+        La place de concurrence est conservée jusqu'à la sortie du bloc (fin de lecture d'un flux).
+        
+        Args:
+            model (str): Le modèle à utiliser
+            **kwargs: Paramètres de la requête
+            
+        Yields:
+            La réponse (ou le flux) du SDK
+        """
+        # Budget du jour épuisé (ou modèle sans tarif sous budget) : refus immédiat, sans appel au fournisseur
+        self.usage.check("anthropic", model)
+        
+        def attempt():
+            if self.governor is None:
+                return nullcontext(self.client.messages.create(model=model, **kwargs))
+            send = lambda: self.client.messages.with_raw_response.create(model=model, **kwargs)
+            return self.governor.session("anthropic", model, send)
+        
+        with track_provider_call("anthropic", model):
+            if self.resilience is None:
+                with attempt() as response:
+                    yield response
+                return
+            # Pas de requête couverte pour un flux : le second flux ne pourrait pas être abandonné proprement
+            with self.resilience.session("anthropic", attempt, hedge=not kwargs.get("stream")) as response:
+                yield response
+    
+    def generate_response(self, prompt: str, model: str = "claude-3-5-sonnet-20241022",
+                          use_cache: bool = True) -> Optional[str]:
         """
         Génère une réponse à partir d'un prompt en utilisant l'API Claude.
         
         Args:
             prompt (str): Le prompt à envoyer à l'API
             model (str): Le modèle à utiliser (défaut: claude-3-5-sonnet-20241022)
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
             
         Returns:
             Optional[str]: La réponse générée ou None en cas d'erreur
         """
+        return self.generate_with_usage(prompt, model, use_cache=use_cache)["text"]
+    
+    def generate_with_usage(self, prompt: str, model: str = "claude-3-5-sonnet-20241022",
+                            use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Génère une réponse et retourne sa consommation de tokens et son coût.
+        
+        Args:
+            prompt (str): Le prompt à envoyer à l'API
+            model (str): Le modèle à utiliser (défaut: claude-3-5-sonnet-20241022)
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
+        
+        Returns:
+            Dict[str, Any]: ``text`` (None en cas d'erreur), ``usage`` (tokens et coût) et ``error``
+        """
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self.cache.make_key("anthropic", model, SYSTEM_PROMPT, GENERATION_PARAMS, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return {"text": cached, "usage": cached_usage(), "error": None}
+        
         try:
-            response = self.client.messages.create(
-                model=model,
-                max_tokens=500,
-                temperature=0.7,
-                system="Vous êtes un assistant vocal intelligent et utile. Répondez de manière claire et concise.",
+            started = time.perf_counter()
+            with self._request(
+                model,
+                **GENERATION_PARAMS,
+                system=SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
-            )
+            ) as response:
+                text = response.content[0].text
+            usage = self.usage.record_response("anthropic", model, response.usage,
+                                               f"{SYSTEM_PROMPT}\n{prompt}", text, started)
             
-            return response.content[0].text
+            if cache_key is not None and text:
+                self.cache.set(cache_key, text)
+            return {"text": text, "usage": usage, "error": None}
             
         except Exception as e:
             print(f"Erreur lors de l'appel à l'API Claude: {e}")
-            return None
+            return {"text": None, "usage": None, "error": str(e)}
     
-    def generate_voice_response(self, prompt: str) -> Dict[str, Any]:
+    def generate_voice_response(self, prompt: str, use_cache: bool = True,
+                                model: str = "claude-3-5-sonnet-20241022") -> Dict[str, Any]:
         """
         Génère une réponse vocale à partir d'un prompt.
         
         Args:
             prompt (str): Le prompt à envoyer à l'API
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
+            model (str): Le modèle à utiliser (défaut: claude-3-5-sonnet-20241022)
             
         Returns:
             Dict[str, Any]: Dictionnaire contenant la réponse textuelle et les métadonnées
         """
         try:
             # Générer la réponse textuelle
-            text_response = self.generate_response(prompt)
+            result = self.generate_with_usage(prompt, model, use_cache=use_cache)
+            text_response = result["text"]
             
             if text_response:
                 return {
                     "success": True,
                     "text": text_response,
                     "prompt": prompt,
-                    "model": "claude-3-5-sonnet-20241022",
-                    "provider": "anthropic"
+                    "model": model,
+                    "provider": "anthropic",
+                    "usage": result["usage"]
                 }
             else:
                 return {
                     "success": False,
-                    "error": "Impossible de générer une réponse",
+                    "error": result["error"] or "Impossible de générer une réponse",
                     "prompt": prompt,
                     "provider": "anthropic"
                 }
@@ -83,29 +166,67 @@ class ClaudeClient:
                 "provider": "anthropic"
             }
     
-    def generate_streaming_response(self, prompt: str, model: str = "claude-3-5-sonnet-20241022"):
+    def generate_streaming_response(self, prompt: str, model: str = "claude-3-5-sonnet-20241022",
+                                    on_usage=None):
         """
         Génère une réponse en streaming pour une expérience plus fluide.
         
         Args:
             prompt (str): Le prompt à envoyer à l'API
             model (str): Le modèle à utiliser
+            on_usage (Callable): Reçoit la consommation (``usage``) à la fin du flux
             
         Yields:
             str: Fragments de la réponse au fur et à mesure
         """
         try:
-            with self.client.messages.stream(
-                model=model,
-                max_tokens=500,
-                temperature=0.7,
-                system="Vous êtes un assistant vocal intelligent et utile. Répondez de manière claire et concise.",
+            started = time.perf_counter()
+            parts, reported = [], {}
+            with self._request(
+                model,
+                **GENERATION_PARAMS,
+                system=SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
-                ]
+                ],
+                stream=True
             ) as stream:
-                for text in stream.text_stream:
-                    yield text
+                def texts():
+                    for event in stream:
+                        # Tokens du prompt au début du flux, tokens générés (cumulés) à la fin
+                        if event.type == "message_start":
+                            reported["input_tokens"] = event.message.usage.input_tokens
+                        elif event.type == "message_delta":
+                            reported["output_tokens"] = event.usage.output_tokens
+                        elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                            parts.append(event.delta.text)
+                            yield event.delta.text
+                
+                try:
+                    yield from track_first_token("anthropic", model, texts(), started)
+                finally:
+                    # Flux abandonné : la réponse HTTP est fermée, le fournisseur cesse de générer
+                    stream.close()
+                    # Flux terminé ou abandonné : les tokens déjà générés sont facturés
+                    complete = "input_tokens" in reported and "output_tokens" in reported
+                    usage = self.usage.record_response("anthropic", model, reported if complete else None,
+                                                       f"{SYSTEM_PROMPT}\n{prompt}", "".join(parts), started)
+                    if on_usage is not None:
+                        on_usage(usage)
                     
         except Exception as e:
-            yield f"Erreur: {str(e)}" 
\ No newline at end of file
+            yield f"Erreur: {str(e)}"
+    
+    def get_available_models(self) -> list:
+        """
+        Récupère la liste des modèles disponibles sur Claude.
+        
+        Returns:
+            list: Liste des modèles disponibles
+        """
+        try:
+            models = self.client.models.list()
+            return [model.id for model in models.data]
+        except Exception as e:
+            print(f"Erreur lors de la récupération des modèles: {e}")
+            return []
@@ -1,124 +1,847 @@
+import base64
+import re
 import sqlite3
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Optional, Tuple
 import os
 
+from src.infrastructure.metrics import DB_LATENCY, bucket_quantile
+
+# Seuils (secondes) de l'histogramme des temps de réponse des agrégats : ils sont
+# figés dans les triggers de la migration 4, les modifier impose une nouvelle migration.
+STATS_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+
+
+def _latency_bucket_sql(column: str) -> str:
+    """Expression SQL donnant l'indice du seuil de latence d'une valeur (dernier indice = au-delà)."""
+    cases = ' '.join(f'WHEN {column} <= {bound} THEN {index}'
+                     for index, bound in enumerate(STATS_LATENCY_BUCKETS))
+    return f'CASE {cases} ELSE {len(STATS_LATENCY_BUCKETS)} END'
+
+
+def _migration_001_initial_schema(cursor: sqlite3.Cursor):
+    """Tables conversations et réponses (idempotent pour les bases existantes)."""
+    # Table pour les conversations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            user_session TEXT,
+            model_used TEXT,
+            response_success BOOLEAN DEFAULT 1
+        )
+    ''')
+    
+    # Table pour les réponses détaillées
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id INTEGER,
+            provider TEXT NOT NULL,
+            model TEXT,
+            response_text TEXT,
+            success BOOLEAN DEFAULT 1,
+            error_message TEXT,
+            response_time REAL,
+            tokens_used INTEGER,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )
+    ''')
+
+
+def _migration_002_secondary_indexes(cursor: sqlite3.Cursor):
+    """Index pour l'historique, les statistiques et le nettoyage."""
+    # Tri de l'historique et nettoyage par date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_conversations_timestamp
+        ON conversations (timestamp, id)
+    ''')
+    
+    # Index couvrant de la jointure de l'historique (fournisseurs et succès par conversation),
+    # utilisé aussi pour les détails et la suppression d'une conversation
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_conversation
+        ON responses (conversation_id, provider, success)
+    ''')
+    
+    # Agrégats par fournisseur sans lire les textes de réponse
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_provider
+        ON responses (provider, response_time, tokens_used)
+    ''')
+    
+    cursor.execute('ANALYZE')
+
+
+def _migration_003_full_text_search(cursor: sqlite3.Cursor):
+    """Index plein texte FTS5 sur les prompts et les textes de réponse.
+    
+    Une ligne par conversation (rowid = id de la conversation), tenue à jour
+    par des triggers. Si SQLite est compilé sans FTS5, la recherche reste sur LIKE.
+    """
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+                prompt,
+                responses,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 non disponible, recherche par LIKE: {e}")
+        return
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_insert
+        AFTER INSERT ON conversations BEGIN
+            INSERT INTO conversations_fts (rowid, prompt, responses)
+            VALUES (new.id, new.prompt, '');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_update
+        AFTER UPDATE OF prompt ON conversations BEGIN
+            UPDATE conversations_fts SET prompt = new.prompt WHERE rowid = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_delete
+        AFTER DELETE ON conversations BEGIN
+            DELETE FROM conversations_fts WHERE rowid = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS responses_fts_insert
+        AFTER INSERT ON responses WHEN new.response_text IS NOT NULL BEGIN
+            UPDATE conversations_fts
+            SET responses = CASE WHEN responses = '' THEN new.response_text
+                                 ELSE responses || ' ' || new.response_text END
+            WHERE rowid = new.conversation_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS responses_fts_delete
+        AFTER DELETE ON responses WHEN old.response_text IS NOT NULL BEGIN
+            UPDATE conversations_fts
+            SET responses = COALESCE((
+                SELECT GROUP_CONCAT(response_text, ' ')
+                FROM responses WHERE conversation_id = old.conversation_id
+            ), '')
+            WHERE rowid = old.conversation_id;
+        END
+    ''')
+    
+    # Indexer l'historique existant
+    _backfill_full_text_search(cursor)
+
+
+def _backfill_full_text_search(cursor: sqlite3.Cursor):
+    """Indexe les conversations absentes de l'index plein texte."""
+    cursor.execute('''
+        INSERT INTO conversations_fts (rowid, prompt, responses)
+        SELECT c.id, c.prompt, COALESCE((
+            SELECT GROUP_CONCAT(r.response_text, ' ')
+            FROM responses r WHERE r.conversation_id = c.id
+        ), '')
+        FROM conversations c
+        WHERE c.id NOT IN (SELECT rowid FROM conversations_fts)
+    ''')
+
+
+def _migration_004_statistics_rollups(cursor: sqlite3.Cursor):
+    """Tables d'agrégats tenues à jour par des triggers, lues par ``get_statistics``.
+    
+    - ``stats_daily``     : conversations et conversations réussies par jour
+    - ``stats_hourly``    : réponses, succès, latence et tokens par heure et par fournisseur
+    - ``stats_providers`` : mêmes totaux par fournisseur, sur tout l'historique
+    - ``stats_latency``   : histogramme des temps de réponse par fournisseur (pour les centiles)
+    
+    Une réponse est rattachée à l'heure de sa conversation : elle doit être
+    supprimée avant celle-ci (comme le font ``delete_conversation`` et
+    ``cleanup_old_conversations``).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,
+            conversations INTEGER NOT NULL DEFAULT 0,
+            successful INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_hourly (
+            hour TEXT NOT NULL,
+            provider TEXT NOT NULL,
+            responses INTEGER NOT NULL DEFAULT 0,
+            successes INTEGER NOT NULL DEFAULT 0,
+            latency_sum REAL NOT NULL DEFAULT 0,
+            latency_count INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, provider)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_providers (
+            provider TEXT PRIMARY KEY,
+            responses INTEGER NOT NULL DEFAULT 0,
+            successes INTEGER NOT NULL DEFAULT 0,
+            latency_sum REAL NOT NULL DEFAULT 0,
+            latency_count INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_latency (
+            provider TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (provider, bucket)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Instructions ajoutant (ou retirant) une ligne aux agrégats, communes aux triggers
+    def conversation_add(row: str) -> str:
+        return f'''
+            INSERT INTO stats_daily (day, conversations, successful)
+            VALUES (DATE({row}.timestamp), 1, CASE WHEN {row}.response_success = 1 THEN 1 ELSE 0 END)
+            ON CONFLICT (day) DO UPDATE SET
+                conversations = conversations + 1,
+                successful = successful + excluded.successful;'''
+    
+    def conversation_remove(row: str) -> str:
+        return f'''
+            UPDATE stats_daily SET
+                conversations = conversations - 1,
+                successful = successful - CASE WHEN {row}.response_success = 1 THEN 1 ELSE 0 END
+            WHERE day = DATE({row}.timestamp);
+            DELETE FROM stats_daily WHERE day = DATE({row}.timestamp) AND conversations <= 0;'''
+    
+    def response_values(row: str) -> Dict[str, str]:
+        return {
+            'hour': (f"COALESCE((SELECT STRFTIME('%Y-%m-%d %H:00:00', timestamp) FROM conversations "
+                     f"WHERE id = {row}.conversation_id), STRFTIME('%Y-%m-%d %H:00:00', 'now'))"),
+            'success': f"CASE WHEN {row}.success = 1 THEN 1 ELSE 0 END",
+            'latency': f"COALESCE({row}.response_time, 0)",
+            'measured': f"CASE WHEN {row}.response_time IS NULL THEN 0 ELSE 1 END",
+            'tokens': f"COALESCE({row}.tokens_used, 0)",
+            'bucket': _latency_bucket_sql(f"{row}.response_time"),
+        }
+    
+    def response_add(row: str) -> str:
+        v = response_values(row)
+        return f'''
+            INSERT INTO stats_hourly (hour, provider, responses, successes, latency_sum, latency_count, tokens)
+            VALUES ({v['hour']}, {row}.provider, 1, {v['success']}, {v['latency']}, {v['measured']}, {v['tokens']})
+            ON CONFLICT (hour, provider) DO UPDATE SET
+                responses = responses + 1,
+                successes = successes + excluded.successes,
+                latency_sum = latency_sum + excluded.latency_sum,
+                latency_count = latency_count + excluded.latency_count,
+                tokens = tokens + excluded.tokens;
+            INSERT INTO stats_providers (provider, responses, successes, latency_sum, latency_count, tokens)
+            VALUES ({row}.provider, 1, {v['success']}, {v['latency']}, {v['measured']}, {v['tokens']})
+            ON CONFLICT (provider) DO UPDATE SET
+                responses = responses + 1,
+                successes = successes + excluded.successes,
+                latency_sum = latency_sum + excluded.latency_sum,
+                latency_count = latency_count + excluded.latency_count,
+                tokens = tokens + excluded.tokens;
+            INSERT INTO stats_latency (provider, bucket, count)
+            SELECT {row}.provider, {v['bucket']}, 1 WHERE {row}.response_time IS NOT NULL
+            ON CONFLICT (provider, bucket) DO UPDATE SET count = count + 1;'''
+    
+    def response_remove(row: str) -> str:
+        v = response_values(row)
+        return f'''
+            UPDATE stats_hourly SET
+                responses = responses - 1,
+                successes = successes - {v['success']},
+                latency_sum = latency_sum - {v['latency']},
+                latency_count = latency_count - {v['measured']},
+                tokens = tokens - {v['tokens']}
+            WHERE hour = {v['hour']} AND provider = {row}.provider;
+            DELETE FROM stats_hourly
+            WHERE hour = {v['hour']} AND provider = {row}.provider AND responses <= 0;
+            UPDATE stats_providers SET
+                responses = responses - 1,
+                successes = successes - {v['success']},
+                latency_sum = latency_sum - {v['latency']},
+                latency_count = latency_count - {v['measured']},
+                tokens = tokens - {v['tokens']}
+            WHERE provider = {row}.provider;
+            DELETE FROM stats_providers WHERE provider = {row}.provider AND responses <= 0;
+            UPDATE stats_latency SET count = count - 1
+            WHERE {row}.response_time IS NOT NULL AND provider = {row}.provider AND bucket = {v['bucket']};
+            DELETE FROM stats_latency WHERE provider = {row}.provider AND count <= 0;'''
+    
+    def responses_shift(row: str, sign: str) -> str:
+        # Déplace les réponses d'une conversation vers (+) ou hors de (-) l'heure de celle-ci
+        return f'''
+            INSERT INTO stats_hourly (hour, provider, responses, successes, latency_sum, latency_count, tokens)
+            SELECT STRFTIME('%Y-%m-%d %H:00:00', {row}.timestamp), provider, {sign}COUNT(*),
+                   {sign}SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END), {sign}COALESCE(SUM(response_time), 0),
+                   {sign}COUNT(response_time), {sign}COALESCE(SUM(tokens_used), 0)
+            FROM responses WHERE conversation_id = {row}.id GROUP BY provider
+            ON CONFLICT (hour, provider) DO UPDATE SET
+                responses = responses + excluded.responses,
+                successes = successes + excluded.successes,
+                latency_sum = latency_sum + excluded.latency_sum,
+                latency_count = latency_count + excluded.latency_count,
+                tokens = tokens + excluded.tokens;
+            DELETE FROM stats_hourly
+            WHERE hour = STRFTIME('%Y-%m-%d %H:00:00', {row}.timestamp) AND responses <= 0;'''
+    
+    triggers = {
+        'conversations_stats_insert': ('AFTER INSERT ON conversations', conversation_add('new')),
+        'conversations_stats_delete': ('AFTER DELETE ON conversations', conversation_remove('old')),
+        'conversations_stats_update': ('AFTER UPDATE OF timestamp, response_success ON conversations',
+                                       conversation_remove('old') + conversation_add('new')
+                                       + responses_shift('old', '-') + responses_shift('new', '')),
+        'responses_stats_insert': ('AFTER INSERT ON responses', response_add('new')),
+        'responses_stats_delete': ('AFTER DELETE ON responses', response_remove('old')),
+        'responses_stats_update': ('AFTER UPDATE OF conversation_id, provider, success, response_time, '
+                                   'tokens_used ON responses',
+                                   response_remove('old') + response_add('new')),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body}\n        END')
+    
+    # Agréger l'historique existant
+    _backfill_statistics_rollups(cursor)
+
+
+def _backfill_statistics_rollups(cursor: sqlite3.Cursor):
+    """Remplit les agrégats de statistiques (vides) à partir des conversations et réponses."""
+    cursor.execute('''
+        INSERT INTO stats_daily (day, conversations, successful)
+        SELECT DATE(timestamp), COUNT(*), SUM(CASE WHEN response_success = 1 THEN 1 ELSE 0 END)
+        FROM conversations
+        GROUP BY DATE(timestamp)
+    ''')
+    cursor.execute('''
+        INSERT INTO stats_hourly (hour, provider, responses, successes, latency_sum, latency_count, tokens)
+        SELECT COALESCE(STRFTIME('%Y-%m-%d %H:00:00', c.timestamp), STRFTIME('%Y-%m-%d %H:00:00', 'now')),
+               r.provider, COUNT(*), SUM(CASE WHEN r.success = 1 THEN 1 ELSE 0 END),
+               COALESCE(SUM(r.response_time), 0), COUNT(r.response_time), COALESCE(SUM(r.tokens_used), 0)
+        FROM responses r
+        LEFT JOIN conversations c ON c.id = r.conversation_id
+        GROUP BY 1, 2
+    ''')
+    cursor.execute('''
+        INSERT INTO stats_providers (provider, responses, successes, latency_sum, latency_count, tokens)
+        SELECT provider, SUM(responses), SUM(successes), SUM(latency_sum), SUM(latency_count), SUM(tokens)
+        FROM stats_hourly
+        GROUP BY provider
+    ''')
+    cursor.execute(f'''
+        INSERT INTO stats_latency (provider, bucket, count)
+        SELECT provider, {_latency_bucket_sql('response_time')}, COUNT(*)
+        FROM responses
+        WHERE response_time IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+
+def _migration_005_token_usage(cursor: sqlite3.Cursor):
+    """Tokens du prompt et générés, coût de chaque réponse, et agrégat ``stats_costs``.
+    
+    ``stats_costs`` cumule, par jour (de la conversation), fournisseur et modèle,
+    les requêtes, les tokens et le coût ; il sert aux statistiques et à reprendre
+    les dépenses du jour au démarrage.
+    """
+    cursor.execute('ALTER TABLE responses ADD COLUMN prompt_tokens INTEGER')
+    cursor.execute('ALTER TABLE responses ADD COLUMN completion_tokens INTEGER')
+    cursor.execute('ALTER TABLE responses ADD COLUMN cost REAL')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_costs (
+            day TEXT NOT NULL,
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, provider, model)
+        ) WITHOUT ROWID
+    ''')
+    
+    def day(row: str) -> str:
+        return (f"COALESCE((SELECT DATE(timestamp) FROM conversations WHERE id = {row}.conversation_id), "
+                f"DATE('now'))")
+    
+    def cost_add(row: str, sign: str = '') -> str:
+        return f'''
+            INSERT INTO stats_costs (day, provider, model, requests, prompt_tokens, completion_tokens, cost)
+            VALUES ({day(row)}, {row}.provider, COALESCE({row}.model, ''), {sign}1,
+                    {sign}COALESCE({row}.prompt_tokens, 0), {sign}COALESCE({row}.completion_tokens, 0),
+                    {sign}COALESCE({row}.cost, 0))
+            ON CONFLICT (day, provider, model) DO UPDATE SET
+                requests = requests + excluded.requests,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                cost = cost + excluded.cost;
+            DELETE FROM stats_costs
+            WHERE day = {day(row)} AND provider = {row}.provider
+              AND model = COALESCE({row}.model, '') AND requests <= 0;'''
+    
+    def day_shift(row: str, sign: str) -> str:
+        # Déplace les réponses d'une conversation vers (+) ou hors de (-) le jour de celle-ci
+        return f'''
+            INSERT INTO stats_costs (day, provider, model, requests, prompt_tokens, completion_tokens, cost)
+            SELECT DATE({row}.timestamp), provider, COALESCE(model, ''), {sign}COUNT(*),
+                   {sign}COALESCE(SUM(prompt_tokens), 0), {sign}COALESCE(SUM(completion_tokens), 0),
+                   {sign}COALESCE(SUM(cost), 0)
+            FROM responses WHERE conversation_id = {row}.id GROUP BY provider, COALESCE(model, '')
+            ON CONFLICT (day, provider, model) DO UPDATE SET
+                requests = requests + excluded.requests,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                cost = cost + excluded.cost;
+            DELETE FROM stats_costs WHERE day = DATE({row}.timestamp) AND requests <= 0;'''
+    
+    triggers = {
+        'responses_cost_insert': ('AFTER INSERT ON responses', cost_add('new')),
+        'responses_cost_delete': ('AFTER DELETE ON responses', cost_add('old', '-')),
+        'responses_cost_update': ('AFTER UPDATE OF conversation_id, provider, model, prompt_tokens, '
+                                  'completion_tokens, cost ON responses',
+                                  cost_add('old', '-') + cost_add('new')),
+        'conversations_cost_update': ('AFTER UPDATE OF timestamp ON conversations '
+                                      'WHEN DATE(old.timestamp) IS NOT DATE(new.timestamp)',
+                                      day_shift('old', '-') + day_shift('new', '')),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body}\n        END')
+    
+    # Agréger l'historique existant (réponses antérieures : sans tokens ni coût)
+    _backfill_costs(cursor)
+
+
+def _backfill_costs(cursor: sqlite3.Cursor):
+    """Remplit l'agrégat ``stats_costs`` (vide) à partir des réponses."""
+    cursor.execute('''
+        INSERT INTO stats_costs (day, provider, model, requests, prompt_tokens, completion_tokens, cost)
+        SELECT COALESCE(DATE(c.timestamp), DATE('now')), r.provider, COALESCE(r.model, ''), COUNT(*),
+               COALESCE(SUM(r.prompt_tokens), 0), COALESCE(SUM(r.completion_tokens), 0),
+               COALESCE(SUM(r.cost), 0)
+        FROM responses r
+        LEFT JOIN conversations c ON c.id = r.conversation_id
+        GROUP BY 1, 2, 3
+    ''')
+
+def _migration_006_request_recording(cursor: sqlite3.Cursor):
+    """Route d'origine de chaque conversation et délai avant le premier fragment des réponses en flux."""
+    cursor.execute('ALTER TABLE conversations ADD COLUMN endpoint TEXT')
+    cursor.execute('ALTER TABLE responses ADD COLUMN time_to_first_token REAL')
+
+def _migration_007_full_text_response_updates(cursor: sqlite3.Cursor):
+    """Réindexation plein texte des réponses dont le texte est modifié.
+    
+    Aucune réponse n'était modifiée jusqu'ici : l'index existant reste juste
+    (``rebuild_aggregates`` le reconstruit au besoin). Sans FTS5, rien à tenir
+    à jour : le trigger est créé avec l'index s'il devient disponible plus tard.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+    ).fetchone()
+    if exists is None:
+        return
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS responses_fts_update
+        AFTER UPDATE OF response_text ON responses BEGIN
+            UPDATE conversations_fts
+            SET responses = COALESCE((
+                SELECT GROUP_CONCAT(response_text, ' ')
+                FROM responses WHERE conversation_id = new.conversation_id
+            ), '')
+            WHERE rowid = new.conversation_id;
+        END
+    ''')
+
+# Migrations ordonnées : (version, description, fonction recevant un curseur).
+# Une migration appliquée ne doit plus être modifiée ; toute évolution du
+# schéma s'ajoute à la fin de cette liste.
+MIGRATIONS = [
+    (1, "Schéma initial", _migration_001_initial_schema),
+    (2, "Index secondaires", _migration_002_secondary_indexes),
+    (3, "Recherche plein texte FTS5", _migration_003_full_text_search),
+    (4, "Agrégats de statistiques", _migration_004_statistics_rollups),
+    (5, "Tokens et coût des réponses", _migration_005_token_usage),
+    (6, "Route et délai du premier fragment", _migration_006_request_recording),
+    (7, "Réindexation des réponses modifiées", _migration_007_full_text_response_updates),
+]
+
+
 class DatabaseManager:
     def __init__(self, db_path: str = "data/conversations.db"):
         # Créer le dossier data s'il n'existe pas
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         self.db_path = db_path
+        
+        # Réglages SQLite (surchargeables par l'environnement)
+        self.busy_timeout = float(os.getenv('DB_BUSY_TIMEOUT', 5.0))
+        self.cache_size_kb = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+        self.mmap_size = int(os.getenv('DB_MMAP_SIZE', 268435456))
+        
+        # Statistiques gardées en mémoire quelques secondes (le tableau de bord interroge /api/stats en boucle)
+        self.stats_cache_ttl = float(os.getenv('STATS_CACHE_TTL', 5))
+        self._stats_cache = (0.0, None)
+        self._stats_lock = threading.Lock()
+        
+        # Une connexion persistante par thread, réutilisée entre les requêtes
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        
         self.init_database()
+        self.fts_enabled = self._table_exists('conversations_fts')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant, créée et configurée au premier appel.
+        
+        Utilisée comme ``with self._connect() as conn:`` : le bloc valide la
+        transaction (ou l'annule en cas d'erreur) sans fermer la connexion.
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            return conn
+        
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        
+        # Pages libérées par les suppressions rendues au disque à la demande ; doit précéder
+        # le passage en WAL, sans effet sur une base existante (voir enable_incremental_vacuum)
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        # WAL : les lecteurs ne bloquent plus derrière les écrivains
+        conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL suffit en WAL (pas de fsync à chaque commit, base toujours cohérente)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        
+        self._local.connection = conn
+        current = threading.current_thread()
+        with self._connections_lock:
+            # Fermer les connexions des threads terminés
+            for ident, (thread, old_conn) in list(self._connections.items()):
+                if not thread.is_alive():
+                    old_conn.close()
+                    del self._connections[ident]
+            self._connections[current.ident] = (current, conn)
+        
+        return conn
+    
+    def close(self):
+        """Ferme toutes les connexions ouvertes par ce gestionnaire."""
+        with self._connections_lock:
+            for thread, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
     
     def init_database(self):
-        """Initialise la base de données avec les tables nécessaires."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Initialise la base de données en appliquant les migrations en attente."""
+        with self._connect() as conn:
             cursor = conn.cursor()
-            
-            # Table pour les conversations
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    prompt TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    user_session TEXT,
-                    model_used TEXT,
-                    response_success BOOLEAN DEFAULT 1
-                )
-            ''')
-            
-            # Table pour les réponses détaillées
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS responses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversation_id INTEGER,
-                    provider TEXT NOT NULL,
-                    model TEXT,
-                    response_text TEXT,
-                    success BOOLEAN DEFAULT 1,
-                    error_message TEXT,
-                    response_time REAL,
-                    tokens_used INTEGER,
-                    FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            conn.commit()
+        
+        applied = [version for version, description, migration in MIGRATIONS
+                   if self._apply_migration(version, description, migration)]
+        # Migration 3 appliquée sans FTS5 lors d'un démarrage précédent : nouvel essai
+        if 3 not in applied:
+            self._ensure_full_text_search()
+        
+        with self._connect() as conn:
+            conn.execute('PRAGMA optimize')
+    
+    def _apply_migration(self, version: int, description: str, migration) -> bool:
+        """Applique une migration dans sa propre transaction si elle ne l'a pas déjà été.
+        
+        Le verrou d'écriture est pris avant de relire la version : plusieurs
+        processus qui démarrent en même temps n'appliquent chaque migration qu'une fois.
+        Retourne True si la migration vient d'être appliquée.
+        """
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            applied = conn.execute(
+                'SELECT 1 FROM schema_version WHERE version = ?', (version,)
+            ).fetchone()
+            if applied:
+                conn.rollback()
+                return False
             
+            migration(conn.cursor())
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+            return True
+    
+    def _ensure_full_text_search(self) -> bool:
+        """Crée l'index plein texte s'il manque (base migrée par un SQLite sans FTS5).
+        
+        La migration 3 reste enregistrée même sans FTS5 : l'index, ses triggers et
+        celui de la migration 7 sont créés ici dès que FTS5 est disponible.
+        """
+        if self._table_exists('conversations_fts'):
+            return True
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            _migration_003_full_text_search(cursor)
+            created = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+            ).fetchone() is not None
+            if not created:
+                conn.rollback()
+                return False
+            _migration_007_full_text_response_updates(cursor)
+            conn.commit()
+        print("Index plein texte créé : recherche FTS5 activée")
+        return True
+    
+    def _table_exists(self, name: str) -> bool:
+        """Indique si une table (ou table virtuelle) existe dans la base."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+            ).fetchone()
+            return row is not None
+    
+    def rebuild_aggregates(self):
+        """Recalcule l'index plein texte et les tables d'agrégats à partir des conversations et réponses.
+        
+        Sert après un chargement massif fait sans les triggers (ou pour corriger
+        des agrégats) ; les écritures concurrentes attendent la fin du recalcul.
+        """
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            for table in ('stats_daily', 'stats_hourly', 'stats_providers', 'stats_latency', 'stats_costs'):
+                cursor.execute(f'DELETE FROM {table}')
+            _backfill_statistics_rollups(cursor)
+            _backfill_costs(cursor)
+            if self.fts_enabled:
+                cursor.execute('DELETE FROM conversations_fts')
+                _backfill_full_text_search(cursor)
             conn.commit()
+        
+        with self._stats_lock:
+            self._stats_cache = (0.0, None)
     
+    def get_schema_version(self) -> int:
+        """Retourne la version du schéma appliquée à la base."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+            return row[0] or 0
+    
+    @DB_LATENCY.timed(operation='save_conversation')
     def save_conversation(self, prompt: str, user_session: str = None, 
-                         model_used: str = None, response_success: bool = True) -> int:
+                         model_used: str = None, response_success: bool = True,
+                         endpoint: str = None) -> int:
         """Sauvegarde une nouvelle conversation et retourne son ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO conversations (prompt, user_session, model_used, response_success)
-                VALUES (?, ?, ?, ?)
-            ''', (prompt, user_session, model_used, response_success))
+                INSERT INTO conversations (prompt, user_session, model_used, response_success, endpoint)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (prompt, user_session, model_used, response_success, endpoint))
             
             conversation_id = cursor.lastrowid
             conn.commit()
             return conversation_id
     
+    @DB_LATENCY.timed(operation='save_response')
     def save_response(self, conversation_id: int, provider: str, model: str = None,
                      response_text: str = None, success: bool = True, 
                      error_message: str = None, response_time: float = None,
-                     tokens_used: int = None):
+                     tokens_used: int = None, prompt_tokens: int = None,
+                     completion_tokens: int = None, cost: float = None,
+                     time_to_first_token: float = None):
         """Sauvegarde une réponse pour une conversation."""
-        with sqlite3.connect(self.db_path) as conn:
+        if tokens_used is None and (prompt_tokens is not None or completion_tokens is not None):
+            tokens_used = (prompt_tokens or 0) + (completion_tokens or 0)
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO responses 
                 (conversation_id, provider, model, response_text, success, 
-                 error_message, response_time, tokens_used)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                 error_message, response_time, tokens_used, prompt_tokens, completion_tokens, cost,
+                 time_to_first_token)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (conversation_id, provider, model, response_text, success,
-                  error_message, response_time, tokens_used))
+                  error_message, response_time, tokens_used, prompt_tokens, completion_tokens, cost,
+                  time_to_first_token))
             
             conn.commit()
     
+    @DB_LATENCY.timed(operation='save_conversations_batch')
+    def save_conversations_batch(self, records: List[Dict]) -> List[int]:
+        """Sauvegarde un lot de conversations et de leurs réponses en une seule transaction.
+        
+        Chaque enregistrement contient les champs de ``save_conversation`` et une
+        liste ``responses`` de dictionnaires reprenant ceux de ``save_response``.
+        Retourne les identifiants des conversations créées, dans l'ordre du lot.
+        """
+        conversation_ids = []
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for record in records:
+                cursor.execute('''
+                    INSERT INTO conversations (prompt, user_session, model_used, response_success, endpoint)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (record['prompt'], record.get('user_session'), record.get('model_used'),
+                      record.get('response_success', True), record.get('endpoint')))
+                conversation_id = cursor.lastrowid
+                conversation_ids.append(conversation_id)
+                
+                cursor.executemany('''
+                    INSERT INTO responses 
+                    (conversation_id, provider, model, response_text, success, 
+                     error_message, response_time, tokens_used, prompt_tokens, completion_tokens, cost,
+                     time_to_first_token)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(conversation_id, response['provider'], response.get('model'),
+                       response.get('response_text'), response.get('success', True),
+                       response.get('error_message'), response.get('response_time'),
+                       self._total_tokens(response), response.get('prompt_tokens'),
+                       response.get('completion_tokens'), response.get('cost'),
+                       response.get('time_to_first_token'))
+                      for response in record.get('responses', [])])
+            
+            conn.commit()
+        return conversation_ids
+    
+    @staticmethod
+    def _total_tokens(response: Dict) -> Optional[int]:
+        """Tokens d'une réponse : ``tokens_used`` ou, à défaut, somme des tokens du prompt et générés."""
+        if response.get('tokens_used') is not None:
+            return response['tokens_used']
+        if response.get('prompt_tokens') is None and response.get('completion_tokens') is None:
+            return None
+        return (response.get('prompt_tokens') or 0) + (response.get('completion_tokens') or 0)
+    
+    @DB_LATENCY.timed(operation='get_conversation_history')
     def get_conversation_history(self, limit: int = 50, offset: int = 0) -> List[Dict]:
         """Récupère l'historique des conversations."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT c.id, c.prompt, c.timestamp, c.model_used, c.response_success,
                        GROUP_CONCAT(r.provider) as providers,
                        GROUP_CONCAT(r.success) as response_successes
-                FROM conversations c
+                FROM (
+                    SELECT id, prompt, timestamp, model_used, response_success
+                    FROM conversations
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ? OFFSET ?
+                ) c
                 LEFT JOIN responses r ON c.id = r.conversation_id
                 GROUP BY c.id
-                ORDER BY c.timestamp DESC
-                LIMIT ? OFFSET ?
+                ORDER BY c.timestamp DESC, c.id DESC
             ''', (limit, offset))
             
-            conversations = []
-            for row in cursor.fetchall():
-                conversation = {
-                    'id': row['id'],
-                    'prompt': row['prompt'],
-                    'timestamp': row['timestamp'],
-                    'model_used': row['model_used'],
-                    'response_success': bool(row['response_success']),
-                    'providers': row['providers'].split(',') if row['providers'] else [],
-                    'response_successes': [bool(int(s)) for s in row['response_successes'].split(',')] if row['response_successes'] else []
-                }
-                conversations.append(conversation)
-            
-            return conversations
+            return [self._history_item(row) for row in cursor.fetchall()]
+    
+    @DB_LATENCY.timed(operation='get_conversation_history_page')
+    def get_conversation_history_page(self, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Récupère une page de l'historique par pagination sur curseur (keyset).
+        
+        Le curseur opaque encode le couple (timestamp, id) de la dernière
+        conversation de la page précédente : chaque page est lue directement
+        dans l'index, quelle que soit sa profondeur, et les insertions
+        concurrentes ne décalent pas les pages suivantes.
+        
+        Retourne ``{'history': [...], 'next_cursor': str ou None}``.
+        """
+        if cursor:
+            timestamp, conversation_id = self.decode_cursor(cursor)
+            where = 'WHERE (timestamp, id) < (?, ?)'
+            params = (timestamp, conversation_id, limit + 1)
+        else:
+            where = ''
+            params = (limit + 1,)
+        
+        with self._connect() as conn:
+            rows = conn.execute(f'''
+                SELECT c.id, c.prompt, c.timestamp, c.model_used, c.response_success,
+                       GROUP_CONCAT(r.provider) as providers,
+                       GROUP_CONCAT(r.success) as response_successes
+                FROM (
+                    SELECT id, prompt, timestamp, model_used, response_success
+                    FROM conversations
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                ) c
+                LEFT JOIN responses r ON c.id = r.conversation_id
+                GROUP BY c.id
+                ORDER BY c.timestamp DESC, c.id DESC
+            ''', params).fetchall()
+        
+        # Une ligne de plus que demandé indique qu'une page suivante existe
+        history = [self._history_item(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and history:
+            last = history[-1]
+            next_cursor = self.encode_cursor(last['timestamp'], last['id'])
+        
+        return {'history': history, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def encode_cursor(timestamp: str, conversation_id: int) -> str:
+        """Encode la position (timestamp, id) en curseur opaque."""
+        raw = json.dumps([timestamp, conversation_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """Décode un curseur opaque ; lève ValueError s'il est invalide."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, conversation_id = json.loads(base64.urlsafe_b64decode(padded))
+            return str(timestamp), int(conversation_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Curseur invalide: {cursor}") from e
     
+    @staticmethod
+    def _history_item(row: sqlite3.Row) -> Dict:
+        """Convertit une ligne de l'historique (avec fournisseurs agrégés) en dictionnaire."""
+        return {
+            'id': row['id'],
+            'prompt': row['prompt'],
+            'timestamp': row['timestamp'],
+            'model_used': row['model_used'],
+            'response_success': bool(row['response_success']),
+            'providers': row['providers'].split(',') if row['providers'] else [],
+            'response_successes': [bool(int(s)) for s in row['response_successes'].split(',')] if row['response_successes'] else []
+        }
+    
+    @DB_LATENCY.timed(operation='get_conversation_details')
     def get_conversation_details(self, conversation_id: int) -> Optional[Dict]:
         """Récupère les détails d'une conversation spécifique avec ses réponses."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Récupérer la conversation
             cursor.execute('''
-                SELECT id, prompt, timestamp, model_used, response_success
+                SELECT id, prompt, timestamp, model_used, response_success, endpoint
                 FROM conversations
                 WHERE id = ?
             ''', (conversation_id,))
@@ -130,7 +853,8 @@ class DatabaseManager:
             # Récupérer les réponses
             cursor.execute('''
                 SELECT provider, model, response_text, success, error_message,
-                       response_time, tokens_used
+                       response_time, tokens_used, prompt_tokens, completion_tokens, cost,
+                       time_to_first_token
                 FROM responses
                 WHERE conversation_id = ?
                 ORDER BY id
@@ -145,7 +869,11 @@ class DatabaseManager:
                     'success': bool(row['success']),
                     'error_message': row['error_message'],
                     'response_time': row['response_time'],
-                    'tokens_used': row['tokens_used']
+                    'tokens_used': row['tokens_used'],
+                    'prompt_tokens': row['prompt_tokens'],
+                    'completion_tokens': row['completion_tokens'],
+                    'cost': row['cost'],
+                    'time_to_first_token': row['time_to_first_token']
                 }
                 responses.append(response)
             
@@ -155,15 +883,73 @@ class DatabaseManager:
                 'timestamp': conversation_row['timestamp'],
                 'model_used': conversation_row['model_used'],
                 'response_success': bool(conversation_row['response_success']),
+                'endpoint': conversation_row['endpoint'],
                 'responses': responses
             }
             
             return conversation
     
+    @DB_LATENCY.timed(operation='search_conversations')
     def search_conversations(self, search_term: str, limit: int = 20) -> List[Dict]:
-        """Recherche dans les conversations par mot-clé."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        """Recherche dans les prompts et les réponses par mot-clé.
+        
+        Avec FTS5, les résultats sont classés par pertinence (bm25, le prompt
+        pesant double) et accompagnés d'un extrait où les termes trouvés sont
+        entourés de ``<mark>``. Sans FTS5, recherche LIKE sur les prompts.
+        """
+        if not self.fts_enabled:
+            return self._search_conversations_like(search_term, limit)
+        
+        match_query = self._fts_query(search_term)
+        if not match_query:
+            return []
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT c.id, c.prompt, c.timestamp, c.model_used, c.response_success,
+                       bm25(conversations_fts, 2.0, 1.0) AS score,
+                       snippet(conversations_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet
+                FROM conversations_fts
+                JOIN conversations c ON c.id = conversations_fts.rowid
+                WHERE conversations_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ''', (match_query, limit))
+            
+            conversations = []
+            for row in cursor.fetchall():
+                conversation = {
+                    'id': row['id'],
+                    'prompt': row['prompt'],
+                    'timestamp': row['timestamp'],
+                    'model_used': row['model_used'],
+                    'response_success': bool(row['response_success']),
+                    'score': -row['score'],
+                    'snippet': row['snippet']
+                }
+                conversations.append(conversation)
+            
+            return conversations
+    
+    @staticmethod
+    def _fts_query(search_term: str) -> str:
+        """Transforme la saisie utilisateur en requête FTS5 sûre.
+        
+        Chaque mot est cité (aucun opérateur FTS5 n'est interprété), tous les
+        mots sont requis et le dernier est recherché comme préfixe.
+        """
+        words = re.findall(r'\w+', search_term)
+        if not words:
+            return ''
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+    
+    def _search_conversations_like(self, search_term: str, limit: int) -> List[Dict]:
+        """Recherche par LIKE sur les prompts (SQLite sans FTS5)."""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -187,10 +973,11 @@ class DatabaseManager:
             
             return conversations
     
+    @DB_LATENCY.timed(operation='delete_conversation')
     def delete_conversation(self, conversation_id: int) -> bool:
         """Supprime une conversation et ses réponses associées."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Supprimer d'abord les réponses
@@ -204,77 +991,206 @@ class DatabaseManager:
         except Exception:
             return False
     
+    @DB_LATENCY.timed(operation='get_statistics')
     def get_statistics(self) -> Dict:
-        """Récupère des statistiques sur les conversations."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Récupère des statistiques sur les conversations.
+        
+        Lues dans les tables d'agrégats (migration 4), donc en temps constant quelle
+        que soit la taille de l'historique, et gardées en mémoire ``STATS_CACHE_TTL`` secondes.
+        """
+        with self._stats_lock:
+            expires_at, cached = self._stats_cache
+            if cached is not None and time.monotonic() < expires_at:
+                return dict(cached)
+            
+            stats = self._read_statistics()
+            self._stats_cache = (time.monotonic() + self.stats_cache_ttl, stats)
+            return dict(stats)
+    
+    def _read_statistics(self) -> Dict:
+        """Construit les statistiques à partir des tables d'agrégats."""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
-            # Total des conversations
-            cursor.execute('SELECT COUNT(*) FROM conversations')
-            total_conversations = cursor.fetchone()[0]
+            # Totaux des conversations (une ligne par jour)
+            cursor.execute('SELECT COALESCE(SUM(conversations), 0), COALESCE(SUM(successful), 0) FROM stats_daily')
+            total_conversations, successful_conversations = cursor.fetchone()
             
-            # Conversations réussies
-            cursor.execute('SELECT COUNT(*) FROM conversations WHERE response_success = 1')
-            successful_conversations = cursor.fetchone()[0]
+            # Histogramme des temps de réponse par fournisseur
+            buckets = STATS_LATENCY_BUCKETS + (float('inf'),)
+            latency_counts = {}
+            cursor.execute('SELECT provider, bucket, count FROM stats_latency')
+            for row in cursor.fetchall():
+                counts = latency_counts.setdefault(row[0], [0] * len(buckets))
+                counts[row[1]] = row[2]
             
             # Réponses par fournisseur
             cursor.execute('''
-                SELECT provider, COUNT(*) as count, 
-                       AVG(response_time) as avg_time,
-                       SUM(tokens_used) as total_tokens
-                FROM responses
-                GROUP BY provider
+                SELECT provider, responses, successes, latency_sum, latency_count, tokens
+                FROM stats_providers
             ''')
             
             provider_stats = {}
             for row in cursor.fetchall():
+                counts = latency_counts.get(row[0], [])
                 provider_stats[row[0]] = {
                     'count': row[1],
-                    'avg_time': row[2],
-                    'total_tokens': row[3] or 0
+                    'avg_time': row[3] / row[4] if row[4] else None,
+                    'total_tokens': row[5],
+                    'success_rate': row[2] / row[1] * 100 if row[1] else 0,
+                    'p50_time': bucket_quantile(buckets, counts, 0.5),
+                    'p95_time': bucket_quantile(buckets, counts, 0.95),
                 }
             
             # Conversations par jour (7 derniers jours)
             cursor.execute('''
-                SELECT DATE(timestamp) as date, COUNT(*) as count
-                FROM conversations
-                WHERE timestamp >= datetime('now', '-7 days')
-                GROUP BY DATE(timestamp)
-                ORDER BY date DESC
+                SELECT day, conversations
+                FROM stats_daily
+                WHERE day >= DATE('now', '-7 days')
+                ORDER BY day DESC
             ''')
             
             daily_stats = {}
             for row in cursor.fetchall():
                 daily_stats[row[0]] = row[1]
             
+            # Réponses par heure et par fournisseur (24 dernières heures)
+            cursor.execute('''
+                SELECT hour, provider, responses
+                FROM stats_hourly
+                WHERE hour >= STRFTIME('%Y-%m-%d %H:00:00', 'now', '-23 hours')
+                ORDER BY hour DESC
+            ''')
+            
+            hourly_stats = {}
+            for row in cursor.fetchall():
+                hourly_stats.setdefault(row[0], {})[row[1]] = row[2]
+            
+            # Tokens et coût par modèle (30 derniers jours) et dépense du jour
+            cursor.execute('''
+                SELECT provider, model, SUM(requests), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost),
+                       SUM(CASE WHEN day = DATE('now') THEN cost ELSE 0 END)
+                FROM stats_costs
+                WHERE day >= DATE('now', '-30 days')
+                GROUP BY provider, model
+            ''')
+            
+            cost_stats = {'today': 0.0, 'last_30_days': 0.0, 'models': {}}
+            for row in cursor.fetchall():
+                cost_stats['models'][f"{row[0]}/{row[1]}" if row[1] else row[0]] = {
+                    'requests': row[2],
+                    'prompt_tokens': row[3],
+                    'completion_tokens': row[4],
+                    'cost': row[5],
+                    'cost_per_request': row[5] / row[2] if row[2] else 0
+                }
+                cost_stats['last_30_days'] += row[5]
+                cost_stats['today'] += row[6]
+            
             return {
                 'total_conversations': total_conversations,
                 'successful_conversations': successful_conversations,
                 'success_rate': (successful_conversations / total_conversations * 100) if total_conversations > 0 else 0,
                 'provider_stats': provider_stats,
-                'daily_stats': daily_stats
+                'daily_stats': daily_stats,
+                'hourly_stats': hourly_stats,
+                'cost_stats': cost_stats
             }
     
-    def cleanup_old_conversations(self, days: int = 30) -> int:
-        """Nettoie les anciennes conversations (plus de X jours)."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Supprimer les réponses des anciennes conversations
-            cursor.execute('''
-                DELETE FROM responses 
-                WHERE conversation_id IN (
-                    SELECT id FROM conversations 
-                    WHERE timestamp < datetime('now', '-{} days')
-                )
-            '''.format(days))
+    def get_daily_costs(self) -> Dict[str, float]:
+        """Retourne la dépense du jour (UTC) par fournisseur, lue dans l'agrégat ``stats_costs``."""
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT provider, SUM(cost) FROM stats_costs
+                WHERE day = DATE('now')
+                GROUP BY provider
+            ''').fetchall()
+            return {row[0]: row[1] for row in rows}
+    
+    @DB_LATENCY.timed(operation='cleanup_old_conversations')
+    def cleanup_old_conversations(self, days: int = 30, batch_size: int = 1000) -> int:
+        """Nettoie les anciennes conversations (plus de X jours), par lots de ``batch_size``."""
+        cutoff = self.retention_cutoff(days)
+        deleted_count = 0
+        while True:
+            deleted = self.delete_conversations_before(cutoff, batch_size)
+            if not deleted:
+                return deleted_count
+            deleted_count += deleted
+    
+    @staticmethod
+    def retention_cutoff(days: int) -> str:
+        """Date limite (UTC, format des horodatages de la base) d'une rétention de ``days`` jours."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=int(days))
+        return cutoff.strftime('%Y-%m-%d %H:%M:%S')
+    
+    def count_conversations_before(self, cutoff: str) -> int:
+        """Nombre de conversations antérieures à ``cutoff`` (parcours de l'index par date)."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT COUNT(*) FROM conversations WHERE timestamp < ?', (cutoff,)).fetchone()
+            return row[0]
+    
+    @DB_LATENCY.timed(operation='delete_conversations_before')
+    def delete_conversations_before(self, cutoff: str, limit: int = 1000,
+                                    archive: Optional[Callable[[List[Dict]], None]] = None) -> int:
+        """Supprime au plus ``limit`` conversations antérieures à ``cutoff``, les plus anciennes d'abord.
+        
+        Une transaction courte par lot : les autres écrivains passent entre deux
+        lots. ``archive`` reçoit les conversations complètes (réponses comprises)
+        dans la même transaction, avant la suppression : si l'archivage échoue,
+        rien n'est supprimé.
+        """
+        # Bornée sous la limite de paramètres de SQLite (32766)
+        limit = max(1, min(int(limit), 10000))
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            ids = [row[0] for row in conn.execute('''
+                SELECT id FROM conversations
+                WHERE timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', (cutoff, limit))]
+            if not ids:
+                conn.rollback()
+                return 0
             
-            # Supprimer les anciennes conversations
-            cursor.execute('''
-                DELETE FROM conversations 
-                WHERE timestamp < datetime('now', '-{} days')
-            '''.format(days))
+            placeholders = ','.join('?' * len(ids))
+            if archive is not None:
+                archive(self._conversations_with_responses(conn, ids, placeholders))
             
-            deleted_count = cursor.rowcount
+            conn.execute(f'DELETE FROM responses WHERE conversation_id IN ({placeholders})', ids)
+            conn.execute(f'DELETE FROM conversations WHERE id IN ({placeholders})', ids)
             conn.commit()
-            return deleted_count 
\ No newline at end of file
+            return len(ids)
+    
+    @staticmethod
+    def _conversations_with_responses(conn: sqlite3.Connection, ids: List[int], placeholders: str) -> List[Dict]:
+        """Lignes complètes des conversations et de leurs réponses, pour l'archivage."""
+        conversations = {row['id']: {**dict(row), 'responses': []} for row in conn.execute(
+            f'SELECT * FROM conversations WHERE id IN ({placeholders}) ORDER BY timestamp, id', ids)}
+        for row in conn.execute(
+                f'SELECT * FROM responses WHERE conversation_id IN ({placeholders}) ORDER BY conversation_id, id', ids):
+            conversations[row['conversation_id']]['responses'].append(dict(row))
+        return list(conversations.values())
+    
+    def incremental_vacuum(self, pages: int = 1000) -> Dict:
+        """Rend au système de fichiers jusqu'à ``pages`` pages libérées par les suppressions.
+        
+        Nécessite ``auto_vacuum=INCREMENTAL`` (automatique pour les nouvelles bases,
+        voir ``enable_incremental_vacuum`` pour une base existante).
+        """
+        with self._connect() as conn:
+            enabled = conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not enabled or not free_pages:
+                return {"enabled": enabled, "freed_pages": 0, "free_pages": free_pages}
+            # executescript exécute le pragma jusqu'au bout (execute ne libère qu'une page par appel)
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+            remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            return {"enabled": True, "freed_pages": free_pages - remaining, "free_pages": remaining}
+    
+    def enable_incremental_vacuum(self):
+        """Passe une base existante en ``auto_vacuum=INCREMENTAL`` (VACUUM complet, base verrouillée)."""
+        with self._connect() as conn:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
\ No newline at end of file
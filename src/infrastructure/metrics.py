@@ -0,0 +1,323 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seuils (secondes) adaptés aux appels IA : de quelques dizaines de ms à la minute
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+# Seuils (secondes) adaptés aux requêtes SQLite
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def bucket_quantile(buckets: Sequence[float], counts: Sequence[int], q: float) -> Optional[float]:
+    """Estime un centile à partir de comptes par seuil (non cumulés), par interpolation linéaire.
+
+    ``buckets`` se termine par ``inf`` ; un centile tombant dans ce dernier seuil vaut le seuil précédent.
+    """
+    total = sum(counts)
+    if total == 0:
+        return None
+
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count > 0:
+            upper = buckets[index]
+            lower = buckets[index - 1] if index > 0 else 0.0
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-2]
+
+
+class _Metric:
+    """Base commune : nom, aide, étiquettes et verrou."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Étiquettes attendues pour {self.name}: {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Compteur monotone, par combinaison d'étiquettes."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """Valeur instantanée ; peut être calculée à la lecture avec ``set_function``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]):
+        """Calcule les valeurs au moment de l'export : ``{(valeurs d'étiquettes,): valeur}``."""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                items = sorted(self._function().items())
+            except Exception as e:
+                print(f"Erreur lors du calcul de la métrique {self.name}: {e}")
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """Histogramme cumulatif à seuils fixes (compatible ``histogram_quantile`` de Prometheus)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # Par combinaison d'étiquettes : [compte par seuil (non cumulé)], somme, nombre
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * len(self.buckets), [0.0, 0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Mesure la durée d'un bloc."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels: str):
+        """Décorateur mesurant la durée de chaque appel de la fonction."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """Estime un centile par interpolation linéaire dans le seuil concerné (comme Prometheus)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return None
+            counts = list(series[0])
+        return bucket_quantile(self.buckets, counts, q)
+
+    def label_values(self) -> List[Dict[str, str]]:
+        """Retourne les combinaisons d'étiquettes observées."""
+        with self._lock:
+            keys = list(self._series)
+        return [dict(zip(self.labelnames, key)) for key in keys]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._series.items())
+        lines = []
+        for key, (counts, totals) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(totals[0])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {int(totals[1])}')
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble des métriques du processus, exportées au format texte de Prometheus."""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Retourne toutes les métriques au format d'exposition texte de Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Registre du processus et métriques partagées par les modules de l'application
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requêtes HTTP traitées', ('route', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Durée des requêtes HTTP (flux compris)', ('route', 'method'))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'http_requests_in_flight', 'Requêtes HTTP en cours', ('route',))
+
+PROVIDER_REQUESTS = REGISTRY.counter(
+    'provider_requests_total', 'Appels aux fournisseurs IA', ('provider', 'model', 'outcome'))
+PROVIDER_LATENCY = REGISTRY.histogram(
+    'provider_request_duration_seconds', 'Durée des appels aux fournisseurs IA', ('provider', 'model', 'outcome'))
+PROVIDER_TTFT = REGISTRY.histogram(
+    'provider_time_to_first_token_seconds', 'Délai avant le premier fragment des flux', ('provider', 'model'))
+PROVIDER_IN_FLIGHT = REGISTRY.gauge(
+    'provider_requests_in_flight', 'Appels aux fournisseurs IA en cours', ('provider',))
+PROVIDER_TOKENS = REGISTRY.counter(
+    'provider_tokens_total', 'Tokens consommés (kind: prompt ou completion)', ('provider', 'model', 'kind'))
+PROVIDER_COST = REGISTRY.counter(
+    'provider_cost_dollars_total', 'Dépense estimée auprès des fournisseurs IA (dollars)', ('provider', 'model'))
+PROVIDER_TOKEN_RATE = REGISTRY.histogram(
+    'provider_tokens_per_second', 'Débit de génération (tokens générés par seconde)', ('provider', 'model'),
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600))
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Consultations des caches de réponses', ('cache', 'result'))
+
+DB_LATENCY = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Durée des opérations SQLite', ('operation',), buckets=DB_BUCKETS)
+
+
+@contextmanager
+def track_provider_call(provider: str, model: str) -> Iterator[None]:
+    """Mesure un appel à un fournisseur (lecture du flux comprise) et son issue."""
+    PROVIDER_IN_FLIGHT.inc(provider=provider)
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    except GeneratorExit:
+        # Flux abandonné par le client avant la fin
+        outcome = 'cancelled'
+        raise
+    finally:
+        PROVIDER_IN_FLIGHT.dec(provider=provider)
+        elapsed = time.perf_counter() - start
+        PROVIDER_REQUESTS.inc(provider=provider, model=model, outcome=outcome)
+        PROVIDER_LATENCY.observe(elapsed, provider=provider, model=model, outcome=outcome)
+
+
+def track_first_token(provider: str, model: str, chunks: Iterator[str],
+                      start: Optional[float] = None) -> Iterator[str]:
+    """Relaie les fragments d'un flux en mesurant le délai avant le premier (depuis ``start``, en ``perf_counter``)."""
+    start = start if start is not None else time.perf_counter()
+    first = True
+    for chunk in chunks:
+        if first:
+            PROVIDER_TTFT.observe(time.perf_counter() - start, provider=provider, model=model)
+            first = False
+        yield chunk
+
+
+def latency_summary(histogram: Histogram, quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[str, Dict[str, Optional[float]]]:
+    """Centiles estimés par combinaison d'étiquettes, ex. ``{'openai/gpt-4o/success': {'p95': 1.8}}``."""
+    summary = {}
+    for labels in histogram.label_values():
+        name = '/'.join(labels.values())
+        summary[name] = {f'p{int(q * 100)}': histogram.quantile(q, **labels) for q in quantiles}
+    return summary
@@ -0,0 +1,167 @@
+import difflib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ModelCatalog:
+    """Catalogue des modèles d'un fournisseur, avec sa date de chargement."""
+
+    def __init__(self, provider: str, loader: Callable[[], List[str]]):
+        self.provider = provider
+        self.loader = loader
+        self.models: Optional[List[str]] = None
+        self.loaded_at: Optional[float] = None
+        self.loaded_on: Optional[str] = None
+        self.error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+        self.refreshing = False
+        self.refreshes = 0
+
+    def age(self) -> Optional[float]:
+        return None if self.loaded_at is None else time.monotonic() - self.loaded_at
+
+
+class ModelRegistry:
+    """Registre des modèles disponibles chez chaque fournisseur.
+
+    Les catalogues sont chargés au démarrage puis rafraîchis en arrière-plan :
+    la lecture ne fait jamais d'appel réseau. Au-delà de ``ttl``, le catalogue
+    est servi tel quel pendant qu'un rafraîchissement est lancé
+    (stale-while-revalidate) ; en cas d'échec, l'ancien catalogue est conservé.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """
+        Initialise le registre.
+
+        Args:
+            ttl (float): Durée de fraîcheur d'un catalogue, en secondes (défaut: MODEL_REGISTRY_TTL ou 3600)
+            stale_ttl (float): Durée au-delà de laquelle un catalogue périmé n'est plus utilisé pour valider (défaut: MODEL_REGISTRY_STALE_TTL ou 86400)
+        """
+        self.ttl = ttl or float(os.getenv('MODEL_REGISTRY_TTL', 3600))
+        self.stale_ttl = stale_ttl or float(os.getenv('MODEL_REGISTRY_STALE_TTL', 86400))
+        self._catalogs: Dict[str, ModelCatalog] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, provider: str, loader: Callable[[], List[str]]):
+        """Déclare le chargeur du catalogue d'un fournisseur (liste vide ou exception = échec)."""
+        with self._lock:
+            self._catalogs[provider] = ModelCatalog(provider, loader)
+
+    def start(self):
+        """Charge tous les catalogues en arrière-plan puis les rafraîchit périodiquement."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def models(self, provider: str) -> Optional[List[str]]:
+        """
+        Retourne le catalogue d'un fournisseur sans appel réseau.
+
+        Args:
+            provider (str): Fournisseur IA
+
+        Returns:
+            Optional[List[str]]: Modèles connus, ou None si le catalogue n'a pas encore été chargé
+        """
+        catalog = self._catalogs.get(provider)
+        if catalog is None:
+            return None
+        age = catalog.age()
+        if age is not None and age > self.ttl:
+            self._refresh_async(catalog)
+        return list(catalog.models) if catalog.models is not None else None
+
+    def validate(self, provider: str, model: str) -> Dict[str, Any]:
+        """
+        Vérifie localement qu'un modèle existe chez le fournisseur.
+
+        Un catalogue absent ou trop ancien ne permet pas de conclure : le modèle est alors accepté.
+
+        Returns:
+            Dict[str, Any]: ``{'valid': bool, 'suggestions': [...]}``
+        """
+        models = self.models(provider)
+        catalog = self._catalogs.get(provider)
+        if not models or catalog is None or (catalog.age() or 0) > self.stale_ttl:
+            return {'valid': True, 'suggestions': []}
+        if model in models:
+            return {'valid': True, 'suggestions': []}
+        return {'valid': False, 'suggestions': difflib.get_close_matches(model, models, n=3, cutoff=0.5)}
+
+    def describe(self, provider: str) -> Dict[str, Any]:
+        """Retourne le catalogue d'un fournisseur et son état (date de chargement, fraîcheur, erreur)."""
+        catalog = self._catalogs.get(provider)
+        if catalog is None:
+            return {'provider': provider, 'models': None, 'loaded': False,
+                    'loaded_at': None, 'stale': True, 'error': None}
+        models = self.models(provider)
+        age = catalog.age()
+        return {
+            'provider': provider,
+            'models': models,
+            'loaded': models is not None,
+            'loaded_at': catalog.loaded_on,
+            'stale': age is None or age > self.ttl,
+            'error': catalog.error,
+        }
+
+    def refresh(self, provider: str) -> bool:
+        """Recharge le catalogue d'un fournisseur (appel réseau) ; conserve l'ancien en cas d'échec."""
+        catalog = self._catalogs.get(provider)
+        if catalog is None:
+            return False
+        try:
+            models = catalog.loader()
+            if not models:
+                raise ValueError("catalogue vide")
+        except Exception as e:
+            catalog.error = str(e)
+            catalog.failed_at = time.monotonic()
+            print(f"Erreur lors du chargement des modèles {provider}: {e}")
+            return False
+        finally:
+            catalog.refreshing = False
+
+        catalog.models = sorted(models)
+        catalog.loaded_at = time.monotonic()
+        catalog.loaded_on = datetime.now().isoformat()
+        catalog.error = None
+        catalog.failed_at = None
+        catalog.refreshes += 1
+        return True
+
+    def _refresh_async(self, catalog: ModelCatalog):
+        """Lance un rafraîchissement en arrière-plan s'il n'y en a pas déjà un."""
+        with self._lock:
+            # Après un échec, on attend une minute avant de solliciter à nouveau le fournisseur
+            recently_failed = catalog.failed_at is not None and time.monotonic() - catalog.failed_at < 60
+            if catalog.refreshing or recently_failed:
+                return
+            catalog.refreshing = True
+        threading.Thread(target=self.refresh, args=(catalog.provider,),
+                         name='model-registry-refresh', daemon=True).start()
+
+    def _run(self):
+        """Chargement initial puis rafraîchissement des catalogues arrivés à expiration."""
+        while not self._stop.is_set():
+            for catalog in list(self._catalogs.values()):
+                age = catalog.age()
+                if age is None or age > self.ttl:
+                    with self._lock:
+                        if catalog.refreshing:
+                            continue
+                        catalog.refreshing = True
+                    self.refresh(catalog.provider)
+            # Réessayer plus tôt tant qu'un catalogue n'a pas pu être chargé
+            missing = any(catalog.models is None for catalog in self._catalogs.values())
+            self._stop.wait(min(60.0, self.ttl) if missing else self.ttl / 4)
@@ -1,64 +1,146 @@
 import os
+import time
 import openai
 from dotenv import load_dotenv
+from contextlib import contextmanager, nullcontext
 from typing import Optional, Dict, Any
 
+from src.infrastructure.metrics import track_first_token, track_provider_call
+from src.infrastructure.token_usage import UsageTracker, cached_usage
+
 # Charger les variables d'environnement
 load_dotenv()
 
+# Prompt système et paramètres de génération (inclus dans la clé du cache de réponses)
+SYSTEM_PROMPT = "Vous êtes un assistant vocal intelligent et utile."
+GENERATION_PARAMS = {"max_tokens": 500, "temperature": 0.7}
+
 class OpenAIClient:
     """Client pour interagir avec l'API OpenAI."""
     
-    def __init__(self):
+    def __init__(self, cache=None, governor=None, resilience=None, usage=None):
         """Initialise le client OpenAI avec la clé API."""
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY non trouvée dans les variables d'environnement")
         
         openai.api_key = api_key
-        self.client = openai.OpenAI(api_key=api_key)
+        # La couche de résilience gère les nouvelles tentatives : celles du SDK sont désactivées
+        options = {"max_retries": 0} if resilience is not None else {}
+        self.client = openai.OpenAI(api_key=api_key, **options)
+        self.cache = cache
+        self.governor = governor
+        self.resilience = resilience
+        # Comptabilité des tokens et budgets (partagée entre les clients par l'application)
+        self.usage = usage if usage is not None else UsageTracker()
+    
+    @contextmanager
+    def _request(self, model: str, **kwargs):
+        """
+        Envoie une requête à l'API, sous le contrôle du gouverneur de débit et de la
+        couche de résilience s'ils sont configurés.
+        
+        La place de concurrence est conservée jusqu'à la sortie du bloc (fin de lecture d'un flux).
+        
+        Args:
+            model (str): Le modèle à utiliser
+            **kwargs: Paramètres de la requête
+            
+        Yields:
+            La réponse (ou le flux) du SDK
+        """
+        # Budget du jour épuisé (ou modèle sans tarif sous budget) : refus immédiat, sans appel au fournisseur
+        self.usage.check("openai", model)
+        
+        def attempt():
+            if self.governor is None:
+                return nullcontext(self.client.chat.completions.create(model=model, **kwargs))
+            send = lambda: self.client.chat.completions.with_raw_response.create(model=model, **kwargs)
+            return self.governor.session("openai", model, send)
+        
+        with track_provider_call("openai", model):
+            if self.resilience is None:
+                with attempt() as response:
+                    yield response
+                return
+            # Pas de requête couverte pour un flux : le second flux ne pourrait pas être abandonné proprement
+            with self.resilience.session("openai", attempt, hedge=not kwargs.get("stream")) as response:
+                yield response
     
-    def generate_response(self, prompt: str, model: str = "gpt-4o") -> Optional[str]:
+    def generate_response(self, prompt: str, model: str = "gpt-4o",
+                          use_cache: bool = True) -> Optional[str]:
         """
         Génère une réponse à partir d'un prompt en utilisant l'API OpenAI.
         
         Args:
             prompt (str): Le prompt à envoyer à l'API
             model (str): Le modèle à utiliser (défaut: gpt-4o)
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
             
         Returns:
             Optional[str]: La réponse générée ou None en cas d'erreur
         """
+        return self.generate_with_usage(prompt, model, use_cache=use_cache)["text"]
+    
+    def generate_with_usage(self, prompt: str, model: str = "gpt-4o",
+                            use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Génère une réponse et retourne sa consommation de tokens et son coût.
+        
+        Args:
+            prompt (str): Le prompt à envoyer à l'API
+            model (str): Le modèle à utiliser (défaut: gpt-4o)
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
+        
+        Returns:
+            Dict[str, Any]: ``text`` (None en cas d'erreur), ``usage`` (tokens et coût) et ``error``
+        """
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self.cache.make_key("openai", model, SYSTEM_PROMPT, GENERATION_PARAMS, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return {"text": cached, "usage": cached_usage(), "error": None}
+        
         try:
-            response = self.client.chat.completions.create(
-                model=model,
+            started = time.perf_counter()
+            with self._request(
+                model,
                 messages=[
-                    {"role": "system", "content": "Vous êtes un assistant vocal intelligent et utile."},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+                **GENERATION_PARAMS
+            ) as response:
+                text = response.choices[0].message.content
+            usage = self.usage.record_response("openai", model, response.usage,
+                                               f"{SYSTEM_PROMPT}\n{prompt}", text, started)
             
+            if cache_key is not None and text:
+                self.cache.set(cache_key, text)
+            return {"text": text, "usage": usage, "error": None}
+        
         except Exception as e:
             print(f"Erreur lors de l'appel à l'API OpenAI: {e}")
-            return None
+            return {"text": None, "usage": None, "error": str(e)}
     
-    def generate_voice_response(self, prompt: str) -> Dict[str, Any]:
+    def generate_voice_response(self, prompt: str, use_cache: bool = True,
+                                model: str = "gpt-4o") -> Dict[str, Any]:
         """
         Génère une réponse vocale à partir d'un prompt.
         
         Args:
             prompt (str): Le prompt à envoyer à l'API
+            use_cache (bool): Consulter et alimenter le cache de réponses (défaut: True)
+            model (str): Le modèle à utiliser (défaut: gpt-4o)
             
         Returns:
             Dict[str, Any]: Dictionnaire contenant la réponse textuelle et les métadonnées
         """
         try:
             # Générer la réponse textuelle
-            text_response = self.generate_response(prompt)
+            result = self.generate_with_usage(prompt, model, use_cache=use_cache)
+            text_response = result["text"]
             
             if text_response:
                 # Générer l'audio (optionnel - nécessite des crédits supplémentaires)
@@ -72,12 +154,13 @@ class OpenAIClient:
                     "success": True,
                     "text": text_response,
                     "prompt": prompt,
+                    "usage": result["usage"],
                     # "audio_url": "data:audio/mp3;base64," + base64.b64encode(audio_response.content).decode()
                 }
             else:
                 return {
                     "success": False,
-                    "error": "Impossible de générer une réponse",
+                    "error": result["error"] or "Impossible de générer une réponse",
                     "prompt": prompt
                 }
                 
@@ -86,4 +169,66 @@ class OpenAIClient:
                 "success": False,
                 "error": str(e),
                 "prompt": prompt
-            } 
\ No newline at end of file
+            } 
+    
+    def generate_streaming_response(self, prompt: str, model: str = "gpt-4o", on_usage=None):
+        """
+        Génère une réponse en streaming pour une expérience plus fluide.
+        
+        Args:
+            prompt (str): Le prompt à envoyer à l'API
+            model (str): Le modèle à utiliser
+            on_usage (Callable): Reçoit la consommation (``usage``) à la fin du flux
+            
+        Yields:
+            str: Fragments de la réponse au fur et à mesure
+        """
+        try:
+            started = time.perf_counter()
+            parts, reported = [], {}
+            with self._request(
+                model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                **GENERATION_PARAMS,
+                stream=True,
+                # Le dernier fragment porte la consommation réelle de la requête
+                stream_options={"include_usage": True}
+            ) as stream:
+                def texts():
+                    for chunk in stream:
+                        if chunk.usage is not None:
+                            reported["usage"] = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content is not None:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                
+                try:
+                    yield from track_first_token("openai", model, texts(), started)
+                finally:
+                    # Flux abandonné : la réponse HTTP est fermée, le fournisseur cesse de générer
+                    stream.close()
+                    # Flux terminé ou abandonné : les tokens déjà générés sont facturés
+                    usage = self.usage.record_response("openai", model, reported.get("usage"),
+                                                       f"{SYSTEM_PROMPT}\n{prompt}", "".join(parts), started)
+                    if on_usage is not None:
+                        on_usage(usage)
+                    
+        except Exception as e:
+            yield f"Erreur: {str(e)}"
+    
+    def get_available_models(self) -> list:
+        """
+        Récupère la liste des modèles disponibles sur OpenAI.
+        
+        Returns:
+            list: Liste des modèles disponibles
+        """
+        try:
+            models = self.client.models.list()
+            return [model.id for model in models.data]
+        except Exception as e:
+            print(f"Erreur lors de la récupération des modèles: {e}")
+            return []
@@ -0,0 +1,357 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+class RateLimitTimeout(Exception):
+    """Levée quand une requête attend trop longtemps son tour dans la file du limiteur."""
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[float]:
+    """Convertit une durée d'en-tête (``1.5``, ``6m0s``, ``120ms``, date RFC 3339) en secondes."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    if 'T' in value:
+        try:
+            reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return max((reset_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except ValueError:
+            return None
+
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def parse_rate_limit_headers(headers) -> Dict[str, Optional[float]]:
+    """
+    Extrait les quotas restants des en-têtes de réponse d'un fournisseur.
+
+    Comprend les en-têtes OpenAI/Groq (``x-ratelimit-*``) et Anthropic
+    (``anthropic-ratelimit-*``), ainsi que ``retry-after``.
+
+    Args:
+        headers: En-têtes HTTP (insensibles à la casse)
+
+    Returns:
+        Dict[str, Optional[float]]: limit/remaining/reset pour les requêtes et les tokens, retry_after
+    """
+    if headers is None:
+        return {}
+
+    def first(*names: str) -> Optional[str]:
+        for name in names:
+            value = headers.get(name)
+            if value:
+                return value
+        return None
+
+    retry_after_ms = _parse_int(headers.get('retry-after-ms'))
+    return {
+        'requests_limit': _parse_int(first('x-ratelimit-limit-requests', 'anthropic-ratelimit-requests-limit')),
+        'requests_remaining': _parse_int(first('x-ratelimit-remaining-requests', 'anthropic-ratelimit-requests-remaining')),
+        'requests_reset': _parse_seconds(first('x-ratelimit-reset-requests', 'anthropic-ratelimit-requests-reset')),
+        'tokens_limit': _parse_int(first('x-ratelimit-limit-tokens', 'anthropic-ratelimit-tokens-limit')),
+        'tokens_remaining': _parse_int(first('x-ratelimit-remaining-tokens', 'anthropic-ratelimit-tokens-remaining')),
+        'tokens_reset': _parse_seconds(first('x-ratelimit-reset-tokens', 'anthropic-ratelimit-tokens-reset')),
+        'retry_after': retry_after_ms / 1000 if retry_after_ms is not None else _parse_seconds(headers.get('retry-after')),
+    }
+
+
+class TokenBucket:
+    """Seau à jetons : ``rate`` requêtes par seconde avec une rafale de ``capacity``. Un débit nul désactive la limite."""
+
+    def __init__(self, rate: float = 0.0, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self, now: float) -> bool:
+        """Consomme un jeton s'il y en a un de disponible."""
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Temps avant qu'un jeton soit disponible."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return max((1 - self.tokens) / self.rate, 0.0)
+
+    def set_rate(self, rate: float, now: float):
+        """Change le débit en conservant les jetons accumulés."""
+        self._refill(now)
+        self.rate = rate
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class _Lease:
+    """Place obtenue auprès d'un limiteur, rendue à la fin de la requête."""
+
+    def __init__(self, limiter: 'AdaptiveLimiter'):
+        self.limiter = limiter
+        self.released = False
+
+    def observe(self, headers):
+        """Signale une réponse réussie et ses en-têtes de quota."""
+        self.limiter.on_success(parse_rate_limit_headers(headers))
+
+    def throttled(self, headers):
+        """Signale une réponse 429 et ses en-têtes."""
+        self.limiter.on_throttle(parse_rate_limit_headers(headers))
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.limiter.release()
+
+
+class AdaptiveLimiter:
+    """Limiteur d'un couple (fournisseur, modèle) : concurrence et débit adaptatifs.
+
+    - Concurrence : sémaphore dont la limite suit un AIMD (+1/limite par succès,
+      divisée par deux sur un 429).
+    - Débit : seau à jetons, réduit de moitié sur un 429 et recalé sur les
+      en-têtes quand le quota restant devient faible.
+    - Équité : les requêtes sont admises dans leur ordre d'arrivée (FIFO).
+    """
+
+    def __init__(self, name: str, initial_concurrency: int = 8, max_concurrency: int = 32,
+                 rate: float = 0.0, queue_timeout: float = 60.0, low_watermark: float = 0.1):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(min(initial_concurrency, max_concurrency))
+        self.configured_rate = rate
+        self.bucket = TokenBucket(rate, capacity=max(1.0, self.concurrency))
+        self.queue_timeout = queue_timeout
+        self.low_watermark = low_watermark
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.quota: Dict[str, Optional[float]] = {}
+        self._waiters: Deque[object] = deque()
+        self._admitted: Deque[float] = deque()
+        self._condition = threading.Condition()
+        self._counters = {'admitted': 0, 'throttled': 0, 'timeouts': 0}
+
+    def acquire(self, timeout: Optional[float] = None) -> _Lease:
+        """Attend son tour (FIFO) puis une place de concurrence et un jeton de débit."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        ticket = object()
+
+        with self._condition:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] is ticket and self.in_flight < int(self.concurrency):
+                        if now < self.paused_until:
+                            wait = self.paused_until - now
+                        elif self.bucket.try_take(now):
+                            break
+                        else:
+                            wait = self.bucket.wait_time(now)
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise RateLimitTimeout(
+                            f"Limite de débit {self.name}: attente supérieure à {timeout:.0f}s")
+                    self._condition.wait(min(wait, remaining) if wait is not None else remaining)
+
+                self.in_flight += 1
+                self._counters['admitted'] += 1
+                self._admitted.append(now)
+            finally:
+                self._waiters.remove(ticket)
+                self._condition.notify_all()
+
+        return _Lease(self)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, quota: Dict[str, Optional[float]]):
+        """Augmentation additive de la concurrence et recalage du débit sur les quotas restants."""
+        with self._condition:
+            now = time.monotonic()
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.bucket.capacity = max(1.0, self.concurrency)
+            if quota:
+                self.quota = quota
+            self._pace(quota, now)
+            self._condition.notify_all()
+
+    def on_throttle(self, quota: Dict[str, Optional[float]]):
+        """Diminution multiplicative de la concurrence et du débit, pause jusqu'à ``retry-after``."""
+        with self._condition:
+            now = time.monotonic()
+            self._counters['throttled'] += 1
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.bucket.capacity = max(1.0, self.concurrency)
+
+            current_rate = self.bucket.rate or self._observed_rate(now)
+            self.bucket.set_rate(max(current_rate / 2, 0.1), now)
+
+            retry_after = quota.get('retry_after') if quota else None
+            self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1.0))
+            if quota:
+                self.quota = quota
+            self._condition.notify_all()
+
+    def _pace(self, quota: Dict[str, Optional[float]], now: float):
+        """Répartit le quota restant jusqu'à sa réinitialisation quand il devient faible."""
+        low = False
+        for kind in ('requests', 'tokens'):
+            limit = quota.get(f'{kind}_limit')
+            remaining = quota.get(f'{kind}_remaining')
+            reset = quota.get(f'{kind}_reset')
+            if not limit or remaining is None or reset is None:
+                continue
+            if remaining <= 0:
+                self.paused_until = max(self.paused_until, now + reset)
+                low = True
+            elif kind == 'requests' and remaining < limit * self.low_watermark and reset > 0:
+                self.bucket.set_rate(remaining / reset, now)
+                low = True
+
+        # Quota confortable : le débit remonte progressivement (augmentation additive)
+        if not low and self.bucket.rate > 0:
+            rate = self.bucket.rate + max(self.bucket.rate * 0.05, 0.05)
+            if self.configured_rate:
+                rate = min(rate, self.configured_rate)
+            elif rate > self._observed_rate(now) * 2:
+                # La limite apprise ne freine plus le trafic : elle est levée
+                rate = 0.0
+            self.bucket.set_rate(rate, now)
+
+    def _observed_rate(self, now: float) -> float:
+        """Débit admis sur la dernière minute, en requêtes par seconde."""
+        while self._admitted and self._admitted[0] < now - 60:
+            self._admitted.popleft()
+        if not self._admitted:
+            return 0.1
+        return max(len(self._admitted) / max(now - self._admitted[0], 1.0), 0.1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne l'état courant du limiteur."""
+        with self._condition:
+            now = time.monotonic()
+            stats: Dict[str, Any] = dict(self._counters)
+            stats.update({
+                'concurrency_limit': round(self.concurrency, 2),
+                'in_flight': self.in_flight,
+                'queued': len(self._waiters),
+                'rate_per_second': round(self.bucket.rate, 3) if self.bucket.rate else None,
+                'paused_for': round(max(self.paused_until - now, 0.0), 3),
+                'requests_remaining': self.quota.get('requests_remaining'),
+                'tokens_remaining': self.quota.get('tokens_remaining'),
+            })
+        return stats
+
+
+class RateLimitGovernor:
+    """Gouverneur des appels sortants : un limiteur adaptatif par (fournisseur, modèle).
+
+    Une réponse 429 réduit la concurrence et le débit du limiteur et le met en
+    pause jusqu'à ``retry-after`` ; la nouvelle tentative (couche de résilience)
+    repasse par la file et attend donc son tour au lieu d'échouer.
+    """
+
+    def __init__(self, initial_concurrency: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        """
+        Initialise le gouverneur.
+
+        Args:
+            initial_concurrency (int): Requêtes simultanées au démarrage (défaut: RATE_LIMIT_INITIAL_CONCURRENCY ou 8)
+            max_concurrency (int): Plafond de requêtes simultanées (défaut: RATE_LIMIT_MAX_CONCURRENCY ou 32)
+            queue_timeout (float): Attente maximale dans la file, en secondes (défaut: RATE_LIMIT_QUEUE_TIMEOUT ou 60)
+        """
+        self.initial_concurrency = initial_concurrency or int(os.getenv('RATE_LIMIT_INITIAL_CONCURRENCY', 8))
+        self.max_concurrency = max_concurrency or int(os.getenv('RATE_LIMIT_MAX_CONCURRENCY', 32))
+        self.queue_timeout = queue_timeout or float(os.getenv('RATE_LIMIT_QUEUE_TIMEOUT', 60))
+        self._limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider: str, model: str) -> AdaptiveLimiter:
+        """Retourne (en le créant si besoin) le limiteur d'un couple fournisseur/modèle."""
+        key = (provider, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                # Débit initial optionnel par fournisseur, ex. OPENAI_RPM=500 (0 : appris des en-têtes)
+                rpm = float(os.getenv(f'{provider.upper()}_RPM', 0))
+                limiter = AdaptiveLimiter(f"{provider}/{model}", self.initial_concurrency,
+                                          self.max_concurrency, rate=rpm / 60,
+                                          queue_timeout=self.queue_timeout)
+                self._limiters[key] = limiter
+            return limiter
+
+    @contextmanager
+    def session(self, provider: str, model: str, send: Callable[[], Any]) -> Iterator[Any]:
+        """
+        Envoie une requête sous le contrôle du limiteur et garde la place pendant le bloc.
+
+        Pour un flux, la place de concurrence n'est rendue qu'à la fin de la lecture.
+
+        Args:
+            provider (str): Fournisseur IA
+            model (str): Modèle appelé
+            send (Callable): Fonction envoyant la requête et retournant la réponse brute du SDK (``with_raw_response``)
+
+        Yields:
+            La réponse décodée (``raw.parse()``)
+        """
+        lease = self.limiter(provider, model).acquire()
+        try:
+            try:
+                raw = send()
+            except Exception as e:
+                if getattr(e, 'status_code', None) == 429:
+                    lease.throttled(getattr(getattr(e, 'response', None), 'headers', None))
+                raise
+            lease.observe(raw.headers)
+            yield raw.parse()
+        finally:
+            lease.release()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne l'état de chaque limiteur, indexé par ``fournisseur/modèle``."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
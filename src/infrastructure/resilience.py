@@ -0,0 +1,310 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, ContextManager, Deque, Dict, Iterator, Optional
+
+from src.infrastructure.rate_limiter import RateLimitTimeout, parse_rate_limit_headers
+
+# Catégories d'erreurs réessayables : le fournisseur peut répondre au prochain essai
+TRANSIENT_ERRORS = ('rate_limit', 'server', 'timeout', 'connection')
+
+
+class CircuitOpenError(Exception):
+    """Levée quand le disjoncteur d'un fournisseur est ouvert : l'appel n'est pas tenté."""
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classe une exception des SDK IA.
+
+    Returns:
+        str: rate_limit, server, timeout, connection (réessayables), client ou unknown (définitives)
+    """
+    if isinstance(error, (RateLimitTimeout, CircuitOpenError)):
+        return 'client'
+
+    status = getattr(error, 'status_code', None)
+    if status == 429:
+        return 'rate_limit'
+    if status in (408, 409) or (status is not None and status >= 500):
+        return 'server'
+    if status is not None:
+        return 'client'
+
+    name = type(error).__name__
+    if 'Timeout' in name or isinstance(error, TimeoutError):
+        return 'timeout'
+    if 'Connection' in name or isinstance(error, ConnectionError):
+        return 'connection'
+    return 'unknown'
+
+
+class LatencyTracker:
+    """Fenêtre glissante des dernières latences réussies, pour les centiles."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int = 1) -> Optional[float]:
+        """Retourne le centile demandé, ou None s'il n'y a pas assez d'échantillons."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(int(len(samples) * percent / 100), len(samples) - 1)
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Disjoncteur : fermé, ouvert après ``failure_threshold`` échecs consécutifs, puis semi-ouvert.
+
+    En semi-ouvert, un seul appel d'essai est autorisé ; son succès referme le
+    disjoncteur, son échec le rouvre pour ``recovery_timeout`` secondes.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Indique si un appel peut être tenté (et réserve l'essai en semi-ouvert)."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def is_open(self) -> bool:
+        """Indique si le fournisseur est considéré hors service, sans réserver d'essai."""
+        with self._lock:
+            return (self.state == self.OPEN
+                    and time.monotonic() - self.opened_at < self.recovery_timeout)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self):
+        """Libère l'essai semi-ouvert quand l'appel s'est terminé sans verdict (erreur définitive)."""
+        with self._lock:
+            self._probing = False
+
+
+class ResilienceLayer:
+    """Couche de résilience des appels aux fournisseurs IA.
+
+    - Nouvelles tentatives pour les erreurs passagères (429, 5xx, délais,
+      connexion) avec un délai exponentiel plafonné et aléatoire (« full jitter »),
+      au moins égal au ``retry-after`` du fournisseur.
+    - Requêtes couvertes (optionnel) : si la réponse tarde au-delà du p95 observé,
+      une seconde requête est envoyée et la première réponse l'emporte. La
+      requête perdante n'est pas annulée : elle va à son terme en arrière-plan
+      et ses tokens sont facturés (jusqu'au double par appel couvert).
+    - Un disjoncteur par fournisseur évite d'attendre un fournisseur en panne.
+      Seules les erreurs passagères (hors 429) comptent pour son ouverture : une
+      erreur client ou non classée (``unknown``) remonte sans l'ouvrir.
+    """
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, hedging: Optional[bool] = None,
+                 hedge_percentile: Optional[float] = None, failure_threshold: Optional[int] = None,
+                 recovery_timeout: Optional[float] = None):
+        """
+        Initialise la politique de résilience.
+
+        Args:
+            max_attempts (int): Nombre maximum d'essais par appel (défaut: RETRY_MAX_ATTEMPTS ou 3)
+            base_delay (float): Délai de base entre essais, en secondes (défaut: RETRY_BASE_DELAY ou 0.5)
+            max_delay (float): Délai maximum entre essais, en secondes (défaut: RETRY_MAX_DELAY ou 8)
+            hedging (bool): Activer les requêtes couvertes (défaut: HEDGING_ENABLED ou false)
+            hedge_percentile (float): Centile de latence déclenchant la requête couverte (défaut: HEDGING_PERCENTILE ou 95)
+            failure_threshold (int): Échecs consécutifs ouvrant le disjoncteur (défaut: CIRCUIT_FAILURE_THRESHOLD ou 5)
+            recovery_timeout (float): Durée d'ouverture du disjoncteur, en secondes (défaut: CIRCUIT_RECOVERY_TIMEOUT ou 30)
+        """
+        self.max_attempts = max_attempts or int(os.getenv('RETRY_MAX_ATTEMPTS', 3))
+        self.base_delay = base_delay or float(os.getenv('RETRY_BASE_DELAY', 0.5))
+        self.max_delay = max_delay or float(os.getenv('RETRY_MAX_DELAY', 8))
+        self.hedging = hedging if hedging is not None else os.getenv('HEDGING_ENABLED', 'false').lower() == 'true'
+        self.hedge_percentile = hedge_percentile or float(os.getenv('HEDGING_PERCENTILE', 95))
+        self.hedge_min_samples = int(os.getenv('HEDGING_MIN_SAMPLES', 20))
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+        self.recovery_timeout = recovery_timeout or float(os.getenv('CIRCUIT_RECOVERY_TIMEOUT', 30))
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('HEDGING_MAX_WORKERS', 16)),
+                                            thread_name_prefix='hedge') if self.hedging else None
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Retourne (en le créant si besoin) le disjoncteur d'un fournisseur."""
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                self._latencies[provider] = LatencyTracker()
+                self._counters[provider] = {'calls': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                                            'rejected': 0, 'failures': 0}
+            return self._breakers[provider]
+
+    def is_available(self, provider: str) -> bool:
+        """Indique si le fournisseur peut être appelé (disjoncteur non ouvert)."""
+        return not self.breaker(provider).is_open()
+
+    @contextmanager
+    def session(self, provider: str, attempt: Callable[[], ContextManager[Any]],
+                hedge: bool = True) -> Iterator[Any]:
+        """
+        Ouvre une requête avec nouvelles tentatives, couverture et disjoncteur.
+
+        Seule l'ouverture est réessayée : une fois la réponse (ou le flux) obtenue,
+        elle est transmise telle quelle au bloc appelant.
+
+        Args:
+            provider (str): Fournisseur IA
+            attempt (Callable): Fonction ouvrant un essai, retournant un gestionnaire de contexte
+            hedge (bool): Autoriser une requête couverte (à désactiver pour les flux)
+
+        Yields:
+            La réponse du SDK
+        """
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            self._count(provider, 'rejected')
+            raise CircuitOpenError(f"{provider} indisponible (disjoncteur ouvert)")
+        self._count(provider, 'calls')
+
+        hedged = hedge and self._executor is not None
+        stack = ExitStack()
+        for number in range(1, self.max_attempts + 1):
+            started = time.monotonic()
+            try:
+                if hedged:
+                    response = self._hedged(provider, attempt)
+                else:
+                    response = stack.enter_context(attempt())
+                break
+            except Exception as e:
+                kind = classify_error(e)
+                if kind not in TRANSIENT_ERRORS:
+                    # Erreur définitive (client ou unknown) : ni nouvel essai, ni échec compté
+                    breaker.release_probe()
+                    raise
+                if kind == 'rate_limit':
+                    # Un 429 prouve que le fournisseur répond : il n'ouvre pas le disjoncteur
+                    breaker.release_probe()
+                else:
+                    self._count(provider, 'failures')
+                    breaker.record_failure()
+                if number >= self.max_attempts or not breaker.allow():
+                    raise
+                self._count(provider, 'retries')
+                time.sleep(self._backoff(number, e))
+
+        self._latencies[provider].record(time.monotonic() - started)
+        breaker.record_success()
+        with stack:
+            yield response
+
+    def _hedged(self, provider: str, attempt: Callable[[], ContextManager[Any]]) -> Any:
+        """Envoie la requête, puis une seconde si la première dépasse le centile de latence.
+
+        La requête perdante n'est pas annulée (les SDK n'offrent pas d'annulation
+        depuis un autre thread) : elle se termine en arrière-plan et consomme des
+        tokens en plus de la gagnante.
+        """
+        def run():
+            with attempt() as response:
+                return response
+
+        delay = self._latencies[provider].percentile(self.hedge_percentile, self.hedge_min_samples)
+        primary = self._executor.submit(run)
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count(provider, 'hedges')
+        backup = self._executor.submit(run)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count(provider, 'hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Délai exponentiel plafonné avec jitter complet, au moins égal au retry-after."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        retry_after = parse_rate_limit_headers(headers).get('retry_after') if headers is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne, par fournisseur, l'état du disjoncteur, les compteurs et la latence p50/p95."""
+        with self._lock:
+            providers = list(self._breakers)
+        stats = {}
+        for provider in providers:
+            breaker = self._breakers[provider]
+            latencies = self._latencies[provider]
+            with self._lock:
+                provider_stats: Dict[str, Any] = dict(self._counters[provider])
+            provider_stats.update({
+                'circuit': 'open' if breaker.is_open() else breaker.state,
+                'circuit_trips': breaker.trips,
+                'latency_p50': latencies.percentile(50),
+                'latency_p95': latencies.percentile(95),
+            })
+            stats[provider] = provider_stats
+        return stats
+
+    def _count(self, provider: str, key: str):
+        with self._lock:
+            self._counters[provider][key] += 1
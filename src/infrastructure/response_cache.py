@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from src.infrastructure.metrics import CACHE_REQUESTS
+
+class LRUCache:
+    """Cache en mémoire LRU avec durée de vie et limite de taille (entrées et octets)."""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne la valeur associée à la clé si elle existe et n'a pas expiré."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Ajoute une valeur, en évinçant les entrées les moins récemment utilisées si nécessaire."""
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[2]
+            self._entries[key] = (value, expires_at, size)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne le nombre d'entrées, la taille occupée et les évictions."""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size,
+                    'evictions': self.evictions}
+
+
+class SQLiteCacheTier:
+    """Niveau de cache persistant sur SQLite, partagé entre processus et redémarrages.
+
+    Une lecture n'écrit pas : la date de dernier accès (utilisée par l'éviction)
+    est notée en mémoire et reportée en base par lots : avec l'écriture suivante,
+    dès que ``touch_batch`` entrées lues sont en attente ou au plus tard après
+    ``touch_interval`` secondes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: float = 86400,
+                 touch_batch: int = 100, touch_interval: float = 30.0):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_response_cache_accessed
+            ON response_cache (accessed_at)
+        ''')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne la valeur persistée si elle n'a pas expiré."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+            ).fetchone()
+            # Entrée expirée : laissée à la purge périodique de ``set``
+            if row is None or row[1] <= now:
+                return None
+            self._touched[key] = now
+            if (len(self._touched) >= self.touch_batch
+                    or time.monotonic() - self._last_touch_flush >= self.touch_interval):
+                self._flush_touched()
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Persiste une valeur ; les entrées les plus anciennes sont purgées périodiquement."""
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?)
+            ''', (key, value, expires_at, now))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Reporte en base les dates d'accès notées depuis le dernier report (verrou tenu, sans commit)."""
+        self._last_touch_flush = time.monotonic()
+        if not self._touched:
+            return
+        self._conn.executemany('UPDATE response_cache SET accessed_at = ? WHERE key = ?',
+                               [(accessed_at, key) for key, accessed_at in self._touched.items()])
+        self._touched.clear()
+
+    def _evict(self, now: float):
+        """Supprime les entrées expirées puis les moins récemment lues au-delà de la limite."""
+        self._conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+        self._conn.execute('''
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache
+                ORDER BY accessed_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def clear(self):
+        """Vide le cache persistant."""
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne le nombre d'entrées persistées."""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+        return {'entries': count}
+
+
+class ResponseCache:
+    """Cache des réponses IA à correspondance exacte.
+
+    La clé couvre tout ce qui détermine la réponse : fournisseur, modèle,
+    prompt système, paramètres de génération et prompt. Un niveau mémoire LRU
+    répond en quelques microsecondes ; un niveau SQLite optionnel conserve les
+    réponses entre redémarrages et entre workers.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, persistent_path: Optional[str] = None):
+        """
+        Initialise les niveaux de cache.
+
+        Args:
+            max_entries (int): Entrées maximum en mémoire (défaut: RESPONSE_CACHE_MAX_ENTRIES ou 1000)
+            max_bytes (int): Taille maximum en mémoire (défaut: RESPONSE_CACHE_MAX_MB ou 64 Mo)
+            ttl (float): Durée de vie d'une réponse en secondes (défaut: RESPONSE_CACHE_TTL ou 3600)
+            persistent_path (str): Fichier SQLite du niveau persistant (défaut: RESPONSE_CACHE_PATH, désactivé si vide)
+        """
+        self.ttl = ttl or float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+        self.memory = LRUCache(
+            max_entries=max_entries or int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+            max_bytes=max_bytes or int(float(os.getenv('RESPONSE_CACHE_MAX_MB', 64)) * 1024 * 1024),
+            ttl=self.ttl
+        )
+
+        persistent_path = persistent_path or os.getenv('RESPONSE_CACHE_PATH')
+        self.persistent = SQLiteCacheTier(persistent_path, ttl=self.ttl) if persistent_path else None
+
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'memory_hits': 0, 'persistent_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str,
+                 params: Dict[str, Any], prompt: str) -> str:
+        """Construit la clé de cache d'une requête."""
+        payload = json.dumps([provider, model, system_prompt, params, prompt],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cherche une réponse en mémoire puis dans le niveau persistant."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('hits', 'memory_hits')
+            CACHE_REQUESTS.inc(cache='response', result='hit')
+            return value
+
+        if self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count('hits', 'persistent_hits')
+                CACHE_REQUESTS.inc(cache='response', result='hit')
+                return value
+
+        self._count('misses')
+        CACHE_REQUESTS.inc(cache='response', result='miss')
+        return None
+
+    def set(self, key: str, value: str):
+        """Enregistre une réponse dans tous les niveaux."""
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value)
+            except sqlite3.Error as e:
+                print(f"Erreur lors de l'écriture dans le cache persistant: {e}")
+
+    def clear(self):
+        """Vide tous les niveaux du cache."""
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs de succès/échecs et l'occupation des niveaux."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups > 0 else 0
+        stats['memory'] = self.memory.stats()
+        if self.persistent is not None:
+            stats['persistent'] = self.persistent.stats()
+        return stats
+
+    def _count(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._counters[key] += 1
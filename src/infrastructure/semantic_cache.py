@@ -0,0 +1,261 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from itertools import chain
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from src.infrastructure.metrics import CACHE_REQUESTS
+
+class HashedNgramEmbedder:
+    """Vectorise un texte par hachage de n-grammes de caractères et de mots.
+
+    Aucun modèle à télécharger : deux paraphrases proches partagent la plupart
+    de leurs n-grammes et obtiennent une similarité cosinus élevée.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_sizes: Tuple[int, ...] = (3, 4, 5)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Met en minuscules, retire les accents et la ponctuation."""
+        text = unicodedata.normalize('NFKD', text.lower())
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+        return ' '.join(re.findall(r'\w+', text))
+
+    def features(self, text: str) -> List[str]:
+        """Retourne les mots et n-grammes de caractères d'un texte normalisé."""
+        normalized = self.normalize(text)
+        features = [f"w:{word}" for word in normalized.split()]
+        padded = f" {normalized} "
+        for size in self.ngram_sizes:
+            features.extend(f"c:{padded[i:i + size]}" for i in range(len(padded) - size + 1))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Retourne le vecteur normalisé (norme L2 = 1) d'un texte."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            # Le bit de poids fort donne le signe : les collisions se compensent en moyenne
+            vector[value % self.dim] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class VectorIndex:
+    """Index vectoriel en mémoire à capacité fixe (les plus anciens vecteurs sont remplacés).
+
+    Recherche exacte : un produit matrice-vecteur sur la partie remplie de la
+    matrice (une vue, sans copie), les emplacements d'un autre espace de noms ou
+    expirés étant masqués. Avec ``nlist`` > 0, un index IVF (k-means grossier)
+    limite la recherche aux listes des ``nprobe`` partitions les plus proches une
+    fois ``train_size`` vecteurs indexés.
+    """
+
+    def __init__(self, dim: int, capacity: int = 10000, nlist: int = 0,
+                 nprobe: int = 4, train_size: int = 2000):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.namespaces = np.full(capacity, -1, dtype=np.int32)
+        # Échéance de chaque emplacement (horloge monotone), infinie sans durée de vie
+        self.expires = np.full(capacity, np.inf)
+        self.size = 0
+        self._next = 0
+
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = max(train_size, nlist)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.full(capacity, -1, dtype=np.int32)
+        # Listes inversées IVF : emplacements de chaque partition
+        self.lists: List[set] = []
+
+    def add(self, vector: np.ndarray, namespace: int, expires_at: float = np.inf) -> int:
+        """Ajoute un vecteur et retourne son emplacement (réutilisé quand l'index est plein)."""
+        slot = self._next
+        self.vectors[slot] = vector
+        self.namespaces[slot] = namespace
+        self.expires[slot] = expires_at
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+        if self.centroids is not None:
+            previous = self.assignments[slot]
+            if previous >= 0:
+                self.lists[previous].discard(slot)
+            cluster = int(np.argmax(self.centroids @ vector))
+            self.assignments[slot] = cluster
+            self.lists[cluster].add(slot)
+        elif self.nlist and self.size >= self.train_size:
+            self._train()
+        return slot
+
+    def search(self, vector: np.ndarray, k: int = 1, namespace: Optional[int] = None,
+               now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Retourne les ``k`` emplacements les plus similaires (similarité cosinus décroissante).
+
+        Les emplacements expirés à ``now`` (horloge monotone, défaut: maintenant) sont ignorés.
+        """
+        if self.size == 0:
+            return []
+        now = time.monotonic() if now is None else now
+
+        if self.centroids is not None:
+            probes = np.argsort(self.centroids @ vector)[-self.nprobe:]
+            candidates = np.fromiter(chain.from_iterable(self.lists[c] for c in probes), dtype=np.int64)
+            # Seuls les vecteurs des partitions sondées sont lus
+            scores = self.vectors[candidates] @ vector
+        else:
+            candidates = None
+            scores = self.vectors[:self.size] @ vector
+        slots = candidates if candidates is not None else np.arange(self.size)
+
+        valid = self.expires[slots] > now
+        if namespace is not None:
+            valid &= self.namespaces[slots] == namespace
+        scores = np.where(valid, scores, -np.inf)
+
+        k = min(k, scores.size)
+        if k == 0:
+            return []
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(slots[i]), float(scores[i])) for i in top if valid[i]]
+
+    def live(self, now: Optional[float] = None) -> int:
+        """Nombre d'emplacements occupés et non expirés."""
+        now = time.monotonic() if now is None else now
+        return int(np.count_nonzero(self.expires[:self.size] > now))
+
+    def _train(self, iterations: int = 10):
+        """Entraîne les centroïdes IVF par k-means sphérique sur les vecteurs présents."""
+        data = self.vectors[:self.size]
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(self.size, self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = data[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm > 0 else centroid
+        self.centroids = centroids
+        self.assignments[:self.size] = np.argmax(data @ centroids.T, axis=1)
+        self.lists = [set() for _ in range(self.nlist)]
+        for slot, cluster in enumerate(self.assignments[:self.size]):
+            self.lists[cluster].add(slot)
+
+
+class SemanticCache:
+    """Cache sémantique : réutilise la réponse d'un prompt quasi identique.
+
+    Les réponses sont cloisonnées par (fournisseur, modèle). Une réponse est
+    réutilisée si la similarité cosinus avec un prompt déjà vu dépasse le seuil
+    et qu'elle n'a pas dépassé sa durée de vie. Index plein, les plus anciennes
+    réponses sont évincées.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, capacity: Optional[int] = None,
+                 dim: Optional[int] = None, nlist: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialise l'encodeur et l'index vectoriel.
+
+        Args:
+            threshold (float): Similarité minimum pour réutiliser une réponse (défaut: SEMANTIC_CACHE_THRESHOLD ou 0.92)
+            capacity (int): Nombre maximum de prompts indexés (défaut: SEMANTIC_CACHE_CAPACITY ou 10000)
+            dim (int): Dimension des vecteurs (défaut: SEMANTIC_CACHE_DIM ou 1024)
+            nlist (int): Partitions IVF, 0 pour une recherche exacte (défaut: SEMANTIC_CACHE_IVF_LISTS ou 0)
+            ttl (float): Durée de vie d'une réponse en secondes (défaut: SEMANTIC_CACHE_TTL ou 3600)
+        """
+        self.threshold = threshold or float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+        capacity = capacity or int(os.getenv('SEMANTIC_CACHE_CAPACITY', 10000))
+        dim = dim or int(os.getenv('SEMANTIC_CACHE_DIM', 1024))
+        nlist = nlist if nlist is not None else int(os.getenv('SEMANTIC_CACHE_IVF_LISTS', 0))
+        self.ttl = ttl or float(os.getenv('SEMANTIC_CACHE_TTL', 3600))
+
+        self.embedder = HashedNgramEmbedder(dim=dim)
+        self.index = VectorIndex(dim, capacity=capacity, nlist=nlist)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._namespaces: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._hit_scores: List[float] = []
+
+    def lookup(self, provider: str, model: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Cherche une réponse pour un prompt similaire.
+
+        Args:
+            provider (str): Fournisseur IA
+            model (str): Modèle utilisé
+            prompt (str): Prompt de l'utilisateur
+
+        Returns:
+            Optional[Dict[str, Any]]: ``{'response', 'score', 'matched_prompt'}`` ou None sous le seuil
+        """
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            namespace = self._namespaces.get((provider, model))
+            matches = self.index.search(vector, k=1, namespace=namespace) if namespace is not None else []
+            if matches and matches[0][1] >= self.threshold:
+                slot, score = matches[0]
+                entry = self.entries[slot]
+                self._counters['hits'] += 1
+                self._hit_scores = (self._hit_scores + [score])[-1000:]
+                CACHE_REQUESTS.inc(cache='semantic', result='hit')
+                return {'response': entry['response'], 'score': score,
+                        'matched_prompt': entry['prompt']}
+            self._counters['misses'] += 1
+            CACHE_REQUESTS.inc(cache='semantic', result='miss')
+            return None
+
+    def store(self, provider: str, model: str, prompt: str, response: Dict[str, Any]):
+        """Indexe un prompt et la réponse obtenue du fournisseur."""
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            namespace = self._namespaces.setdefault((provider, model), len(self._namespaces))
+            now = time.monotonic()
+            slot = self.index.add(vector, namespace, expires_at=now + self.ttl)
+            previous = self.entries[slot]
+            if previous is not None and previous['expires_at'] > now:
+                # Index plein : la plus ancienne réponse encore valide est remplacée
+                self._counters['evictions'] += 1
+            self.entries[slot] = {'prompt': prompt, 'provider': provider, 'model': model,
+                                  'response': response, 'expires_at': now + self.ttl}
+
+    def probe(self, prompt: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Retourne les prompts indexés les plus proches avec leur score, pour régler le seuil."""
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            matches = self.index.search(vector, k=k)
+            return [{'prompt': self.entries[slot]['prompt'],
+                     'provider': self.entries[slot]['provider'],
+                     'model': self.entries[slot]['model'],
+                     'score': score,
+                     'above_threshold': score >= self.threshold}
+                    for slot, score in matches]
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs et la distribution des scores des derniers succès."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            scores = list(self._hit_scores)
+            stats['entries'] = self.index.live()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups > 0 else 0
+        stats['threshold'] = self.threshold
+        stats['ttl'] = self.ttl
+        if scores:
+            stats['hit_score_min'] = min(scores)
+            stats['hit_score_avg'] = sum(scores) / len(scores)
+        return stats
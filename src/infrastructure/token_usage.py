@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from src.infrastructure.metrics import PROVIDER_COST, PROVIDER_TOKEN_RATE, PROVIDER_TOKENS
+
+# Charger les variables d'environnement (MODEL_PRICES_JSON est lu à l'import)
+load_dotenv()
+
+# Tarifs (dollars par million de tokens) : (entrée, sortie)
+MODEL_PRICES = {
+    'gpt-4o': (2.50, 10.00),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'llama3-70b-8192': (0.59, 0.79),
+    'llama3-8b-8192': (0.05, 0.08),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'claude-3-5-haiku-20241022': (0.80, 4.00),
+    'claude-3-opus-20240229': (15.00, 75.00),
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'llama-3.3-70b-versatile': (0.59, 0.79),
+    'llama-3.1-8b-instant': (0.05, 0.08),
+    'mixtral-8x7b-32768': (0.24, 0.24),
+    'gemma2-9b-it': (0.20, 0.20),
+}
+# Tarifs ajoutés ou corrigés sans redéploiement : {"modèle": [entrée, sortie]}
+MODEL_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv('MODEL_PRICES_JSON') or '{}').items()})
+
+# Modèles sans tarif déjà signalés (un avertissement par modèle)
+_UNPRICED_WARNED = set()
+
+# Tokenizer local optionnel (tiktoken) ; à défaut, estimation à ~4 caractères par token
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('o200k_base')
+except Exception:
+    _ENCODING = None
+
+
+class BudgetExceededError(Exception):
+    """Levée quand le budget quotidien d'un fournisseur est épuisé : l'appel n'est pas tenté."""
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estime le nombre de tokens d'un texte, sans appel réseau."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, round(len(text) / 4))
+
+
+def model_price(model: str) -> Optional[tuple]:
+    """Retourne le tarif (entrée, sortie) d'un modèle, en dollars par million de tokens (None si inconnu)."""
+    price = MODEL_PRICES.get(model)
+    if price is None and model not in _UNPRICED_WARNED:
+        _UNPRICED_WARNED.add(model)
+        print(f"Tarif inconnu pour le modèle {model} : coût non comptabilisé (voir MODEL_PRICES_JSON)")
+    return price
+
+
+def is_priced(model: str) -> bool:
+    """Indique si le tarif d'un modèle est connu."""
+    return model in MODEL_PRICES
+
+
+def blended_price(model: str) -> Optional[float]:
+    """Tarif moyen entrée/sortie d'un modèle, en dollars par million de tokens (None si inconnu)."""
+    price = model_price(model)
+    if price is None:
+        return None
+    return (price[0] + price[1]) / 2
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Coût d'une requête en dollars (None si le tarif du modèle est inconnu)."""
+    price = model_price(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def usage_from_response(usage: Any) -> Optional[Dict[str, int]]:
+    """
+    Normalise l'``usage`` des SDK, objet ou dictionnaire (OpenAI/Groq : prompt/completion, Anthropic : input/output).
+
+    Returns:
+        Optional[Dict[str, int]]: ``{'prompt_tokens': ..., 'completion_tokens': ...}`` ou None si absent
+    """
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    prompt = get('prompt_tokens')
+    if prompt is None:
+        prompt = get('input_tokens')
+    completion = get('completion_tokens')
+    if completion is None:
+        completion = get('output_tokens')
+    if prompt is None and completion is None:
+        return None
+    return {'prompt_tokens': prompt or 0, 'completion_tokens': completion or 0}
+
+
+class UsageTracker:
+    """Comptabilité des tokens et des dépenses, avec budgets quotidiens par fournisseur.
+
+    Chaque appel enregistré alimente les métriques (tokens, coût, tokens par
+    seconde) et la dépense du jour (UTC). Un fournisseur dont le budget est
+    épuisé est refusé jusqu'au lendemain. Un modèle sans tarif n'est pas compté
+    comme gratuit : sa dépense est inconnue, il est refusé dès qu'un budget
+    s'applique et signalé dans les statistiques. Les dépenses sont tenues par processus :
+    avec plusieurs workers, chacun applique le budget à sa propre part.
+    """
+
+    def __init__(self, daily_budget: Optional[float] = None):
+        """
+        Initialise le suivi.
+
+        Args:
+            daily_budget (float): Budget quotidien global en dollars (défaut: DAILY_BUDGET_USD, sans limite si absent).
+                Budgets par fournisseur : OPENAI_DAILY_BUDGET_USD, ANTHROPIC_DAILY_BUDGET_USD, GROQ_DAILY_BUDGET_USD
+        """
+        self.daily_budget = daily_budget if daily_budget is not None else self._env_budget('DAILY_BUDGET_USD')
+        self._budgets: Dict[str, Optional[float]] = {}
+        self._spent: Dict[str, float] = {}
+        self._unpriced: Dict[str, int] = {}
+        self._day = self._today()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _env_budget(name: str) -> Optional[float]:
+        value = os.getenv(name)
+        return float(value) if value else None
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def budget(self, provider: str) -> Optional[float]:
+        """Budget quotidien d'un fournisseur en dollars (None : sans limite)."""
+        if provider not in self._budgets:
+            self._budgets[provider] = self._env_budget(f'{provider.upper()}_DAILY_BUDGET_USD')
+        return self._budgets[provider]
+
+    def seed(self, spent: Dict[str, float]):
+        """Reprend les dépenses du jour déjà enregistrées (ex. en base au démarrage)."""
+        with self._lock:
+            self._roll_day()
+            for provider, amount in spent.items():
+                self._spent[provider] = self._spent.get(provider, 0.0) + (amount or 0.0)
+
+    def within_budget(self, provider: str, model: Optional[str] = None) -> bool:
+        """Indique si le fournisseur (et le modèle, s'il est précisé) peut encore être appelé aujourd'hui."""
+        budget = self.budget(provider)
+        if model is not None and not is_priced(model) and (budget is not None or self.daily_budget is not None):
+            # Coût impossible à imputer : un budget ne peut pas être garanti
+            return False
+        with self._lock:
+            self._roll_day()
+            spent = self._spent.get(provider, 0.0)
+            total = sum(self._spent.values())
+        if budget is not None and spent >= budget:
+            return False
+        return self.daily_budget is None or total < self.daily_budget
+
+    def check(self, provider: str, model: Optional[str] = None):
+        """Lève ``BudgetExceededError`` si le budget du fournisseur (ou le budget global) est épuisé,
+        ou si un budget s'applique à un modèle dont le tarif est inconnu."""
+        if not self.within_budget(provider, model):
+            if model is not None and not is_priced(model) and self.within_budget(provider):
+                raise BudgetExceededError(f"Tarif inconnu pour {model} : appel refusé sous budget")
+            raise BudgetExceededError(f"Budget quotidien épuisé pour {provider}")
+
+    def record(self, provider: str, model: str, prompt_tokens: int, completion_tokens: int,
+               estimated: bool = False, elapsed: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Enregistre la consommation d'un appel.
+
+        Args:
+            provider (str): Fournisseur IA
+            model (str): Modèle appelé
+            prompt_tokens (int): Tokens du prompt (système compris)
+            completion_tokens (int): Tokens générés
+            estimated (bool): Comptes estimés localement plutôt que fournis par l'API
+            elapsed (float): Durée de l'appel en secondes, pour le débit en tokens par seconde
+
+        Returns:
+            Dict[str, Any]: Consommation au format des réponses de l'API (``usage``), ``cost`` à None
+            et ``unpriced`` à True si le tarif du modèle est inconnu
+        """
+        cost = request_cost(model, prompt_tokens, completion_tokens)
+        PROVIDER_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind='prompt')
+        PROVIDER_TOKENS.inc(completion_tokens, provider=provider, model=model, kind='completion')
+        if cost is not None:
+            PROVIDER_COST.inc(cost, provider=provider, model=model)
+        if elapsed and completion_tokens:
+            PROVIDER_TOKEN_RATE.observe(completion_tokens / elapsed, provider=provider, model=model)
+
+        with self._lock:
+            self._roll_day()
+            if cost is None:
+                self._unpriced[model] = self._unpriced.get(model, 0) + 1
+            else:
+                self._spent[provider] = self._spent.get(provider, 0.0) + cost
+
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'cost': cost,
+            'estimated': estimated,
+        }
+        if cost is None:
+            usage['unpriced'] = True
+        return usage
+
+    def record_response(self, provider: str, model: str, usage: Any, prompt: str, text: Optional[str],
+                        started: Optional[float] = None) -> Dict[str, Any]:
+        """Enregistre un appel à partir de l'``usage`` du SDK, ou d'une estimation locale s'il manque."""
+        elapsed = time.perf_counter() - started if started is not None else None
+        counts = usage_from_response(usage)
+        if counts is not None:
+            return self.record(provider, model, counts['prompt_tokens'], counts['completion_tokens'],
+                               elapsed=elapsed)
+        return self.record(provider, model, estimate_tokens(prompt), estimate_tokens(text),
+                           estimated=True, elapsed=elapsed)
+
+    def _roll_day(self):
+        # Remise à zéro des dépenses au changement de jour (UTC)
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._spent.clear()
+            self._unpriced.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les dépenses du jour, les budgets par fournisseur et les appels de modèles sans tarif."""
+        with self._lock:
+            self._roll_day()
+            spent = dict(self._spent)
+            unpriced = dict(self._unpriced)
+        return {
+            'day': self._day,
+            'daily_budget': self.daily_budget,
+            'spent': round(sum(spent.values()), 6),
+            'providers': {
+                provider: {'spent': round(amount, 6), 'budget': self.budget(provider),
+                           'within_budget': self.within_budget(provider)}
+                for provider, amount in spent.items()
+            },
+            'unpriced_models': unpriced,
+        }
+
+
+def cached_usage() -> Dict[str, Any]:
+    """Consommation d'une réponse servie par le cache : aucun token facturé."""
+    return {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cost': 0.0,
+            'estimated': False, 'cached': True}
@@ -0,0 +1,341 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# Verrou de fichier entre processus (absent sous Windows : un seul processus écrit le débordement)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class WriteBehindQueue:
+    """File d'écriture différée pour la persistance des conversations.
+
+    Les requêtes déposent leurs enregistrements (une conversation et ses
+    réponses) dans une file bornée en mémoire ; un thread d'arrière-plan les
+    écrit par lots dans une seule transaction, dès que le lot est plein ou que
+    l'intervalle de vidage est écoulé. Quand la file est pleine, la politique
+    choisie s'applique :
+
+    - ``block`` : attendre une place, puis écrire directement si l'attente dépasse ``put_timeout``
+    - ``spill`` : déverser l'enregistrement dans un fichier JSONL rejoué plus tard
+    - ``drop``  : abandonner l'enregistrement (compté dans les statistiques)
+
+    Le fichier de débordement est partagé par les workers Gunicorn : ajouts et
+    rejeu sont protégés par des verrous ``flock`` (``<spill>.lock`` et
+    ``<spill>.replay.lock``), un seul processus rejoue à la fois.
+    """
+
+    POLICIES = ('block', 'spill', 'drop')
+
+    def __init__(self, db_manager, max_size: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 policy: Optional[str] = None, put_timeout: Optional[float] = None,
+                 spill_path: Optional[str] = None):
+        """
+        Initialise la file et démarre le thread d'écriture.
+
+        Args:
+            db_manager (DatabaseManager): Gestionnaire de base de données cible
+            max_size (int): Capacité de la file (défaut: DB_WRITE_QUEUE_SIZE ou 10000)
+            batch_size (int): Nombre d'enregistrements par transaction (défaut: DB_WRITE_BATCH_SIZE ou 100)
+            flush_interval (float): Délai maximum avant écriture d'un lot, en secondes (défaut: DB_WRITE_FLUSH_MS ou 200 ms)
+            policy (str): Politique de file pleine : block, spill ou drop (défaut: DB_WRITE_QUEUE_POLICY ou block)
+            put_timeout (float): Attente maximale d'une place en mode block, en secondes (défaut: 1)
+            spill_path (str): Fichier de débordement (défaut: à côté de la base de données)
+        """
+        self.db_manager = db_manager
+        self.batch_size = batch_size or int(os.getenv('DB_WRITE_BATCH_SIZE', 100))
+        self.flush_interval = flush_interval or int(os.getenv('DB_WRITE_FLUSH_MS', 200)) / 1000
+        self.policy = policy or os.getenv('DB_WRITE_QUEUE_POLICY', 'block')
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Politique de file inconnue: {self.policy}")
+        self.put_timeout = put_timeout if put_timeout is not None else 1.0
+        self.spill_path = spill_path or os.path.join(
+            os.path.dirname(db_manager.db_path), 'write_spill.jsonl')
+
+        self.queue: queue.Queue = queue.Queue(maxsize=max_size or int(os.getenv('DB_WRITE_QUEUE_SIZE', 10000)))
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'written': 0, 'batches': 0, 'direct_writes': 0,
+                       'spilled': 0, 'dropped': 0, 'errors': 0, 'quarantined': 0}
+        # Rejeu du débordement espacé tant que la base reste en échec (5 s, doublé jusqu'à 5 min)
+        self._replay_after = 0.0
+        self._replay_delay = 0.0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Dépose un enregistrement à écrire, sans attendre le disque.
+
+        Args:
+            record (Dict[str, Any]): Conversation au format de ``DatabaseManager.save_conversations_batch``
+
+        Returns:
+            bool: True si l'enregistrement sera persisté, False s'il a été abandonné
+        """
+        self._count('submitted')
+
+        if self._closed:
+            return self._write_direct([record])
+
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == 'block':
+            try:
+                self.queue.put(record, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                # Contre-pression : la requête paie l'écriture elle-même
+                return self._write_direct([record])
+
+        if self.policy == 'spill':
+            return self._spill([record])
+
+        self._count('dropped')
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend que tous les enregistrements déposés avant l'appel soient écrits.
+
+        Args:
+            timeout (float): Attente maximale en secondes (optionnel)
+
+        Returns:
+            bool: True si la file a été vidée dans le délai
+        """
+        if not self._thread.is_alive():
+            return self.queue.empty()
+
+        marker = threading.Event()
+        try:
+            self.queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Vide la file puis arrête le thread d'écriture (appelé automatiquement à l'arrêt)."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs de la file (enregistrements écrits, déversés, abandonnés...)."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['pending'] = self.queue.qsize()
+        return stats
+
+    def _run(self):
+        """Boucle du thread d'écriture : regroupe les enregistrements en lots."""
+        self._replay_spill()
+
+        while True:
+            item = self.queue.get()
+            batch: List[Dict[str, Any]] = []
+            markers: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    # Un vidage est demandé : écrire le lot sans attendre l'intervalle
+                    markers.append(item)
+                    break
+                else:
+                    batch.append(item)
+
+                if stop or len(batch) >= self.batch_size:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+            if self.queue.empty() and time.monotonic() >= self._replay_after:
+                self._replay_spill()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Écrit un lot ; en cas d'échec, le lot est déversé sur disque pour ne rien perdre."""
+        try:
+            self.db_manager.save_conversations_batch(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'écriture différée: {e}")
+            self._count('errors')
+            self._spill(batch)
+            return False
+
+    def _write_direct(self, records: List[Dict[str, Any]]) -> bool:
+        """Écrit immédiatement dans le thread appelant."""
+        try:
+            self.db_manager.save_conversations_batch(records)
+            self._count('written', len(records))
+            self._count('direct_writes')
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'écriture directe: {e}")
+            self._count('errors')
+            return self._spill(records)
+
+    def _spill(self, records: List[Dict[str, Any]]) -> bool:
+        """Ajoute des enregistrements au fichier de débordement."""
+        try:
+            with self._spill_lock, self._file_lock(self.spill_path + '.lock'):
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._count('spilled', len(records))
+            return True
+        except OSError as e:
+            print(f"Erreur lors du débordement sur disque: {e}")
+            self._count('dropped', len(records))
+            return False
+
+    def _replay_spill(self):
+        """Réinjecte en base les enregistrements déversés précédemment.
+
+        Ne lève jamais d'exception (le thread d'écriture doit survivre) : une ligne
+        illisible, typiquement la dernière après un arrêt brutal pendant un
+        débordement, ou un enregistrement rejeté par la base est mis de côté dans
+        ``<spill>.bad`` ; si la base est toujours en échec, le prochain rejeu est
+        repoussé. Si un autre processus rejoue déjà, ce passage est ignoré.
+        """
+        replay_path = self.spill_path + '.replay'
+        try:
+            with self._file_lock(replay_path + '.lock', blocking=False) as locked:
+                if not locked:
+                    return
+                succeeded = self._replay_file(replay_path)
+        except OSError as e:
+            print(f"Erreur lors du rejeu du débordement: {e}")
+            succeeded = False
+
+        if succeeded:
+            self._replay_delay = 0.0
+            self._replay_after = 0.0
+        else:
+            self._replay_delay = min(300.0, self._replay_delay * 2 or 5.0)
+            self._replay_after = time.monotonic() + self._replay_delay
+
+    def _replay_file(self, replay_path: str) -> bool:
+        """Rejoue ``<spill>.replay`` par lots (sous le verrou de rejeu) ; False si la base est en échec."""
+        with self._spill_lock, self._file_lock(self.spill_path + '.lock'):
+            # Un rejeu interrompu (arrêt brutal) est repris avant le fichier courant
+            if os.path.exists(self.spill_path) and not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+        if not os.path.exists(replay_path):
+            return True
+
+        succeeded = True
+        batch: List[Dict[str, Any]] = []
+        with open(replay_path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    self._quarantine(line)
+                    continue
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    succeeded = self._replay_batch(batch) and succeeded
+                    batch = []
+        if batch:
+            succeeded = self._replay_batch(batch) and succeeded
+        # Les enregistrements en échec ont été redéversés dans le fichier courant
+        os.remove(replay_path)
+        return succeeded
+
+    def _replay_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Écrit un lot rejoué ; en cas d'échec, reprend enregistrement par enregistrement.
+
+        Un enregistrement rejeté par la base (champ manquant, valeur invalide) est
+        mis de côté sans bloquer les autres ; si la base elle-même est indisponible,
+        le reste du lot est redéversé pour le rejeu suivant.
+        """
+        try:
+            self.db_manager.save_conversations_batch(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+            return True
+        except Exception as e:
+            print(f"Erreur lors du rejeu d'un lot, reprise enregistrement par enregistrement: {e}")
+
+        for index, record in enumerate(batch):
+            try:
+                self.db_manager.save_conversations_batch([record])
+                self._count('written')
+            except (sqlite3.OperationalError, OSError) as e:
+                print(f"Erreur lors du rejeu du débordement: {e}")
+                self._count('errors')
+                self._spill(batch[index:])
+                return False
+            except Exception as e:
+                print(f"Enregistrement de débordement rejeté: {e}")
+                self._quarantine(json.dumps(record, ensure_ascii=False))
+        return True
+
+    @contextmanager
+    def _file_lock(self, path: str, blocking: bool = True):
+        """Verrou exclusif entre processus sur ``path`` ; cède False si non bloquant et déjà pris."""
+        if fcntl is None:
+            yield True
+            return
+        with open(path, 'a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _quarantine(self, line: str):
+        """Met de côté une ligne de débordement illisible ou rejetée au lieu de bloquer le rejeu."""
+        self._count('quarantined')
+        try:
+            with open(self.spill_path + '.bad', 'a', encoding='utf-8') as f:
+                f.write(line if line.endswith('\n') else line + '\n')
+        except OSError as e:
+            print(f"Erreur lors de la mise de côté d'une ligne de débordement: {e}")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
@@ -10,6 +10,7 @@ const CONFIG = {
         CLAUDE: '/api/claude',
         GROQ: '/api/groq',
         COMPARE: '/api/compare',
+        COMPARE_STREAM: '/api/compare/stream',
         HISTORY: '/api/history',
         STATS: '/api/stats',
         SEARCH: '/api/history/search'
@@ -25,6 +26,8 @@ const CONFIG = {
 class AssistantApp {
     constructor() {
         this.response = '';
+        this.nextCursor = null;
+        this.loadingHistory = false;
         this.initializeMarkdown();
         this.bindEvents();
         this.loadStatistics();
@@ -78,6 +81,18 @@ class AssistantApp {
             });
         }
 
+        // Défilement infini : charger la page suivante en approchant du bas de la liste
+        const historyList = document.getElementById('historyList');
+        if (historyList) {
+            this.nextCursor = historyList.dataset.nextCursor || null;
+            historyList.addEventListener('scroll', () => {
+                const remaining = historyList.scrollHeight - historyList.scrollTop - historyList.clientHeight;
+                if (remaining < 100) {
+                    this.loadMoreHistory();
+                }
+            });
+        }
+
         // Bouton d'actualisation
         const refreshBtn = document.getElementById('refreshHistoryBtn');
         if (refreshBtn) {
@@ -166,6 +181,8 @@ class AssistantApp {
             const data = await response.json();
             
             if (data.success) {
+                // Les résultats de recherche ne sont pas paginés
+                this.nextCursor = null;
                 this.updateHistoryList(data.results);
             } else {
                 this.showError('Erreur lors de la recherche: ' + data.error);
@@ -185,6 +202,7 @@ class AssistantApp {
             const data = await response.json();
             
             if (data.success) {
+                this.nextCursor = data.next_cursor;
                 this.updateHistoryList(data.history);
                 this.loadStatistics();
             } else {
@@ -196,19 +214,53 @@ class AssistantApp {
         }
     }
 
+    /**
+     * Charge la page suivante de l'historique (pagination par curseur)
+     */
+    async loadMoreHistory() {
+        if (!this.nextCursor || this.loadingHistory) return;
+
+        this.loadingHistory = true;
+        try {
+            const response = await fetch(`${CONFIG.ENDPOINTS.HISTORY}?cursor=${encodeURIComponent(this.nextCursor)}`);
+            const data = await response.json();
+
+            if (data.success) {
+                this.nextCursor = data.next_cursor;
+                this.updateHistoryList(data.history, true);
+            }
+        } catch (error) {
+            console.error('Erreur lors du chargement de l\'historique:', error);
+        } finally {
+            this.loadingHistory = false;
+        }
+    }
+
     /**
      * Met à jour la liste de l'historique
      */
-    updateHistoryList(conversations) {
+    updateHistoryList(conversations, append = false) {
         const historyList = document.getElementById('historyList');
         if (!historyList) return;
 
+        if (append) {
+            historyList.insertAdjacentHTML('beforeend', this.renderHistoryItems(conversations));
+            return;
+        }
+
         if (conversations.length === 0) {
             historyList.innerHTML = '<p class="text-gray-500 text-center py-4">Aucune conversation trouvée</p>';
             return;
         }
 
-        const html = conversations.map(conversation => `
+        historyList.innerHTML = this.renderHistoryItems(conversations);
+    }
+
+    /**
+     * Génère le HTML des éléments de l'historique
+     */
+    renderHistoryItems(conversations) {
+        return conversations.map(conversation => `
             <div class="conversation-item p-3 border border-gray-200 rounded hover:bg-gray-50 cursor-pointer" 
                  data-id="${conversation.id}">
                 <div class="flex justify-between items-start">
@@ -218,6 +270,9 @@ class AssistantApp {
                                 conversation.prompt.substring(0, 100) + '...' : 
                                 conversation.prompt}
                         </p>
+                        ${conversation.snippet ? 
+                            `<p class="text-xs text-gray-600 mb-1 search-snippet">${this.renderSnippet(conversation.snippet)}</p>` : 
+                            ''}
                         <div class="flex items-center gap-2 text-xs text-gray-500">
                             <span>${conversation.timestamp}</span>
                             ${conversation.model_used ? 
@@ -241,8 +296,6 @@ class AssistantApp {
                 </div>
             </div>
         `).join('');
-
-        historyList.innerHTML = html;
     }
 
     /**
@@ -367,6 +420,26 @@ class AssistantApp {
         }
     }
 
+    /**
+     * Échappe un texte pour l'insérer dans du HTML
+     */
+    escapeHtml(text) {
+        return String(text ?? '')
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;');
+    }
+
+    /**
+     * Rend un extrait de recherche : texte échappé, seuls les surlignages <mark> sont conservés
+     */
+    renderSnippet(snippet) {
+        return this.escapeHtml(snippet)
+            .replace(/&lt;mark&gt;/g, '<mark>')
+            .replace(/&lt;\/mark&gt;/g, '</mark>');
+    }
+
     /**
      * Affiche un message d'erreur
      */
@@ -437,22 +510,86 @@ class AssistantApp {
 
         if (openaiResponse) {
             openaiResponse.innerHTML = responses.openai.success ? 
-                this.renderMarkdown(responses.openai.text) : responses.openai.error;
+                this.renderMarkdown(responses.openai.text) : this.escapeHtml(responses.openai.error);
         }
         
         if (claudeResponse) {
             claudeResponse.innerHTML = responses.claude.success ? 
-                this.renderMarkdown(responses.claude.text) : responses.claude.error;
+                this.renderMarkdown(responses.claude.text) : this.escapeHtml(responses.claude.error);
         }
         
         if (groqResponse) {
             groqResponse.innerHTML = responses.groq.success ? 
-                this.renderMarkdown(responses.groq.text) : responses.groq.error;
+                this.renderMarkdown(responses.groq.text) : this.escapeHtml(responses.groq.error);
         }
         
         if (compareArea) compareArea.style.display = 'block';
     }
 
+    /**
+     * Affiche les réponses de comparaison au fil de l'eau (flux SSE multiplexé)
+     */
+    async streamCompareResponses(formData) {
+        const panes = {
+            openai: document.getElementById('openaiResponse'),
+            claude: document.getElementById('claudeResponse'),
+            groq: document.getElementById('groqResponse')
+        };
+        const texts = { openai: '', claude: '', groq: '' };
+
+        Object.values(panes).forEach(pane => { if (pane) pane.innerHTML = ''; });
+        const compareArea = document.getElementById('compareArea');
+        if (compareArea) compareArea.style.display = 'block';
+
+        const response = await fetch(CONFIG.ENDPOINTS.COMPARE_STREAM, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ prompt: formData.prompt, groq_model: formData.groqModel })
+        });
+
+        if (!response.ok) {
+            const data = await response.json();
+            this.showError(data.error || 'Une erreur est survenue.');
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            events.forEach(raw => {
+                if (!raw.startsWith('data: ')) return;
+                const event = JSON.parse(raw.slice(6));
+                const pane = panes[event.provider];
+
+                if (event.type === 'delta') {
+                    texts[event.provider] += event.text;
+                    if (pane) pane.innerHTML = this.renderMarkdown(texts[event.provider]);
+                } else if ((event.type === 'timeout' || event.type === 'error') && pane) {
+                    pane.innerHTML = this.renderMarkdown(texts[event.provider]) +
+                        `<p class="text-red-600">${this.escapeHtml(event.error)}</p>`;
+                }
+            });
+        }
+
+        // Fournisseurs non configurés : aucun événement reçu
+        Object.entries(panes).forEach(([provider, pane]) => {
+            if (pane && !texts[provider] && !pane.innerHTML) {
+                pane.textContent = 'Non configuré';
+            }
+        });
+    }
+
     /**
      * Récupère les données du formulaire
      */
@@ -527,6 +664,12 @@ class AssistantApp {
         this.showLoading();
         
         try {
+            if (formData.provider === 'compare' && window.ReadableStream) {
+                await this.streamCompareResponses(formData);
+                setTimeout(() => this.refreshHistory(), 1000);
+                return;
+            }
+
             const { endpoint, requestBody } = this.getRequestConfig(formData);
             const result = await this.makeApiCall(endpoint, requestBody);
             
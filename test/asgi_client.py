@@ -0,0 +1,50 @@
+"""Client ASGI minimal pour les tests : une requête HTTP, messages envoyés collectés."""
+import asyncio
+import json
+
+
+async def request(app, method, path, body=None, headers=(), disconnect_after=None):
+    """Envoie une requête à l'application ASGI et retourne ``(statut, en-têtes, corps)``.
+
+    Avec ``disconnect_after``, le client se déconnecte après avoir reçu ce nombre de fragments du corps.
+    """
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    incoming = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+    gone = asyncio.Event()
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        await gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+        if (disconnect_after is not None and message['type'] == 'http.response.body'
+                and len(sent) - 1 >= disconnect_after):
+            gone.set()
+
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                    *[(name.lower().encode(), value.encode()) for name, value in headers]],
+    }
+    await app(scope, receive, send)
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict(start.get('headers', [])), body
+
+
+def call(app, method, path, body=None, headers=(), disconnect_after=None):
+    """Variante synchrone de ``request``."""
+    return asyncio.run(request(app, method, path, body, headers, disconnect_after))
+
+
+def sse_events(body):
+    """Décode les événements d'un corps Server-Sent Events."""
+    return [json.loads(line[len('data: '):]) for line in body.decode('utf-8').splitlines()
+            if line.startswith('data: ')]
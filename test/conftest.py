@@ -0,0 +1,80 @@
+"""Fixtures partagées : base SQLite temporaire, serveur LLM factice et application importée."""
+import pytest
+
+from benchmarks.mock_llm_server import MockConfig, MockLLMServer
+from src.infrastructure.database import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base de données vierge, migrée, sans cache de statistiques."""
+    monkeypatch.setenv('STATS_CACHE_TTL', '0')
+    manager = DatabaseManager(str(tmp_path / 'data' / 'conversations.db'))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def insert_conversation(db):
+    """Insère une conversation, datée si besoin (les triggers d'agrégats s'appliquent), et retourne son ID."""
+    def insert(prompt, timestamp=None, responses=()):
+        with db._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO conversations (prompt, timestamp, endpoint) "
+                "VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), '/api/test')", (prompt, timestamp))
+            conn.commit()
+            conversation_id = cursor.lastrowid
+        for response in responses:
+            db.save_response(conversation_id, **response)
+        return conversation_id
+    return insert
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    """Serveur LLM factice (réponses immédiates) vers lequel les SDK sont redirigés."""
+    server = MockLLMServer(MockConfig(latency=0.0, jitter=0.0, tokens_per_second=0,
+                                      completion_tokens=12)).start()
+    for name, value in server.environment().items():
+        monkeypatch.setenv(name, value)
+    # Le serveur local ne doit pas passer par un éventuel proxy de l'environnement
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1,localhost')
+    monkeypatch.setenv('no_proxy', '127.0.0.1,localhost')
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope='session')
+def application(tmp_path_factory):
+    """Module ``app``, importé une seule fois : SDK redirigés vers un serveur factice, données dans un dossier temporaire."""
+    server = MockLLMServer(MockConfig(latency=0.0, jitter=0.0, tokens_per_second=0,
+                                      completion_tokens=12)).start()
+    patch = pytest.MonkeyPatch()
+    for name, value in server.environment().items():
+        patch.setenv(name, value)
+    patch.setenv('NO_PROXY', '127.0.0.1,localhost')
+    patch.setenv('no_proxy', '127.0.0.1,localhost')
+    patch.setenv('STATS_CACHE_TTL', '0')
+    patch.setenv('RESPONSE_CACHE_ENABLED', 'false')
+    patch.setenv('SEMANTIC_CACHE_ENABLED', 'false')
+    # Base, fichier de débordement et archive sont relatifs au répertoire courant
+    patch.chdir(tmp_path_factory.mktemp('app'))
+
+    import app
+    app.mock_llm = server
+    yield app
+
+    app.model_registry.stop()
+    if app.write_queue is not None:
+        app.write_queue.close()
+    patch.undo()
+    server.stop()
+
+
+@pytest.fixture
+def llm_config(application):
+    """Comportement du serveur factice, rétabli après le test."""
+    config = application.mock_llm.httpd.config
+    saved = dict(vars(config))
+    yield config
+    vars(config).update(saved)
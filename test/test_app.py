@@ -0,0 +1,84 @@
+import json
+import time
+
+import pytest
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestCompareStream:
+    def test_timed_out_providers_release_their_upstream(self, application, llm_config, monkeypatch):
+        monkeypatch.setattr(application.resilience, 'is_available', lambda provider: provider != 'anthropic')
+        # 200 tokens à 20 par seconde : aucun flux ne se termine dans le budget
+        llm_config.tokens_per_second = 20
+        llm_config.completion_tokens = 200
+        before = application.shared_streams.stats()['abandoned']
+
+        start = time.monotonic()
+        events = list(application.compare_stream_events('Flux trop long', 'llama3-8b-8192', total_timeout=0.3))
+
+        assert time.monotonic() - start < 2
+        assert {event['provider'] for event in events if event['type'] == 'timeout'} == {'openai', 'groq'}
+        # Plus aucun abonné : les flux amont sont fermés au fragment suivant, pas lus jusqu'au bout
+        assert wait_until(lambda: application.shared_streams.stats()['in_flight'] == 0, timeout=2)
+        assert application.shared_streams.stats()['abandoned'] == before + 2
+
+
+class TestHistoryLimits:
+    @pytest.fixture
+    def client(self, application):
+        return application.app.test_client()
+
+    @pytest.mark.parametrize('path', ['/api/history', '/api/history/search?q=bonjour'])
+    @pytest.mark.parametrize('limit', ['0', '-5', '100000', 'tout'])
+    def test_out_of_range_limit_is_rejected(self, client, path, limit):
+        separator = '&' if '?' in path else '?'
+        response = client.get(f'{path}{separator}limit={limit}')
+        assert response.status_code == 400
+        assert 'limit' in response.get_json()['error']
+
+    def test_limit_bounds_the_page(self, client, application):
+        for index in range(3):
+            application.recorder.record('/api/test', f'Question limitée {index}', [])
+        assert application.write_queue.flush(timeout=5)
+
+        assert len(client.get('/api/history?limit=2').get_json()['history']) == 2
+        assert len(client.get('/api/history/search?q=limitée&limit=1').get_json()['results']) == 1
+        assert client.get(f'/api/history?limit={application.HISTORY_MAX_LIMIT}').status_code == 200
+
+    def test_negative_offset_is_rejected(self, client):
+        assert client.get('/api/history?offset=-1').status_code == 400
+        assert client.get('/api/history?offset=0').status_code == 200
+
+
+class TestBatchCacheFlag:
+    @pytest.mark.parametrize('value, expected', [(True, True), (False, False), ('false', False),
+                                                 ('0', False), ('No', False), ('true', True), ('1', True)])
+    def test_accepted_values(self, application, value, expected):
+        assert application.parse_cache_flag(value) is expected
+
+    @pytest.mark.parametrize('value', ['peut-être', '', None, 0, [], {}])
+    def test_other_values_are_rejected(self, application, value):
+        with pytest.raises(ValueError):
+            application.parse_cache_flag(value)
+
+    def test_invalid_value_fails_its_line_only(self, application):
+        response = application.app.test_client().post('/api/batch', json={'items': [
+            {'prompt': 'Lot sans cache', 'provider': 'groq', 'cache': 'false'},
+            {'prompt': 'Lot ambigu', 'provider': 'groq', 'cache': 'peut-être'}]})
+        results = {result['line']: result for result in map(json.loads, response.get_data(as_text=True).splitlines())}
+
+        assert response.status_code == 200
+        assert results[1]['success']
+        assert not results[2]['success']
+        assert 'cache' in results[2]['error']
+
+    def test_invalid_default_is_rejected(self, application):
+        response = application.app.test_client().post('/api/batch?cache=peut-être', data='{"prompt": "Bonjour"}\n',
+                                                      content_type='application/x-ndjson')
+        assert response.status_code == 400
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+from src.application.retention import RetentionJob
+from src.infrastructure.archive import ConversationArchive, normalize_terms, zstandard
+
+COMPRESSIONS = ['gzip', pytest.param('zstd', marks=pytest.mark.skipif(
+    zstandard is None, reason="module zstandard absent"))]
+
+
+def conversation(conversation_id, timestamp, prompt, answer):
+    return {
+        'id': conversation_id, 'prompt': prompt, 'timestamp': timestamp, 'model_used': None,
+        'response_success': 1, 'endpoint': '/api/chat',
+        'responses': [{'provider': 'openai', 'model': 'gpt-4o', 'response_text': answer, 'success': 1,
+                       'error_message': None, 'response_time': 1.2, 'tokens_used': 30,
+                       'prompt_tokens': 20, 'completion_tokens': 10, 'cost': 0.0001,
+                       'time_to_first_token': None}],
+    }
+
+
+CONVERSATIONS = [
+    conversation(1, '2024-01-01 09:00:00', 'Recette des crêpes', 'Farine, œufs et lait'),
+    conversation(2, '2024-01-01 10:00:00', 'Capitale du Sénégal', 'Dakar'),
+    conversation(3, '2024-01-01 11:00:00', 'Plus haut sommet', "L'Everest"),
+    conversation(4, '2024-01-02 08:00:00', 'Recette du thiéboudienne', 'Riz et poisson'),
+    conversation(5, '2024-01-02 09:00:00', 'Traduire bonjour', 'Hello'),
+]
+
+
+@pytest.fixture(params=COMPRESSIONS)
+def archive(tmp_path, request):
+    archive = ConversationArchive(str(tmp_path / 'archive'), segment_size=2, block_size=1,
+                                  compression=request.param)
+    archive.write(CONVERSATIONS)
+    archive.close()
+    return archive
+
+
+def test_round_trip(archive):
+    for original in CONVERSATIONS:
+        details = archive.get(original['id'])
+        assert details['prompt'] == original['prompt']
+        assert details['archived']
+        assert details['responses'][0]['response_text'] == original['responses'][0]['response_text']
+        assert details['responses'][0]['cost'] == pytest.approx(0.0001)
+    assert archive.get(99) is None
+
+    stats = archive.stats()
+    assert stats['conversations'] == 5
+    # Segments de deux conversations au plus, partitionnés par jour
+    assert stats['segments'] == 3
+    assert stats['first_timestamp'] == '2024-01-01 09:00:00'
+
+
+def test_other_process_reads_written_segments(archive):
+    reader = ConversationArchive(archive.root, compression=archive.compression)
+    assert reader.get(4)['prompt'] == 'Recette du thiéboudienne'
+
+
+def test_search_ignores_case_and_accents(archive):
+    assert [row['id'] for row in archive.search('recette')] == [4, 1]
+    assert [row['id'] for row in archive.search('SENEGAL')] == [2]
+    # Dernier mot recherché comme préfixe, les autres exactement
+    assert [row['id'] for row in archive.search('recette cre')] == [1]
+    assert archive.search('recet crepes') == []
+    assert [row['id'] for row in archive.search('recette', limit=1)] == [4]
+    assert [row['id'] for row in archive.search('recette', exclude={4})] == [1]
+    assert '<mark>Dakar</mark>' in archive.search('dakar')[0]['snippet']
+
+
+def test_normalize_terms():
+    assert normalize_terms("Élève, l'été") == ['eleve', 'l', 'ete']
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ConversationArchive(str(tmp_path), compression='bz2')
+
+
+class TestRetentionJob:
+    def test_old_conversations_move_to_archive(self, db, insert_conversation, tmp_path):
+        old = [insert_conversation(f'Ancienne question {index}', f'2020-03-0{index + 1} 12:00:00',
+                                   [{'provider': 'groq', 'response_text': f'Réponse {index}'}])
+               for index in range(5)]
+        recent = insert_conversation('Question du jour')
+        archive = ConversationArchive(str(tmp_path / 'archive'), compression='gzip')
+        job = RetentionJob(db, days=30, batch_size=2, pause=0, archive=archive, vacuum=True)
+
+        status = job.run()
+
+        assert status['state'] == 'completed'
+        assert status['total'] == 5
+        assert status['deleted'] == 5
+        assert status['archived'] == 5
+        assert status['batches'] == 3
+        assert status['progress'] == 1.0
+        assert db.get_conversation_details(old[0]) is None
+        assert archive.get(old[0])['responses'][0]['response_text'] == 'Réponse 0'
+        assert db.get_conversation_details(recent) is not None
+        assert db.get_statistics()['total_conversations'] == 1
+
+    def test_archived_conversation_is_unchanged(self, db, insert_conversation, tmp_path):
+        conversation_id = insert_conversation('Ancienne question sur les régates', '2020-03-01 12:00:00', [
+            {'provider': 'groq', 'model': 'llama3-8b-8192', 'response_text': 'Réponse', 'response_time': 0.5,
+             'prompt_tokens': 10, 'completion_tokens': 20, 'cost': 0.0001, 'time_to_first_token': 0.1},
+            {'provider': 'openai', 'model': 'gpt-4o', 'success': False, 'error_message': 'quota dépassé'}])
+        before = db.get_conversation_details(conversation_id)
+        archive = ConversationArchive(str(tmp_path / 'archive'), compression='gzip')
+
+        RetentionJob(db, days=30, pause=0, archive=archive, vacuum=False).run()
+
+        # Base -> archive -> lecture : mêmes champs, réponses en échec comprises
+        assert archive.get(conversation_id) == dict(before, archived=True)
+        assert [result['id'] for result in archive.search('regate')] == [conversation_id]
+        # Un autre processus (nouvelle instance) lit les segments écrits par le nettoyage
+        reader = ConversationArchive(archive.root, compression='gzip')
+        assert reader.get(conversation_id)['responses'][1]['error_message'] == 'quota dépassé'
+
+    def test_background_run_reports_progress(self, db, insert_conversation, tmp_path):
+        for index in range(3):
+            insert_conversation(f'Ancienne question {index}', f'2020-03-0{index + 1} 12:00:00')
+        job = RetentionJob(db, days=30, batch_size=1, pause=0,
+                           archive=ConversationArchive(str(tmp_path / 'archive'), compression='gzip'))
+
+        assert job.start()
+        deadline = time.monotonic() + 5
+        while job.status()['state'] == 'running' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        status = job.status()
+        assert status['state'] == 'completed'
+        assert status['archived'] == 3
+        assert status['batches'] == 3
+
+    def test_nothing_to_delete(self, db, insert_conversation):
+        insert_conversation('Question du jour')
+        status = RetentionJob(db, days=30, pause=0, vacuum=False).run()
+        assert status['state'] == 'completed'
+        assert status['deleted'] == 0
+
+    @pytest.mark.parametrize('days', [0, -1, True, '30'])
+    def test_invalid_days(self, db, days):
+        with pytest.raises(ValueError):
+            RetentionJob(db, pause=0).run(days)
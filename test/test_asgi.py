@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from asgi_client import call, request, sse_events
+from src.infrastructure.metrics import PROVIDER_LATENCY, PROVIDER_TTFT
+
+
+@pytest.fixture(scope='module')
+def asgi(application):
+    import asgi
+    return asgi
+
+
+def called(provider, model):
+    return any(labels['provider'] == provider and labels['model'] == model
+               for labels in PROVIDER_LATENCY.label_values())
+
+
+class TestSingleProvider:
+    def test_chat_goes_through_the_client_pipeline(self, asgi, application):
+        status, _, body = call(asgi.application, 'POST', '/api/chat', {'prompt': 'Bonjour ASGI'})
+        result = json.loads(body)
+
+        assert status == 200
+        assert result['success']
+        assert result['usage']['completion_tokens'] == 12
+        # Gouverneur de débit, disjoncteur et métriques des clients synchrones
+        assert 'openai/gpt-4o' in application.governor.stats()
+        assert 'openai' in application.resilience.stats()
+        assert called('openai', 'gpt-4o')
+
+    def test_identical_requests_share_one_call(self, asgi, application, llm_config):
+        llm_config.latency = 0.3
+        before = application.single_flight.stats()['coalesced']
+
+        async def both():
+            body = {'prompt': 'Même question simultanée'}
+            return await asyncio.gather(request(asgi.application, 'POST', '/api/groq', body),
+                                        request(asgi.application, 'POST', '/api/groq', body))
+
+        results = asyncio.run(both())
+
+        assert [status for status, _, _ in results] == [200, 200]
+        assert all(json.loads(body)['success'] for _, _, body in results)
+        assert application.single_flight.stats()['coalesced'] == before + 1
+        texts = {json.loads(body)['text'] for _, _, body in results}
+        assert len(texts) == 1
+
+    def test_missing_prompt(self, asgi):
+        status, _, body = call(asgi.application, 'POST', '/api/groq', {})
+        assert status == 400
+        assert json.loads(body)['error'] == 'Le prompt est requis'
+
+    def test_unknown_groq_model(self, asgi, application):
+        deadline = time.monotonic() + 5
+        while not application.model_registry.describe('groq')['loaded'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        status, _, body = call(asgi.application, 'POST', '/api/groq',
+                               {'prompt': 'Bonjour', 'model': 'llama3-8b-819'})
+
+        assert status == 400
+        assert 'llama3-8b-8192' in json.loads(body)['suggestions']
+
+
+class TestCompare:
+    def test_open_breaker_is_skipped(self, asgi, application, monkeypatch):
+        monkeypatch.setattr(application.resilience, 'is_available', lambda provider: provider != 'anthropic')
+
+        status, _, body = call(asgi.application, 'POST', '/api/compare', {'prompt': 'Comparer'})
+        responses = json.loads(body)['responses']
+
+        assert status == 200
+        assert responses['openai']['success'] and responses['groq']['success']
+        assert responses['claude']['circuit_open']
+        assert not responses['claude']['success']
+
+    def test_invalid_timeout(self, asgi):
+        status, _, _ = call(asgi.application, 'POST', '/api/compare', {'prompt': 'Comparer', 'timeout': -1})
+        assert status == 400
+
+    def test_stream_multiplexes_providers(self, asgi, application, monkeypatch):
+        monkeypatch.setattr(application.resilience, 'is_available', lambda provider: provider != 'anthropic')
+        status, headers, body = call(asgi.application, 'POST', '/api/compare/stream',
+                                     {'prompt': 'Comparer en flux'})
+        events = sse_events(body)
+
+        assert status == 200
+        assert headers[b'content-type'] == b'text/event-stream'
+        # Fournisseur écarté signalé d'emblée, sans attendre les autres
+        assert events[0] == {'type': 'error', 'provider': 'claude', 'circuit_open': True, 'success': False,
+                             'error': 'Claude indisponible (disjoncteur ouvert)'}
+        assert {event['provider'] for event in events if event['type'] == 'delta'} == {'openai', 'groq'}
+        assert events[-1]['type'] == 'summary'
+        assert all(result['success'] for result in events[-1]['summary'].values())
+
+
+class TestStreams:
+    def test_stream_records_first_token(self, asgi):
+        status, _, body = call(asgi.application, 'POST', '/api/groq/stream',
+                               {'prompt': 'Flux Groq', 'model': 'llama3-70b-8192'})
+        events = sse_events(body)
+
+        assert status == 200
+        assert len(events) == 12
+        assert all(event['success'] for event in events)
+        assert {'provider': 'groq', 'model': 'llama3-70b-8192'} in PROVIDER_TTFT.label_values()
+
+    def test_client_disconnect_closes_the_stream(self, asgi, application, llm_config):
+        llm_config.tokens_per_second = 20
+        llm_config.completion_tokens = 200
+        start = time.monotonic()
+
+        status, _, body = call(asgi.application, 'POST', '/api/groq/stream', {'prompt': 'Flux abandonné'},
+                               disconnect_after=2)
+
+        # 200 tokens à 20 par seconde : le flux n'est pas lu jusqu'au bout
+        assert time.monotonic() - start < 3
+        assert status == 200
+        assert 1 <= len(sse_events(body)) <= 3
+
+
+def test_other_routes_are_served_by_flask(asgi):
+    status, _, body = call(asgi.application, 'GET', '/api/models')
+    assert status == 200
+    assert json.loads(body)['success']
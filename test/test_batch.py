@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.application.batch import BatchProcessor
+
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def processor(calls):
+    lock = threading.Lock()
+
+    def generate(item):
+        with lock:
+            calls.append(item['prompt'])
+        if item['prompt'] == 'échec':
+            raise RuntimeError("fournisseur indisponible")
+        return {"success": True, "text": item['prompt'].upper(), "provider": item.get('provider', 'groq')}
+
+    batch = BatchProcessor(generate, max_workers=2, rate_limit=0)
+    yield batch
+    batch.shutdown()
+
+
+class TestTruncatePartialLine:
+    @pytest.mark.parametrize('content, expected', [
+        (b'{"line": 1}\n{"line": 2}\n{"li', b'{"line": 1}\n{"line": 2}\n'),
+        (b'{"line": 1}\n', b'{"line": 1}\n'),
+        (b'{"line"', b''),
+        (b'', b''),
+    ])
+    def test_keeps_complete_lines_only(self, tmp_path, content, expected):
+        path = tmp_path / 'results.jsonl'
+        path.write_bytes(content)
+        BatchProcessor._truncate_partial_line(str(path))
+        assert path.read_bytes() == expected
+
+    def test_partial_line_longer_than_a_block(self, tmp_path):
+        path = tmp_path / 'results.jsonl'
+        path.write_bytes(b'{"line": 1}\n' + b'x' * 10000)
+        BatchProcessor._truncate_partial_line(str(path))
+        assert path.read_bytes() == b'{"line": 1}\n'
+
+    def test_missing_file(self, tmp_path):
+        BatchProcessor._truncate_partial_line(str(tmp_path / 'absent.jsonl'))
+
+
+def test_parse_reports_invalid_lines():
+    items = list(BatchProcessor.parse(['{"prompt": "a"}', '', 'pas du json', '[1]', '{"id": 3}']))
+
+    assert [line for line, _ in items] == [1, 3, 4, 5]
+    assert items[0][1] == {"prompt": "a"}
+    assert items[1][1]['error'].startswith('JSON invalide')
+    assert 'error' in items[2][1]
+    assert items[3][1] == {"id": 3, "error": "Le prompt est requis"}
+
+
+def test_process_file_writes_every_line(processor, tmp_path, calls):
+    source, output = tmp_path / 'prompts.jsonl', tmp_path / 'results.jsonl'
+    write_lines(source, [json.dumps({"prompt": f"prompt {index}", "id": index}) for index in range(20)]
+                + ['{"prompt": "échec"}', 'invalide'])
+
+    summary = processor.process_file(str(source), str(output), resume=False, defaults={"provider": "openai"})
+
+    results = {result['line']: result for result in read_results(output)}
+    assert sorted(results) == list(range(1, 23))
+    assert results[1] == {**results[1], "id": 0, "success": True, "text": "PROMPT 0", "provider": "openai"}
+    assert results[21]['error'] == "fournisseur indisponible"
+    assert not results[22]['success']
+    assert summary['processed'] == 22
+    assert summary['succeeded'] == 20
+    assert summary['failed'] == 2
+    assert len(calls) == 21
+
+
+def test_resume_skips_completed_lines(processor, tmp_path, calls):
+    source, output = tmp_path / 'prompts.jsonl', tmp_path / 'results.jsonl'
+    write_lines(source, [json.dumps({"prompt": f"prompt {index}"}) for index in range(1, 6)])
+    # Lot interrompu : lignes 2 et 4 écrites, la suivante tronquée pendant l'écriture
+    output.write_text(json.dumps({"line": 2, "success": True}) + '\n'
+                      + json.dumps({"line": 4, "success": True}) + '\n'
+                      + '{"line": 5, "succ', encoding='utf-8')
+
+    summary = processor.process_file(str(source), str(output), resume=True)
+
+    assert sorted(calls) == ['prompt 1', 'prompt 3', 'prompt 5']
+    assert summary['skipped'] == 2
+    assert sorted(result['line'] for result in read_results(output)) == [1, 2, 3, 4, 5]
+
+
+def test_completed_lines_ignores_unreadable_lines(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    path.write_text('{"line": 1}\n{"autre": 2}\n{"line": 3', encoding='utf-8')
+    assert BatchProcessor.completed_lines(str(path)) == {1}
+
+
+def test_rate_limit_spaces_requests():
+    processor = BatchProcessor(lambda item: {"success": True}, max_workers=4, rate_limit=10)
+    start = time.monotonic()
+    try:
+        results = list(processor.run((index, {"prompt": str(index)}) for index in range(1, 16)))
+    finally:
+        processor.shutdown()
+
+    # Rafale de 10 prompts, puis un toutes les 100 ms
+    assert time.monotonic() - start >= 0.4
+    assert sorted(result['line'] for result in results) == list(range(1, 16))
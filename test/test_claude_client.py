@@ -0,0 +1,18 @@
+from src.infrastructure.claude_client import ClaudeClient
+
+
+def test_voice_response_reports_the_requested_model(monkeypatch):
+    monkeypatch.setenv('ANTHROPIC_API_KEY', 'sk-ant-test')
+    client = ClaudeClient()
+    calls = []
+
+    def generate_with_usage(prompt, model, use_cache=True):
+        calls.append(model)
+        return {"text": "Bonjour", "usage": {"completion_tokens": 1}, "error": None}
+
+    monkeypatch.setattr(client, 'generate_with_usage', generate_with_usage)
+    result = client.generate_voice_response('Bonjour', model='claude-3-5-haiku-20241022')
+
+    assert calls == ['claude-3-5-haiku-20241022']
+    assert result['model'] == 'claude-3-5-haiku-20241022'
+    assert result['provider'] == 'anthropic'
@@ -0,0 +1,180 @@
+import sqlite3
+
+import pytest
+
+from src.infrastructure.database import MIGRATIONS, DatabaseManager
+
+
+def fts_available() -> bool:
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE t USING fts5(a)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+requires_fts5 = pytest.mark.skipif(not fts_available(), reason="SQLite compilé sans FTS5")
+
+
+class TestMigrations:
+    def test_all_migrations_applied_once(self, db):
+        assert db.get_schema_version() == MIGRATIONS[-1][0]
+
+        # Un second démarrage sur la même base ne réapplique rien
+        reopened = DatabaseManager(db.db_path)
+        with reopened._connect() as conn:
+            versions = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+        reopened.close()
+        assert versions == [version for version, _, _ in MIGRATIONS]
+
+    @requires_fts5
+    def test_missing_full_text_index_is_created_at_startup(self, db):
+        # Base migrée par un SQLite sans FTS5 : migration 3 enregistrée, index absent
+        with db._connect() as conn:
+            conn.executescript('''
+                DROP TRIGGER IF EXISTS responses_fts_update;
+                DROP TABLE conversations_fts;
+            ''')
+        db.close()
+
+        reopened = DatabaseManager(db.db_path)
+        assert reopened.fts_enabled
+        assert reopened._table_exists('conversations_fts')
+        reopened.close()
+
+
+class TestStatisticsRollups:
+    def test_triggers_follow_inserts_and_deletes(self, db):
+        kept = db.save_conversations_batch([{
+            'prompt': 'Bonjour',
+            'responses': [
+                {'provider': 'openai', 'model': 'gpt-4o', 'response_text': 'Salut', 'response_time': 1.0,
+                 'prompt_tokens': 10, 'completion_tokens': 5, 'cost': 0.01},
+                {'provider': 'groq', 'model': 'llama3-8b-8192', 'success': False, 'error_message': 'Erreur'},
+            ],
+        }])[0]
+        deleted = db.save_conversation('Au revoir', model_used='openai')
+        db.save_response(deleted, 'openai', model='gpt-4o', response_time=3.0,
+                         prompt_tokens=20, completion_tokens=10, cost=0.02)
+
+        stats = db.get_statistics()
+        assert stats['total_conversations'] == 2
+        assert stats['provider_stats']['openai']['count'] == 2
+        assert stats['provider_stats']['openai']['avg_time'] == pytest.approx(2.0)
+        assert stats['provider_stats']['openai']['total_tokens'] == 45
+        assert stats['provider_stats']['groq']['success_rate'] == 0
+        assert db.get_daily_costs()['openai'] == pytest.approx(0.03)
+
+        assert db.delete_conversation(deleted)
+        stats = db.get_statistics()
+        assert stats['total_conversations'] == 1
+        assert stats['provider_stats']['openai']['count'] == 1
+        assert stats['provider_stats']['openai']['total_tokens'] == 15
+        assert db.get_daily_costs()['openai'] == pytest.approx(0.01)
+        assert db.get_conversation_details(kept)['responses'][0]['tokens_used'] == 15
+
+    def test_rebuild_matches_triggers(self, db):
+        for index in range(5):
+            conversation_id = db.save_conversation(f'Question {index}')
+            db.save_response(conversation_id, 'claude', model='claude-3-5-sonnet-20241022',
+                             response_time=0.2 * index, cost=0.001)
+        before = db.get_statistics()
+
+        db.rebuild_aggregates()
+        assert db.get_statistics() == before
+
+
+class TestHistoryPagination:
+    def test_keyset_pages_cover_history_without_duplicates(self, db, insert_conversation):
+        # Horodatages identiques : l'identifiant départage les conversations
+        ids = [insert_conversation(f'Prompt {index}', '2024-05-01 12:00:00') for index in range(5)]
+        ids.append(insert_conversation('Plus récent', '2024-05-02 08:00:00'))
+
+        seen, cursor = [], None
+        while True:
+            page = db.get_conversation_history_page(limit=2, cursor=cursor)
+            seen.extend(item['id'] for item in page['history'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        assert seen == [ids[-1]] + sorted(ids[:-1], reverse=True)
+
+    def test_page_ignores_later_inserts(self, db, insert_conversation):
+        for index in range(4):
+            insert_conversation(f'Prompt {index}', f'2024-05-0{index + 1} 12:00:00')
+        first = db.get_conversation_history_page(limit=2)
+        insert_conversation('Nouvelle conversation')
+
+        second = db.get_conversation_history_page(limit=2, cursor=first['next_cursor'])
+        assert [item['prompt'] for item in second['history']] == ['Prompt 1', 'Prompt 0']
+        assert second['next_cursor'] is None
+
+    def test_cursor_round_trip_and_invalid_cursor(self):
+        cursor = DatabaseManager.encode_cursor('2024-05-01 12:00:00', 42)
+        assert DatabaseManager.decode_cursor(cursor) == ('2024-05-01 12:00:00', 42)
+        with pytest.raises(ValueError):
+            DatabaseManager.decode_cursor('pas-un-curseur')
+
+
+class TestSearch:
+    def test_fts_query_quotes_every_word(self):
+        assert DatabaseManager._fts_query('chat OR "NEAR(x') == '"chat" "OR" "NEAR" "x"*'
+        assert DatabaseManager._fts_query('  -*()  ') == ''
+
+    @requires_fts5
+    def test_search_prompts_and_responses(self, db, insert_conversation):
+        insert_conversation('Recette de crêpes', responses=[
+            {'provider': 'openai', 'response_text': 'Mélanger la farine et les œufs'}])
+        insert_conversation('Capitale du Sénégal', responses=[
+            {'provider': 'groq', 'response_text': 'Dakar'}])
+
+        assert [row['prompt'] for row in db.search_conversations('farine')] == ['Recette de crêpes']
+        # Le dernier mot est un préfixe ; la syntaxe FTS5 saisie n'est pas interprétée
+        assert [row['prompt'] for row in db.search_conversations('Capit')] == ['Capitale du Sénégal']
+        assert db.search_conversations('dakar AND (') == []
+        assert '<mark>' in db.search_conversations('Dakar')[0]['snippet']
+
+    @requires_fts5
+    def test_edited_response_is_reindexed(self, db, insert_conversation):
+        conversation_id = insert_conversation('Question', responses=[
+            {'provider': 'openai', 'response_text': 'ancienne réponse'}])
+        with db._connect() as conn:
+            conn.execute('UPDATE responses SET response_text = ? WHERE conversation_id = ?',
+                         ('nouvelle formulation', conversation_id))
+            conn.commit()
+
+        assert [row['id'] for row in db.search_conversations('formulation')] == [conversation_id]
+        assert db.search_conversations('ancienne') == []
+
+    def test_like_fallback_without_fts(self, db, insert_conversation):
+        insert_conversation('Recette de crêpes')
+        db.fts_enabled = False
+        assert [row['prompt'] for row in db.search_conversations('crêpes')] == ['Recette de crêpes']
+
+
+class TestRetentionQueries:
+    def test_batches_delete_oldest_first(self, db, insert_conversation):
+        old = [insert_conversation(f'Ancienne {index}', f'2020-01-0{index + 1} 00:00:00',
+                                   [{'provider': 'openai', 'response_text': 'ok'}]) for index in range(3)]
+        recent = insert_conversation('Récente')
+        cutoff = db.retention_cutoff(30)
+
+        assert db.count_conversations_before(cutoff) == 3
+        archived = []
+        assert db.delete_conversations_before(cutoff, limit=2, archive=archived.extend) == 2
+        assert [row['id'] for row in archived] == old[:2]
+        assert archived[0]['responses'][0]['response_text'] == 'ok'
+        assert db.cleanup_old_conversations(days=30) == 1
+        assert db.get_conversation_details(recent) is not None
+        assert db.get_statistics()['total_conversations'] == 1
+
+    def test_failed_archive_keeps_conversations(self, db, insert_conversation):
+        insert_conversation('Ancienne', '2020-01-01 00:00:00')
+
+        def archive(conversations):
+            raise OSError("disque plein")
+
+        with pytest.raises(OSError):
+            db.delete_conversations_before(db.retention_cutoff(30), archive=archive)
+        assert db.count_conversations_before(db.retention_cutoff(30)) == 1
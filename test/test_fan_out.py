@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from src.application.fan_out import FanOutExecutor
+from src.application.recorder import STREAM_ERROR_PREFIX
+
+
+@pytest.fixture
+def executor():
+    executor = FanOutExecutor(max_workers=8, provider_timeout=1.0, total_timeout=2.0)
+    yield executor
+    executor.shutdown()
+
+
+def answer(text, delay=0.0):
+    def task():
+        time.sleep(delay)
+        return {"success": True, "text": text}
+    return task
+
+
+class TestRun:
+    def test_latency_is_the_slowest_not_the_sum(self, executor):
+        start = time.monotonic()
+        results = executor.run({name: answer(name, 0.1) for name in ('openai', 'claude', 'groq')})
+
+        assert time.monotonic() - start < 0.25
+        assert list(results) == ['openai', 'claude', 'groq']
+        assert all(result['success'] for result in results.values())
+        assert results['groq']['response_time'] >= 0.1
+
+    def test_slow_provider_is_cut_at_its_deadline(self, executor):
+        start = time.monotonic()
+        results = executor.run({'openai': answer('rapide'), 'claude': answer('lent', 0.5)},
+                               provider_timeouts={'claude': 0.1})
+
+        assert time.monotonic() - start < 0.4
+        assert results['openai']['text'] == 'rapide'
+        assert results['claude']['timeout']
+        assert results['claude']['error'] == 'Délai dépassé (0.1s)'
+
+    def test_total_budget_caps_provider_timeouts(self, executor):
+        results = executor.run({'groq': answer('lent', 0.5)}, provider_timeouts={'groq': 10},
+                               total_timeout=0.1)
+        assert results['groq']['timeout']
+
+    def test_requested_budget_cannot_exceed_configuration(self):
+        executor = FanOutExecutor(max_workers=2, provider_timeout=10, total_timeout=0.1)
+        try:
+            results = executor.run({'groq': answer('lent', 0.5)}, total_timeout=60)
+        finally:
+            executor.shutdown()
+        assert results['groq']['timeout']
+
+    def test_exceptions_become_errors(self, executor):
+        def failing():
+            raise RuntimeError("clé API invalide")
+
+        results = executor.run({'openai': failing})
+        assert results['openai'] == {"success": False, "error": "clé API invalide", "provider": 'openai'}
+
+
+class TestStream:
+    def test_interleaves_chunks_and_summarizes(self, executor):
+        def chunks(*parts):
+            return lambda: iter(parts)
+
+        def broken():
+            yield 'début'
+            raise RuntimeError("connexion perdue")
+
+        events = list(executor.stream({'openai': chunks('Bon', 'jour'), 'groq': broken}))
+
+        deltas = [(event['provider'], event['text']) for event in events if event['type'] == 'delta']
+        assert [text for provider, text in deltas if provider == 'openai'] == ['Bon', 'jour']
+        assert {'type': 'done', 'provider': 'openai'} in events
+        assert {'type': 'error', 'provider': 'groq', 'error': 'connexion perdue'} in events
+
+        assert events[-1]['type'] == 'summary'
+        summary = events[-1]['summary']
+        assert summary['openai']['success'] and summary['openai']['chunks'] == 2
+        assert summary['openai']['characters'] == 7
+        assert summary['groq']['success'] is False
+
+    def test_error_chunk_is_reported_as_an_error(self, executor):
+        def failed():
+            yield 'Début'
+            yield f"{STREAM_ERROR_PREFIX}quota dépassé"
+
+        events = list(executor.stream({'groq': failed}))
+
+        assert [event for event in events if event['type'] == 'delta'] == [
+            {'type': 'delta', 'provider': 'groq', 'text': 'Début'}]
+        assert {'type': 'error', 'provider': 'groq', 'error': 'quota dépassé'} in events
+        assert {'type': 'done', 'provider': 'groq'} not in events
+        assert events[-1]['summary']['groq']['success'] is False
+        assert events[-1]['summary']['groq']['error'] == 'quota dépassé'
+
+    def test_failing_factory_is_reported_at_once(self, executor):
+        def unreachable():
+            raise ConnectionError("fournisseur injoignable")
+
+        start = time.monotonic()
+        events = list(executor.stream({'groq': unreachable}))
+
+        assert time.monotonic() - start < 0.5
+        assert events[0] == {'type': 'error', 'provider': 'groq', 'error': 'fournisseur injoignable'}
+
+    def test_timed_out_stream_is_closed(self, executor):
+        closed = threading.Event()
+
+        def slow():
+            try:
+                while True:
+                    time.sleep(0.05)
+                    yield '.'
+            finally:
+                closed.set()
+
+        start = time.monotonic()
+        events = list(executor.stream({'claude': slow}, provider_timeouts={'claude': 0.2}))
+
+        assert time.monotonic() - start < 0.5
+        assert [event['type'] for event in events][-2:] == ['timeout', 'summary']
+        assert events[-1]['summary']['claude']['timeout']
+        # Le producteur s'arrête au fragment suivant et ferme la connexion amont
+        assert closed.wait(1)
@@ -0,0 +1,67 @@
+import pytest
+
+from src.infrastructure.metrics import MetricsRegistry, bucket_quantile, latency_summary
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_by_labels(registry):
+    requests = registry.counter('requests_total', 'Requêtes', ('provider',))
+    requests.inc(provider='openai')
+    requests.inc(2, provider='openai')
+    requests.inc(provider='groq')
+
+    assert requests.value(provider='openai') == 3
+    assert requests.value(provider='claude') == 0
+    with pytest.raises(ValueError):
+        requests.inc(model='gpt-4o')
+
+
+def test_duplicate_name_is_rejected(registry):
+    registry.gauge('in_flight', 'En cours')
+    with pytest.raises(ValueError):
+        registry.counter('in_flight', 'En cours')
+
+
+def test_gauge_function_is_evaluated_at_render(registry):
+    queue_size = registry.gauge('queue_size', 'Taille de la file', ('queue',))
+    sizes = {('write_behind',): 3}
+    queue_size.set_function(lambda: sizes)
+    assert 'queue_size{queue="write_behind"} 3' in registry.render()
+
+    sizes[('write_behind',)] = 7
+    assert 'queue_size{queue="write_behind"} 7' in registry.render()
+
+
+def test_histogram_quantiles_and_render(registry):
+    latency = registry.histogram('latency_seconds', 'Latence', ('provider',), buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.2, 0.3, 0.4, 0.7):
+        latency.observe(value, provider='openai')
+
+    # Rang 2.5 sur 5 : milieu de l'intervalle ]0.1, 0.5] qui contient trois observations
+    assert latency.quantile(0.5, provider='openai') == pytest.approx(0.1 + 0.4 * 1.5 / 3)
+    assert latency.quantile(0.5, provider='groq') is None
+    assert latency.label_values() == [{'provider': 'openai'}]
+    assert latency_summary(latency)['openai']['p50'] == pytest.approx(0.3)
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{provider="openai",le="0.5"} 4' in text
+    assert 'latency_seconds_bucket{provider="openai",le="+Inf"} 5' in text
+    assert 'latency_seconds_count{provider="openai"} 5' in text
+
+
+def test_bucket_quantile_overflow():
+    buckets = (0.1, 1.0, float('inf'))
+    assert bucket_quantile(buckets, [0, 0, 0], 0.5) is None
+    # Centile tombant au-delà du dernier seuil fini : le seuil précédent
+    assert bucket_quantile(buckets, [1, 0, 9], 0.99) == 1.0
+
+
+def test_label_values_are_escaped(registry):
+    errors = registry.counter('errors_total', 'Erreurs', ('message',))
+    errors.inc(message='ligne "1"\nligne 2')
+    assert 'errors_total{message="ligne \\"1\\"\\nligne 2"} 1' in registry.render()
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from src.infrastructure.model_registry import ModelRegistry
+
+GROQ_MODELS = ['llama3-8b-8192', 'llama3-70b-8192', 'mixtral-8x7b-32768']
+
+
+def loader(*catalogs):
+    """Chargeur qui retourne les catalogues successifs (le dernier ensuite) et compte ses appels."""
+    calls = []
+
+    def load():
+        calls.append(1)
+        result = catalogs[min(len(calls), len(catalogs)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    load.calls = calls
+    return load
+
+
+def registry_with(load, **options):
+    registry = ModelRegistry(**options)
+    registry.register('groq', load)
+    return registry
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestValidate:
+    def test_known_and_unknown_models(self):
+        registry = registry_with(loader(GROQ_MODELS))
+        assert registry.refresh('groq')
+
+        assert registry.validate('groq', 'llama3-70b-8192') == {'valid': True, 'suggestions': []}
+        check = registry.validate('groq', 'llama3-8b-819')
+        assert not check['valid']
+        assert check['suggestions'][0] == 'llama3-8b-8192'
+        assert 'mixtral-8x7b-32768' not in check['suggestions']
+
+    def test_unloaded_catalog_accepts_any_model(self):
+        registry = registry_with(loader(RuntimeError("réseau indisponible")))
+        assert not registry.refresh('groq')
+        assert registry.validate('groq', 'modele-inconnu') == {'valid': True, 'suggestions': []}
+        assert registry.validate('openai', 'gpt-4o')['valid']
+
+    def test_too_old_catalog_accepts_any_model(self):
+        registry = registry_with(loader(GROQ_MODELS), ttl=3600, stale_ttl=7200)
+        registry.refresh('groq')
+        catalog = registry._catalogs['groq']
+        catalog.loaded_at -= 8000
+        # Échec récent simulé : pas de rafraîchissement en arrière-plan pendant le test
+        catalog.failed_at = time.monotonic()
+
+        # Le catalogue est toujours servi, mais ne suffit plus pour refuser un modèle
+        assert registry.models('groq') == sorted(GROQ_MODELS)
+        assert registry.validate('groq', 'nouveau-modele')['valid']
+
+
+class TestStaleWhileRevalidate:
+    def test_stale_catalog_is_served_while_refreshing(self):
+        release = threading.Event()
+        refreshed = GROQ_MODELS + ['llama-3.1-8b-instant']
+
+        def load():
+            load.calls.append(1)
+            if len(load.calls) > 1:
+                release.wait(5)
+                return refreshed
+            return GROQ_MODELS
+        load.calls = []
+
+        registry = registry_with(load, ttl=0.05)
+        registry.refresh('groq')
+        time.sleep(0.1)
+
+        # Lecture sans appel réseau : l'ancien catalogue, rafraîchi en arrière-plan
+        start = time.monotonic()
+        assert registry.models('groq') == sorted(GROQ_MODELS)
+        assert time.monotonic() - start < 0.05
+        assert registry.describe('groq')['stale']
+        # Un seul rafraîchissement à la fois
+        registry.models('groq')
+        assert len(load.calls) == 2
+
+        release.set()
+        assert wait_until(lambda: registry.models('groq') == sorted(refreshed))
+        assert not registry.describe('groq')['stale']
+
+    def test_failed_refresh_keeps_the_previous_catalog(self):
+        load = loader(GROQ_MODELS, RuntimeError("erreur 503"))
+        registry = registry_with(load, ttl=0.05)
+        registry.refresh('groq')
+        time.sleep(0.1)
+
+        registry.models('groq')
+        assert wait_until(lambda: registry.describe('groq')['error'] == 'erreur 503')
+        assert registry.models('groq') == sorted(GROQ_MODELS)
+        assert not registry.validate('groq', 'inconnu')['valid']
+        # Après un échec, le fournisseur n'est pas sollicité à chaque lecture
+        registry.models('groq')
+        time.sleep(0.05)
+        assert len(load.calls) == 2
+
+    def test_empty_catalog_is_a_failure(self):
+        registry = registry_with(loader(GROQ_MODELS, []))
+        registry.refresh('groq')
+        assert not registry.refresh('groq')
+        assert registry.describe('groq')['error'] == 'catalogue vide'
+        assert registry.models('groq') == sorted(GROQ_MODELS)
+
+
+def test_background_loading():
+    registry = registry_with(loader(GROQ_MODELS), ttl=3600)
+    assert registry.describe('groq')['loaded'] is False
+    registry.start()
+    try:
+        assert wait_until(lambda: registry.describe('groq')['loaded'])
+    finally:
+        registry.stop()
+    assert registry.describe('groq')['loaded_at'] is not None
@@ -0,0 +1,178 @@
+import threading
+import time
+
+import pytest
+
+from src.infrastructure.rate_limiter import (AdaptiveLimiter, RateLimitGovernor, RateLimitTimeout, TokenBucket,
+                                             parse_rate_limit_headers)
+
+
+class TestTokenBucket:
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2.0, capacity=2.0)
+        now = time.monotonic()
+
+        assert bucket.try_take(now)
+        assert bucket.try_take(now)
+        assert not bucket.try_take(now)
+        assert bucket.wait_time(now) == pytest.approx(0.5)
+        assert bucket.try_take(now + 0.5)
+        # Les jetons ne s'accumulent pas au-delà de la capacité
+        assert bucket.wait_time(now + 60) == 0.0
+        assert bucket.try_take(now + 60) and bucket.try_take(now + 60)
+        assert not bucket.try_take(now + 60)
+
+    def test_zero_rate_disables_limit(self):
+        bucket = TokenBucket(rate=0.0)
+        assert all(bucket.try_take(time.monotonic()) for _ in range(100))
+        assert bucket.wait_time(time.monotonic()) == 0.0
+
+    def test_set_rate_keeps_tokens(self):
+        bucket = TokenBucket(rate=1.0, capacity=5.0)
+        now = time.monotonic()
+        bucket.try_take(now)
+        bucket.set_rate(10.0, now)
+        assert bucket.tokens == pytest.approx(4.0)
+        assert bucket.rate == 10.0
+
+
+class TestAdaptiveLimiter:
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter('openai/gpt-4o', initial_concurrency=4, max_concurrency=8)
+
+        limiter.on_success({})
+        assert limiter.concurrency == pytest.approx(4.25)
+        for _ in range(100):
+            limiter.on_success({})
+        assert limiter.concurrency == 8
+
+        limiter.on_throttle({'retry_after': 2.0})
+        assert limiter.concurrency == 4
+        assert limiter.paused_until - time.monotonic() == pytest.approx(2.0, abs=0.1)
+        assert limiter.stats()['throttled'] == 1
+        for _ in range(5):
+            limiter.on_throttle({})
+        assert limiter.concurrency == 1
+
+    def test_throttle_halves_rate(self):
+        limiter = AdaptiveLimiter('groq/llama3-8b-8192', rate=10.0)
+        limiter.on_throttle({'retry_after': 0})
+        assert limiter.bucket.rate == pytest.approx(5.0)
+
+    def test_low_quota_paces_requests(self):
+        limiter = AdaptiveLimiter('openai/gpt-4o')
+        limiter.on_success({'requests_limit': 100, 'requests_remaining': 5, 'requests_reset': 10.0})
+        assert limiter.bucket.rate == pytest.approx(0.5)
+
+        # Quota épuisé : pause jusqu'à sa réinitialisation
+        limiter.on_success({'requests_limit': 100, 'requests_remaining': 0, 'requests_reset': 3.0})
+        assert limiter.paused_until - time.monotonic() == pytest.approx(3.0, abs=0.1)
+
+    def test_concurrency_limit_and_queue_timeout(self):
+        limiter = AdaptiveLimiter('claude/claude-3-5-sonnet-20241022', initial_concurrency=1)
+        lease = limiter.acquire()
+
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire(timeout=0.05)
+        assert limiter.stats()['timeouts'] == 1
+
+        lease.release()
+        lease.release()
+        assert limiter.in_flight == 0
+        limiter.acquire(timeout=0.05).release()
+
+    def test_waiters_are_admitted_in_arrival_order(self):
+        limiter = AdaptiveLimiter('groq/llama3-70b-8192', initial_concurrency=1)
+        lease = limiter.acquire()
+        order = []
+
+        def wait_turn(name):
+            admitted = limiter.acquire(timeout=5)
+            order.append(name)
+            admitted.release()
+
+        threads = []
+        for name in ('premier', 'deuxième', 'troisième'):
+            thread = threading.Thread(target=wait_turn, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Laisser chaque thread prendre sa place dans la file
+            while len(limiter._waiters) < len(threads):
+                time.sleep(0.001)
+
+        lease.release()
+        for thread in threads:
+            thread.join(5)
+        assert order == ['premier', 'deuxième', 'troisième']
+
+
+class FakeRaw:
+    def __init__(self, value, headers):
+        self.value = value
+        self.headers = headers
+
+    def parse(self):
+        return self.value
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+    class response:
+        headers = {'retry-after': '0.5'}
+
+
+class TestGovernor:
+    def test_session_observes_headers_and_releases(self):
+        governor = RateLimitGovernor(initial_concurrency=2, max_concurrency=4)
+        send = lambda: FakeRaw('réponse', {'x-ratelimit-remaining-requests': '42'})
+        with governor.session('openai', 'gpt-4o', send) as value:
+            assert value == 'réponse'
+            assert governor.stats()['openai/gpt-4o']['in_flight'] == 1
+
+        stats = governor.stats()['openai/gpt-4o']
+        assert stats['in_flight'] == 0
+        assert stats['requests_remaining'] == 42
+
+    def test_session_throttles_on_429(self):
+        governor = RateLimitGovernor(initial_concurrency=4)
+
+        def send():
+            raise ThrottledError()
+
+        with pytest.raises(ThrottledError):
+            with governor.session('groq', 'llama3-8b-8192', send):
+                pass
+        stats = governor.stats()['groq/llama3-8b-8192']
+        assert stats['throttled'] == 1
+        assert stats['concurrency_limit'] == 2
+        assert 0 < stats['paused_for'] <= 0.5
+
+
+class TestHeaders:
+    def test_openai_headers(self):
+        quota = parse_rate_limit_headers({
+            'x-ratelimit-limit-requests': '500', 'x-ratelimit-remaining-requests': '499',
+            'x-ratelimit-reset-requests': '120ms', 'x-ratelimit-reset-tokens': '6m0s',
+            'retry-after-ms': '1500',
+        })
+        assert quota['requests_limit'] == 500
+        assert quota['requests_remaining'] == 499
+        assert quota['requests_reset'] == pytest.approx(0.12)
+        assert quota['tokens_reset'] == pytest.approx(360)
+        assert quota['retry_after'] == pytest.approx(1.5)
+
+    def test_anthropic_headers(self):
+        quota = parse_rate_limit_headers({
+            'anthropic-ratelimit-requests-limit': '50', 'anthropic-ratelimit-requests-remaining': '0',
+            'anthropic-ratelimit-requests-reset': '2000-01-01T00:00:00Z', 'retry-after': '7',
+        })
+        assert quota['requests_limit'] == 50
+        assert quota['requests_remaining'] == 0
+        # Date de réinitialisation passée : aucune attente
+        assert quota['requests_reset'] == 0.0
+        assert quota['retry_after'] == 7.0
+
+    def test_missing_headers(self):
+        assert parse_rate_limit_headers(None) == {}
+        assert parse_rate_limit_headers({})['retry_after'] is None
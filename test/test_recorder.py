@@ -0,0 +1,117 @@
+import pytest
+
+from src.application.fan_out import FanOutExecutor
+from src.application.recorder import STREAM_ERROR_PREFIX, RequestRecorder
+
+
+class RecordingQueue:
+    """File d'écriture qui garde les enregistrements soumis."""
+
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+        return True
+
+
+@pytest.fixture
+def queue():
+    return RecordingQueue()
+
+
+@pytest.fixture
+def recorder(queue):
+    return RequestRecorder(queue)
+
+
+class TestCall:
+    def test_result_is_recorded_and_returned(self, recorder, queue):
+        result = {'success': True, 'text': 'Bonjour', 'model': 'gpt-4o-2024-08-06',
+                  'usage': {'prompt_tokens': 5, 'completion_tokens': 2, 'cost': 0.0001}}
+
+        assert recorder.call('/api/chat', 'Salut', 'openai', 'gpt-4o', lambda: result) is result
+
+        record, = queue.records
+        assert record['endpoint'] == '/api/chat'
+        assert record['model_used'] == 'openai'
+        assert record['response_success'] is True
+        response, = record['responses']
+        # Modèle effectivement servi par le fournisseur, plutôt que l'alias demandé
+        assert response['model'] == 'gpt-4o-2024-08-06'
+        assert response['prompt_tokens'] == 5 and response['cost'] == 0.0001
+        assert response['response_time'] >= 0
+
+    def test_failure_keeps_its_error(self, recorder, queue):
+        recorder.call('/api/groq', 'Salut', 'groq', 'llama3-8b-8192',
+                      lambda: {'success': False, 'error': 'quota dépassé'})
+        response, = queue.records[0]['responses']
+        assert response['success'] is False
+        assert response['error_message'] == 'quota dépassé'
+        assert queue.records[0]['response_success'] is False
+
+    def test_nothing_recorded_without_queue_or_prompt(self, recorder, queue):
+        assert not RequestRecorder().record('/api/chat', 'Salut', [])
+        assert not recorder.record('/api/chat', '', [])
+        assert queue.records == []
+
+
+class TestStream:
+    def test_completed_stream(self, recorder, queue):
+        usage = {}
+
+        def chunks():
+            yield 'Bon'
+            usage.update({'completion_tokens': 2})
+            yield 'jour'
+
+        assert list(recorder.stream('/api/groq/stream', 'Salut', 'groq', 'llama3-8b-8192', chunks(), usage)) == \
+            ['Bon', 'jour']
+
+        response, = queue.records[0]['responses']
+        assert response['response_text'] == 'Bonjour'
+        assert response['success'] is True
+        assert response['completion_tokens'] == 2
+        assert response['time_to_first_token'] is not None
+
+    def test_error_chunk_marks_the_stream_failed(self, recorder, queue):
+        chunks = iter(['Début', f'{STREAM_ERROR_PREFIX}connexion perdue'])
+        list(recorder.stream('/api/claude/stream', 'Salut', 'claude', 'claude-3-5-sonnet-20241022', chunks))
+
+        response, = queue.records[0]['responses']
+        assert response['success'] is False
+        assert response['response_text'] == 'Début'
+        assert response['error_message'] == 'connexion perdue'
+
+    def test_abandoned_stream_records_what_was_received(self, recorder, queue):
+        stream = recorder.stream('/api/groq/stream', 'Salut', 'groq', 'llama3-8b-8192',
+                                 iter(['Bon', 'jour', ' à tous']))
+        assert next(stream) == 'Bon'
+        stream.close()
+
+        response, = queue.records[0]['responses']
+        assert response['response_text'] == 'Bon'
+        assert response['error_message'] == 'Flux interrompu'
+
+
+def test_compare_stream_records_one_response_per_provider(recorder, queue):
+    executor = FanOutExecutor(max_workers=4, provider_timeout=2.0, total_timeout=2.0)
+    try:
+        events = executor.stream({'openai': lambda: iter(['Bon', 'jour']),
+                                  'groq': lambda: iter([f'{STREAM_ERROR_PREFIX}quota dépassé'])})
+        skipped = {'claude': {'success': False, 'error': 'Claude indisponible (disjoncteur ouvert)'}}
+        relayed = list(recorder.compare_stream('/api/compare/stream', 'Comparer', events,
+                                               {'openai': 'gpt-4o', 'groq': 'llama3-8b-8192'},
+                                               {'openai': {'completion_tokens': 2}}, skipped))
+    finally:
+        executor.shutdown()
+
+    assert relayed[-1]['type'] == 'summary'
+    record, = queue.records
+    assert record['model_used'] == 'compare'
+    responses = {response['provider']: response for response in record['responses']}
+    assert responses['openai']['response_text'] == 'Bonjour'
+    assert responses['openai']['completion_tokens'] == 2
+    assert responses['groq']['error_message'] == 'quota dépassé'
+    assert responses['claude']['error_message'] == 'Claude indisponible (disjoncteur ouvert)'
+    assert record['response_success'] is True
@@ -0,0 +1,194 @@
+import time
+from contextlib import nullcontext
+
+import pytest
+
+from src.infrastructure.rate_limiter import RateLimitTimeout
+from src.infrastructure.resilience import (CircuitBreaker, CircuitOpenError, LatencyTracker, ResilienceLayer,
+                                           classify_error)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type('Response', (), {'headers': headers or {}})()
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class Attempts:
+    """Ouvre successivement les réponses (ou lève les erreurs) prévues."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return nullcontext(outcome)
+
+
+@pytest.fixture
+def layer(monkeypatch):
+    # Pas d'attente réelle entre deux essais
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    return ResilienceLayer(max_attempts=3, base_delay=0.01, max_delay=0.05, hedging=False,
+                           failure_threshold=3, recovery_timeout=60)
+
+
+@pytest.mark.parametrize('error, kind', [
+    (StatusError(429), 'rate_limit'),
+    (StatusError(503), 'server'),
+    (StatusError(408), 'server'),
+    (StatusError(400), 'client'),
+    (APITimeoutError(), 'timeout'),
+    (APIConnectionError(), 'connection'),
+    (RateLimitTimeout(), 'client'),
+    (CircuitOpenError(), 'client'),
+    (KeyError('choices'), 'unknown'),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_then_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.is_open()
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        # Semi-ouvert : un seul appel d'essai
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow() and breaker.allow()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.is_open()
+        assert breaker.trips == 2
+
+    def test_released_probe_allows_another(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.release_probe()
+        assert breaker.allow()
+
+
+class TestSession:
+    def test_transient_error_is_retried(self, layer):
+        attempts = Attempts(StatusError(503), APIConnectionError(), 'réponse')
+        with layer.session('openai', attempts) as response:
+            assert response == 'réponse'
+
+        stats = layer.stats()['openai']
+        assert attempts.calls == 3
+        assert stats['retries'] == 2
+        # Le succès remet à zéro les échecs consécutifs du disjoncteur
+        assert stats['circuit'] == 'closed'
+
+    def test_client_error_is_not_retried_nor_counted(self, layer):
+        for _ in range(3):
+            attempts = Attempts(StatusError(400))
+            with pytest.raises(StatusError):
+                with layer.session('claude', attempts):
+                    pass
+            assert attempts.calls == 1
+        assert layer.is_available('claude')
+        assert layer.stats()['claude']['failures'] == 0
+
+    def test_unknown_error_does_not_open_breaker(self, layer):
+        for _ in range(3):
+            with pytest.raises(KeyError):
+                with layer.session('groq', Attempts(KeyError('choices'))):
+                    pass
+        assert layer.is_available('groq')
+
+    def test_rate_limit_retried_without_opening_breaker(self, layer):
+        attempts = Attempts(StatusError(429), StatusError(429), StatusError(429))
+        with pytest.raises(StatusError):
+            with layer.session('openai', attempts):
+                pass
+        assert attempts.calls == 3
+        assert layer.is_available('openai')
+
+    def test_open_breaker_rejects_calls(self, layer):
+        with pytest.raises(StatusError):
+            with layer.session('groq', Attempts(StatusError(500), StatusError(500), StatusError(500))):
+                pass
+        assert not layer.is_available('groq')
+
+        attempts = Attempts('réponse')
+        with pytest.raises(CircuitOpenError):
+            with layer.session('groq', attempts):
+                pass
+        assert attempts.calls == 0
+        assert layer.stats()['groq']['rejected'] == 1
+        assert layer.stats()['groq']['circuit_trips'] == 1
+
+
+class TestBackoff:
+    def test_exponential_and_capped(self):
+        layer = ResilienceLayer(base_delay=0.5, max_delay=4, hedging=False)
+        for attempt, ceiling in [(1, 0.5), (2, 1.0), (3, 2.0), (4, 4.0), (8, 4.0)]:
+            delays = [layer._backoff(attempt, StatusError(503)) for _ in range(200)]
+            assert all(0 <= delay <= ceiling for delay in delays)
+            # Jitter complet : les délais sont répartis sur tout l'intervalle
+            assert max(delays) > ceiling / 2
+
+    def test_honours_retry_after(self):
+        layer = ResilienceLayer(base_delay=0.1, max_delay=8, hedging=False)
+        assert layer._backoff(1, StatusError(429, {'retry-after': '3'})) >= 3
+        # Plafonné par le délai maximum
+        assert layer._backoff(1, StatusError(429, {'retry-after': '120'})) == 8
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker(size=100)
+    assert tracker.percentile(95) is None
+    for value in range(1, 101):
+        tracker.record(value / 100)
+    assert tracker.percentile(50) == pytest.approx(0.51)
+    assert tracker.percentile(95) == pytest.approx(0.96)
+    assert tracker.percentile(95, min_samples=101) is None
+
+
+def test_hedged_request_returns_fastest_response():
+    layer = ResilienceLayer(hedging=True, hedge_percentile=50, failure_threshold=5)
+    layer.hedge_min_samples = 1
+    layer.breaker('openai')
+    layer._latencies['openai'].record(0.01)
+
+    delays = [0.5, 0.0]
+
+    def attempt():
+        time.sleep(delays.pop(0))
+        return nullcontext('réponse')
+
+    start = time.monotonic()
+    with layer.session('openai', attempt) as response:
+        assert response == 'réponse'
+    assert time.monotonic() - start < 0.4
+    assert layer.stats()['openai']['hedges'] == 1
+    assert layer.stats()['openai']['hedge_wins'] == 1
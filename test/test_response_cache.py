@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from src.infrastructure.response_cache import LRUCache, ResponseCache, SQLiteCacheTier
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        assert cache.get('a') == 'A'
+        cache.set('c', 'C')
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A' and cache.get('c') == 'C'
+        assert cache.stats() == {'entries': 2, 'bytes': 2, 'evictions': 1}
+
+    def test_byte_limit(self):
+        cache = LRUCache(max_entries=100, max_bytes=10)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'é' * 3)
+        # 6 + 6 octets : la plus ancienne entrée est évincée
+        assert cache.get('a') is None
+        assert cache.stats()['bytes'] == 6
+
+        # Une valeur plus grande que le cache entier n'est pas conservée
+        cache.set('c', 'x' * 11)
+        assert cache.get('c') is None
+        assert cache.get('b') == 'ééé'
+
+    def test_expiration(self):
+        cache = LRUCache(ttl=60)
+        cache.set('court', 'valeur', ttl=0.05)
+        cache.set('long', 'valeur')
+        time.sleep(0.06)
+        assert cache.get('court') is None
+        assert cache.get('long') == 'valeur'
+        assert cache.stats()['entries'] == 1
+
+    def test_replacing_a_value_updates_size(self):
+        cache = LRUCache()
+        cache.set('a', 'xxxx')
+        cache.set('a', 'xx')
+        assert cache.stats()['bytes'] == 2
+
+
+class TestSQLiteCacheTier:
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / 'cache' / 'responses.db')
+        SQLiteCacheTier(path).set('clé', 'réponse')
+        assert SQLiteCacheTier(path).get('clé') == 'réponse'
+
+    def test_expired_entries_are_ignored(self, tmp_path):
+        tier = SQLiteCacheTier(str(tmp_path / 'responses.db'))
+        tier.set('clé', 'réponse', ttl=-1)
+        assert tier.get('clé') is None
+
+    def test_reads_are_flushed_in_batches(self, tmp_path):
+        tier = SQLiteCacheTier(str(tmp_path / 'responses.db'), touch_batch=3, touch_interval=3600)
+        for key in ('a', 'b', 'c'):
+            tier.set(key, key.upper())
+
+        tier.get('a')
+        tier.get('b')
+        assert set(tier._touched) == {'a', 'b'}
+        tier.get('c')
+        assert tier._touched == {}
+
+    def test_reads_are_flushed_with_next_write(self, tmp_path):
+        tier = SQLiteCacheTier(str(tmp_path / 'responses.db'), touch_batch=100, touch_interval=3600)
+        tier.set('a', 'A')
+        tier.get('a')
+        assert 'a' in tier._touched
+        tier.set('b', 'B')
+        assert tier._touched == {}
+
+
+class TestResponseCache:
+    @pytest.fixture(autouse=True)
+    def no_persistent_path(self, monkeypatch):
+        monkeypatch.delenv('RESPONSE_CACHE_PATH', raising=False)
+
+    def test_key_covers_every_parameter(self):
+        key = ResponseCache.make_key('openai', 'gpt-4o', 'Tu es utile', {'temperature': 0.7}, 'Bonjour')
+        assert key == ResponseCache.make_key('openai', 'gpt-4o', 'Tu es utile', {'temperature': 0.7}, 'Bonjour')
+        for other in (('groq', 'gpt-4o', 'Tu es utile', {'temperature': 0.7}, 'Bonjour'),
+                      ('openai', 'gpt-4o-mini', 'Tu es utile', {'temperature': 0.7}, 'Bonjour'),
+                      ('openai', 'gpt-4o', 'Tu es utile', {'temperature': 0.2}, 'Bonjour'),
+                      ('openai', 'gpt-4o', 'Tu es utile', {'temperature': 0.7}, 'Bonsoir')):
+            assert ResponseCache.make_key(*other) != key
+
+    def test_memory_hits_and_misses(self):
+        cache = ResponseCache(max_entries=10)
+        assert cache.get('clé') is None
+        cache.set('clé', 'réponse')
+        assert cache.get('clé') == 'réponse'
+
+        stats = cache.stats()
+        assert stats['hits'] == stats['memory_hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 50
+        assert 'persistent' not in stats
+
+    def test_persistent_hit_is_promoted_to_memory(self, tmp_path):
+        path = str(tmp_path / 'responses.db')
+        ResponseCache(persistent_path=path).set('clé', 'réponse')
+
+        # Nouveau processus : mémoire vide, réponse retrouvée sur disque
+        cache = ResponseCache(persistent_path=path)
+        assert cache.get('clé') == 'réponse'
+        assert cache.get('clé') == 'réponse'
+        stats = cache.stats()
+        assert stats['persistent_hits'] == 1
+        assert stats['memory_hits'] == 1
+        assert stats['persistent']['entries'] == 1
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from src.application.router import ModelRouter, RouteCandidate
+
+
+def candidate(provider, model, delay=0.0, success=True, cost=1.0, cached=False, calls=None):
+    def generate(prompt, use_cache):
+        if calls is not None:
+            calls.append(f"{provider}/{model}")
+        time.sleep(delay)
+        if not success:
+            return {"success": False, "error": f"{provider} en panne"}
+        usage = {"cached": True} if cached else {"cost": 0.001}
+        return {"success": True, "text": f"{provider} répond", "usage": usage}
+    return RouteCandidate(provider, model, generate, cost=cost)
+
+
+def router_for(*candidates, **options):
+    options.setdefault('exploration', 0)
+    options.setdefault('alpha', 1.0)
+    return ModelRouter(list(candidates), **options)
+
+
+class TestRanking:
+    def test_fastest_prefers_lowest_latency(self):
+        slow, fast = candidate('openai', 'gpt-4o', delay=0.05), candidate('groq', 'llama3-8b-8192')
+        router = router_for(slow, fast)
+        # Candidats jamais essayés : évalués dans l'ordre de la chaîne
+        assert [c.name for c in router.rank('fastest')] == ['openai/gpt-4o', 'groq/llama3-8b-8192']
+
+        for item in (slow, fast):
+            router._call(item, 'prompt', True)
+        assert [c.name for c in router.rank('fastest')] == ['groq/llama3-8b-8192', 'openai/gpt-4o']
+
+    def test_errors_penalize_latency(self):
+        flaky, steady = candidate('groq', 'llama3-8b-8192'), candidate('openai', 'gpt-4o')
+        router = router_for(flaky, steady, alpha=0.5)
+        router._stats[flaky.name].record(0.010, True)
+        router._stats[steady.name].record(0.015, True)
+        assert router.rank('fastest')[0] is flaky
+
+        # Taux d'erreur 0.5 : la latence apparente du candidat instable double
+        router._stats[flaky.name].record(0.010, False)
+        assert router.rank('fastest')[0] is steady
+        assert router.stats()[flaky.name]['error_rate'] == 0.5
+
+    def test_cheapest_excludes_unpriced_models(self):
+        expensive = candidate('openai', 'gpt-4o', cost=6.25)
+        cheap = candidate('groq', 'llama3-8b-8192', cost=0.065)
+        unpriced = candidate('groq', 'nouveau-modele', cost=None)
+        router = router_for(expensive, unpriced, cheap)
+        assert router.rank('cheapest') == [cheap, expensive]
+        assert unpriced in router.rank('fallback')
+
+    def test_unavailable_candidates_are_skipped(self):
+        first, second = candidate('openai', 'gpt-4o'), candidate('claude', 'claude-3-5-sonnet-20241022')
+        router = router_for(first, second, is_available=lambda c: c.provider != 'openai')
+        assert router.rank('fallback') == [second]
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            router_for(candidate('openai', 'gpt-4o')).rank('random')
+
+
+class TestRoute:
+    def test_falls_back_after_failure(self):
+        calls = []
+        router = router_for(candidate('openai', 'gpt-4o', success=False, calls=calls),
+                            candidate('groq', 'llama3-8b-8192', calls=calls))
+
+        result = router.route('prompt', policy='fallback')
+
+        assert result['success']
+        assert result['provider'] == 'groq'
+        assert result['model'] == 'llama3-8b-8192'
+        assert [attempt['success'] for attempt in result['routing']['attempts']] == [False, True]
+        assert calls == ['openai/gpt-4o', 'groq/llama3-8b-8192']
+
+    def test_attempts_are_bounded(self):
+        router = router_for(*[candidate('groq', f'modele-{index}', success=False) for index in range(5)],
+                            max_attempts=2)
+        result = router.route('prompt', policy='fallback')
+        assert not result['success']
+        assert len(result['routing']['attempts']) == 2
+
+    def test_no_candidate_available(self):
+        router = router_for(candidate('openai', 'gpt-4o'), is_available=lambda c: False)
+        result = router.route('prompt')
+        assert not result['success']
+        assert result['routing']['attempts'] == []
+
+    def test_best_of_n_keeps_first_success(self):
+        router = router_for(candidate('openai', 'gpt-4o', delay=0.3),
+                            candidate('groq', 'llama3-8b-8192', delay=0.01), best_of=2)
+        start = time.monotonic()
+        result = router.route('prompt', policy='best_of_n')
+
+        assert time.monotonic() - start < 0.25
+        assert result['provider'] == 'groq'
+        # Seule la tentative terminée figure dans le détail ; la perdante nourrit l'EWMA plus tard
+        assert [attempt['provider'] for attempt in result['routing']['attempts']] == ['groq']
+        time.sleep(0.35)
+        assert router.stats()['openai/gpt-4o']['requests'] == 1
+
+    def test_best_of_n_falls_back_when_all_fail(self):
+        router = router_for(candidate('openai', 'gpt-4o', success=False),
+                            candidate('claude', 'claude-3-5-sonnet-20241022', success=False),
+                            candidate('groq', 'llama3-8b-8192'), best_of=2, max_attempts=3)
+        result = router.route('prompt', policy='best_of_n')
+        assert result['provider'] == 'groq'
+        assert len(result['routing']['attempts']) == 3
+
+    def test_best_of_n_timeout(self):
+        router = router_for(candidate('openai', 'gpt-4o', delay=0.3), best_of=1, timeout=0.05)
+        result = router.route('prompt', policy='best_of_n')
+        assert not result['success']
+        assert result['timeout']
+
+    def test_cached_answers_do_not_feed_ewma(self):
+        router = router_for(candidate('openai', 'gpt-4o', cached=True))
+        assert router.route('prompt', policy='fallback')['success']
+        assert router.stats()['openai/gpt-4o']['requests'] == 0
+        assert router.stats()['openai/gpt-4o']['latency_ewma'] is None
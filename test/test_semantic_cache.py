@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+# Extra optionnel « semantic »
+np = pytest.importorskip('numpy')
+
+from src.infrastructure.semantic_cache import SemanticCache, VectorIndex  # noqa: E402
+
+QUESTION = 'Quelle est la capitale de la France ?'
+ANSWER = {'success': True, 'text': 'Paris'}
+
+
+def cache(**options):
+    options.setdefault('threshold', 0.92)
+    options.setdefault('capacity', 100)
+    options.setdefault('dim', 1024)
+    options.setdefault('nlist', 0)
+    return SemanticCache(**options)
+
+
+class TestLookup:
+    def test_near_identical_prompt_hits(self):
+        semantic = cache()
+        semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+
+        match = semantic.lookup('openai', 'gpt-4o', 'quelle est la capitale de la france')
+
+        assert match['response'] == ANSWER
+        assert match['matched_prompt'] == QUESTION
+        assert match['score'] == pytest.approx(1.0, abs=1e-5)
+        assert semantic.stats()['hits'] == 1
+
+    def test_unrelated_prompt_misses(self):
+        semantic = cache()
+        semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+
+        assert semantic.lookup('openai', 'gpt-4o', 'Comment cuire des pâtes ?') is None
+        assert semantic.stats()['misses'] == 1
+
+    def test_answers_are_partitioned_by_model(self):
+        semantic = cache()
+        semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+
+        assert semantic.lookup('groq', 'llama3-8b-8192', QUESTION) is None
+        assert semantic.lookup('openai', 'gpt-4o-mini', QUESTION) is None
+
+    def test_threshold_decides_paraphrases(self):
+        paraphrase = 'Quelle est la capitale de la France actuellement ?'
+        strict, lenient = cache(threshold=0.95), cache(threshold=0.8)
+        for semantic in (strict, lenient):
+            semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+        score = lenient.probe(paraphrase)[0]['score']
+
+        assert 0.8 <= score < 0.95
+        assert strict.lookup('openai', 'gpt-4o', paraphrase) is None
+        assert lenient.lookup('openai', 'gpt-4o', paraphrase)['score'] == pytest.approx(score)
+
+
+class TestExpiry:
+    def test_expired_answer_is_not_served(self):
+        semantic = cache(ttl=0.05)
+        semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+        assert semantic.lookup('openai', 'gpt-4o', QUESTION) is not None
+
+        time.sleep(0.1)
+
+        assert semantic.lookup('openai', 'gpt-4o', QUESTION) is None
+        assert semantic.probe(QUESTION) == []
+        assert semantic.stats()['entries'] == 0
+
+    def test_oldest_answer_is_evicted_when_full(self):
+        semantic = cache(capacity=2)
+        prompts = [QUESTION, 'Comment cuire des pâtes ?', 'Combien de pattes a une araignée ?']
+        for prompt in prompts:
+            semantic.store('openai', 'gpt-4o', prompt, {'success': True, 'text': prompt})
+
+        assert semantic.lookup('openai', 'gpt-4o', QUESTION) is None
+        assert semantic.lookup('openai', 'gpt-4o', prompts[2])['response']['text'] == prompts[2]
+        stats = semantic.stats()
+        assert stats['evictions'] == 1
+        assert stats['entries'] == 2
+
+    def test_expired_slot_reuse_is_not_an_eviction(self):
+        semantic = cache(capacity=1, ttl=0.05)
+        semantic.store('openai', 'gpt-4o', QUESTION, ANSWER)
+        time.sleep(0.1)
+        semantic.store('openai', 'gpt-4o', 'Comment cuire des pâtes ?', ANSWER)
+        assert semantic.stats()['evictions'] == 0
+
+
+class TestVectorIndex:
+    @staticmethod
+    def vectors(count, dim=32):
+        data = np.random.default_rng(1).normal(size=(count, dim)).astype(np.float32)
+        return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+    def test_ivf_search_finds_indexed_vectors(self):
+        data = self.vectors(60)
+        index = VectorIndex(32, capacity=100, nlist=4, nprobe=4, train_size=20)
+        for vector in data:
+            index.add(vector, namespace=0)
+
+        assert index.centroids is not None
+        assert sum(len(slots) for slots in index.lists) == 60
+        # Toutes les partitions sondées : même résultat qu'une recherche exacte
+        for slot in (0, 25, 59):
+            best, score = index.search(data[slot], k=1)[0]
+            assert best == slot
+            assert score == pytest.approx(1.0, abs=1e-5)
+
+    def test_replaced_slots_leave_their_ivf_list(self):
+        data = self.vectors(30)
+        index = VectorIndex(32, capacity=10, nlist=2, nprobe=2, train_size=10)
+        for vector in data:
+            index.add(vector, namespace=0)
+
+        assert sorted(slot for slots in index.lists for slot in slots) == list(range(10))
+        assert index.search(data[0], k=1)[0][1] < 0.99
+        assert index.search(data[29], k=1)[0][0] == 9
@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from src.application.recorder import STREAM_ERROR_PREFIX
+from src.application.single_flight import SharedStreams, SingleFlight
+
+
+def wait_for_waiters(group, count):
+    """Bloque l'appel amont tant que toutes les requêtes identiques ne l'ont pas rejoint."""
+    deadline = time.monotonic() + 5
+    while group.stats()['coalesced'] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+class TestSingleFlight:
+    def test_identical_calls_share_one_upstream_call(self):
+        group = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            wait_for_waiters(group, 4)
+            return {"success": True, "text": "réponse"}
+
+        def request():
+            return group.do(('openai', 'gpt-4o', 'Bonjour'), fetch)
+
+        results, errors = run_concurrently(5, request)
+
+        assert errors == [None] * 5
+        assert len(calls) == 1
+        assert [shared for _, shared in results].count(False) == 1
+        assert all(result == {"success": True, "text": "réponse"} for result, _ in results)
+        assert group.stats() == {'calls': 1, 'coalesced': 4, 'in_flight': 0}
+
+    def test_errors_reach_every_waiter(self):
+        group = SingleFlight()
+
+        def fetch():
+            wait_for_waiters(group, 2)
+            raise RuntimeError("fournisseur indisponible")
+
+        _, errors = run_concurrently(3, lambda: group.do('clé', fetch))
+
+        assert all(isinstance(error, RuntimeError) for error in errors)
+        assert group.stats()['calls'] == 1
+
+    def test_key_is_released_after_the_call(self):
+        group = SingleFlight()
+        assert group.do('clé', lambda: 1) == (1, False)
+        assert group.do('clé', lambda: 2) == (2, False)
+
+
+class TestSharedStreams:
+    def test_late_subscriber_replays_earlier_chunks(self):
+        streams = SharedStreams(idle_timeout=5)
+        started = threading.Event()
+        release = threading.Event()
+
+        def upstream():
+            yield 'Bon'
+            started.set()
+            release.wait(5)
+            yield 'jour'
+
+        first = streams.subscribe('clé', upstream)
+        assert next(first) == 'Bon'
+        assert started.wait(5)
+        second = streams.subscribe('clé', lambda: pytest.fail("flux amont démarré deux fois"))
+        release.set()
+
+        assert list(first) == ['jour']
+        assert list(second) == ['Bon', 'jour']
+        assert streams.stats() == {'streams': 1, 'attached': 1, 'abandoned': 0, 'in_flight': 0}
+
+    def test_upstream_error_is_raised_to_subscribers(self):
+        streams = SharedStreams(idle_timeout=5)
+
+        def upstream():
+            yield 'début'
+            raise RuntimeError("connexion perdue")
+
+        chunks = []
+        with pytest.raises(RuntimeError):
+            for chunk in streams.subscribe('clé', upstream):
+                chunks.append(chunk)
+        assert chunks == ['début']
+
+    def test_idle_stream_ends_with_an_error_chunk(self):
+        streams = SharedStreams(idle_timeout=0.05)
+        release = threading.Event()
+
+        def upstream():
+            release.wait(5)
+            yield 'trop tard'
+
+        start = time.monotonic()
+        chunks = list(streams.subscribe('clé', upstream))
+        release.set()
+
+        assert time.monotonic() - start < 1
+        assert len(chunks) == 1
+        assert chunks[0].startswith(STREAM_ERROR_PREFIX)
+        assert 'Délai dépassé' in chunks[0]
+
+    def test_last_subscriber_leaving_closes_the_upstream(self):
+        streams = SharedStreams(idle_timeout=5)
+        closed = threading.Event()
+
+        def upstream():
+            try:
+                while True:
+                    yield 'fragment'
+                    time.sleep(0.01)
+            finally:
+                closed.set()
+
+        first = streams.subscribe('clé', upstream)
+        second = streams.subscribe('clé', upstream)
+        assert next(first) == 'fragment'
+        first.close()
+        # Un abonné reste : le flux amont continue
+        assert next(second) == 'fragment'
+        assert not closed.is_set()
+
+        second.close()
+        assert closed.wait(5)
+        assert streams.stats()['abandoned'] == 1
+        assert streams.stats()['in_flight'] == 0
+
+    def test_abandoned_stream_is_not_rejoined(self):
+        streams = SharedStreams(idle_timeout=5)
+        calls = []
+
+        def upstream():
+            calls.append(1)
+            yield 'début'
+            time.sleep(0.05)
+            yield 'fin'
+
+        abandoned = streams.subscribe('clé', upstream)
+        assert next(abandoned) == 'début'
+        abandoned.close()
+
+        # Le flux tronqué ne sert plus : un nouvel abonné reçoit une réponse complète
+        assert list(streams.subscribe('clé', upstream)) == ['début', 'fin']
+        assert len(calls) == 2
+
+    def test_producers_run_on_a_bounded_pool(self):
+        streams = SharedStreams(idle_timeout=0.1, max_workers=1)
+        release = threading.Event()
+        started = []
+
+        def blocking():
+            release.wait(5)
+            yield 'lent'
+
+        def queued():
+            started.append(1)
+            yield 'jamais lu'
+
+        busy = streams.subscribe('lent', blocking)
+        chunks = list(streams.subscribe('autre', queued))
+        release.set()
+
+        # Aucun thread libre avant le délai : l'abonné abandonne, le flux en attente n'est jamais lancé
+        assert chunks[0].startswith(STREAM_ERROR_PREFIX)
+        assert list(busy) == ['lent']
+        streams.executor.shutdown(wait=True)
+        assert started == []
@@ -0,0 +1,151 @@
+import pytest
+
+from src.infrastructure.openai_client import OpenAIClient
+from src.infrastructure.response_cache import ResponseCache
+from src.infrastructure.token_usage import (BudgetExceededError, UsageTracker, blended_price, estimate_tokens,
+                                            request_cost, usage_from_response)
+
+
+@pytest.fixture(autouse=True)
+def no_budgets(monkeypatch):
+    for name in ('DAILY_BUDGET_USD', 'OPENAI_DAILY_BUDGET_USD', 'ANTHROPIC_DAILY_BUDGET_USD',
+                 'GROQ_DAILY_BUDGET_USD'):
+        monkeypatch.delenv(name, raising=False)
+
+
+class SDKUsage:
+    def __init__(self, **counts):
+        self.__dict__.update(counts)
+
+
+class TestPricing:
+    def test_request_cost(self):
+        # gpt-4o : 2,50 $ par million de tokens en entrée, 10 $ en sortie
+        assert request_cost('gpt-4o', 1_000_000, 0) == pytest.approx(2.50)
+        assert request_cost('gpt-4o', 2000, 500) == pytest.approx(0.01)
+        assert blended_price('gpt-4o') == pytest.approx(6.25)
+
+    def test_unknown_model_is_not_free(self):
+        assert request_cost('modele-inconnu', 1000, 1000) is None
+        assert blended_price('modele-inconnu') is None
+
+    def test_usage_from_response(self):
+        assert usage_from_response({'prompt_tokens': 12, 'completion_tokens': 30}) == \
+            {'prompt_tokens': 12, 'completion_tokens': 30}
+        assert usage_from_response(SDKUsage(input_tokens=8, output_tokens=3)) == \
+            {'prompt_tokens': 8, 'completion_tokens': 3}
+        assert usage_from_response(SDKUsage(output_tokens=3)) == {'prompt_tokens': 0, 'completion_tokens': 3}
+        assert usage_from_response(None) is None
+        assert usage_from_response({}) is None
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens('') == 0
+        assert estimate_tokens(None) == 0
+        assert estimate_tokens('x') >= 1
+        assert 15 <= estimate_tokens('Bonjour, comment allez-vous ? ' * 4) <= 45
+
+
+class TestUsageTracker:
+    def test_record_accumulates_spending(self):
+        tracker = UsageTracker()
+        usage = tracker.record('openai', 'gpt-4o', 2000, 500)
+
+        assert usage == {'prompt_tokens': 2000, 'completion_tokens': 500, 'total_tokens': 2500,
+                         'cost': pytest.approx(0.01), 'estimated': False}
+        tracker.record('groq', 'llama3-8b-8192', 1_000_000, 0)
+        stats = tracker.stats()
+        assert stats['spent'] == pytest.approx(0.06)
+        assert stats['providers']['openai']['spent'] == pytest.approx(0.01)
+        assert stats['daily_budget'] is None
+
+    def test_provider_budget(self, monkeypatch):
+        monkeypatch.setenv('OPENAI_DAILY_BUDGET_USD', '0.015')
+        tracker = UsageTracker()
+        tracker.check('openai', 'gpt-4o')
+        tracker.record('openai', 'gpt-4o', 2000, 500)
+        assert tracker.within_budget('openai')
+        tracker.record('openai', 'gpt-4o', 2000, 500)
+
+        with pytest.raises(BudgetExceededError):
+            tracker.check('openai', 'gpt-4o')
+        # Les autres fournisseurs ne sont pas concernés
+        tracker.check('groq', 'llama3-8b-8192')
+        assert tracker.stats()['providers']['openai'] == {'spent': pytest.approx(0.02), 'budget': 0.015,
+                                                          'within_budget': False}
+
+    def test_global_budget_and_seed(self):
+        tracker = UsageTracker(daily_budget=1.0)
+        tracker.seed({'openai': 0.6, 'claude': None})
+        assert tracker.within_budget('groq')
+        tracker.seed({'claude': 0.4})
+        assert not tracker.within_budget('groq')
+
+    def test_unpriced_model_is_reported_and_refused_under_budget(self):
+        unbounded = UsageTracker()
+        usage = unbounded.record('groq', 'nouveau-modele', 100, 50)
+        assert usage['cost'] is None
+        assert usage['unpriced']
+        assert unbounded.stats()['unpriced_models'] == {'nouveau-modele': 1}
+        unbounded.check('groq', 'nouveau-modele')
+
+        with pytest.raises(BudgetExceededError, match='Tarif inconnu'):
+            UsageTracker(daily_budget=10).check('groq', 'nouveau-modele')
+
+    def test_record_response_estimates_missing_usage(self):
+        tracker = UsageTracker()
+        reported = tracker.record_response('claude', 'claude-3-5-sonnet-20241022',
+                                           SDKUsage(input_tokens=10, output_tokens=20), 'prompt', 'texte')
+        assert reported['prompt_tokens'] == 10 and not reported['estimated']
+
+        estimated = tracker.record_response('groq', 'llama3-8b-8192', None, 'x' * 40, 'y' * 80)
+        assert estimated['estimated']
+        assert estimated['completion_tokens'] == estimate_tokens('y' * 80)
+
+
+class TestOpenAIClientAccounting:
+    def test_generate_reports_api_usage(self, mock_llm):
+        tracker = UsageTracker()
+        client = OpenAIClient(usage=tracker)
+
+        result = client.generate_with_usage('Bonjour', model='gpt-4o', use_cache=False)
+
+        assert result['error'] is None
+        usage = result['usage']
+        # Comptes fournis par l'API (serveur factice : 12 mots générés)
+        assert usage['completion_tokens'] == 12
+        assert usage['prompt_tokens'] > 0
+        assert not usage['estimated']
+        assert usage['cost'] == pytest.approx(request_cost('gpt-4o', usage['prompt_tokens'], 12))
+        assert tracker.stats()['providers']['openai']['spent'] == pytest.approx(usage['cost'], abs=1e-6)
+
+    def test_cached_answer_costs_nothing(self, mock_llm, monkeypatch):
+        monkeypatch.delenv('RESPONSE_CACHE_PATH', raising=False)
+        tracker = UsageTracker()
+        client = OpenAIClient(cache=ResponseCache(max_entries=10), usage=tracker)
+
+        first = client.generate_with_usage('Bonjour', model='gpt-4o')
+        second = client.generate_with_usage('Bonjour', model='gpt-4o')
+
+        assert second['text'] == first['text']
+        assert second['usage']['cached']
+        assert second['usage']['cost'] == 0.0
+        assert tracker.stats()['spent'] == pytest.approx(first['usage']['cost'], abs=1e-6)
+
+    def test_stream_reports_usage_at_the_end(self, mock_llm):
+        tracker = UsageTracker()
+        client = OpenAIClient(usage=tracker)
+        reported = []
+
+        chunks = list(client.generate_streaming_response('Bonjour', model='gpt-4o', on_usage=reported.append))
+
+        assert chunks and not chunks[0].startswith('Erreur')
+        assert len(reported) == 1
+        assert reported[0]['completion_tokens'] == 12
+        assert not reported[0]['estimated']
+
+    def test_exhausted_budget_skips_the_call(self, mock_llm):
+        tracker = UsageTracker(daily_budget=0.001)
+        tracker.seed({'openai': 0.001})
+        result = OpenAIClient(usage=tracker).generate_with_usage('Bonjour', use_cache=False)
+        assert result['text'] is None
+        assert 'Budget quotidien épuisé' in result['error']
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.infrastructure.write_behind import WriteBehindQueue, fcntl
+
+
+def record(prompt):
+    return {'prompt': prompt, 'endpoint': '/api/test',
+            'responses': [{'provider': 'openai', 'model': 'gpt-4o', 'response_text': f'Réponse à {prompt}'}]}
+
+
+class FailingDatabase:
+    """Base en panne : chaque écriture échoue."""
+
+    def __init__(self, directory):
+        self.db_path = os.path.join(directory, 'conversations.db')
+
+    def save_conversations_batch(self, records):
+        raise OSError("base indisponible")
+
+
+class BlockedDatabase:
+    """Base dont les écritures attendent un signal, pour remplir la file."""
+
+    def __init__(self, directory):
+        self.db_path = os.path.join(directory, 'conversations.db')
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.records = []
+
+    def save_conversations_batch(self, records):
+        self.started.set()
+        self.release.wait(5)
+        self.records.extend(records)
+        return list(range(len(records)))
+
+
+def prompts(db):
+    return sorted(item['prompt'] for item in db.get_conversation_history(limit=100))
+
+
+def test_records_are_written_in_batches(db):
+    queue = WriteBehindQueue(db, batch_size=10, flush_interval=0.05)
+    for index in range(25):
+        assert queue.submit(record(f'Prompt {index:02d}'))
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    assert prompts(db) == [f'Prompt {index:02d}' for index in range(25)]
+    assert queue.stats()['written'] == 25
+
+
+def test_failed_batch_is_spilled_then_replayed(db, tmp_path):
+    spill_path = str(tmp_path / 'spill.jsonl')
+    failing = WriteBehindQueue(FailingDatabase(str(tmp_path)), flush_interval=0.01, spill_path=spill_path)
+    failing.submit(record('Perdu ?'))
+    failing.close()
+
+    # Le rejeu qui suit échoue aussi : le lot est redéversé, une seule fois, et le rejeu repoussé
+    assert failing.stats()['errors'] >= 1
+    assert failing._replay_after > 0
+    with open(spill_path, encoding='utf-8') as f:
+        assert [json.loads(line)['prompt'] for line in f] == ['Perdu ?']
+
+    # Au démarrage suivant, le débordement est réinjecté en base
+    replaying = WriteBehindQueue(db, flush_interval=0.01, spill_path=spill_path)
+    assert replaying.flush(timeout=5)
+    replaying.close()
+    assert prompts(db) == ['Perdu ?']
+    assert not os.path.exists(spill_path)
+    assert not os.path.exists(spill_path + '.replay')
+
+
+def test_unreadable_spill_line_is_quarantined(db, tmp_path):
+    spill_path = str(tmp_path / 'spill.jsonl')
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record('Valide')) + '\n')
+        # Dernière ligne tronquée par un arrêt brutal pendant le débordement
+        f.write(json.dumps(record('Tronquée'))[:20])
+
+    queue = WriteBehindQueue(db, flush_interval=0.01, spill_path=spill_path)
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    assert prompts(db) == ['Valide']
+    assert queue.stats()['quarantined'] == 1
+    with open(spill_path + '.bad', encoding='utf-8') as f:
+        assert f.read().startswith('{"prompt": "Tronqu')
+
+
+def test_rejected_record_does_not_block_its_batch(db, tmp_path):
+    spill_path = str(tmp_path / 'spill.jsonl')
+    invalid = {'endpoint': '/api/test', 'responses': []}
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        for item in (record('Avant'), invalid, record('Après')):
+            f.write(json.dumps(item) + '\n')
+
+    queue = WriteBehindQueue(db, flush_interval=0.01, spill_path=spill_path)
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    # Lot repris enregistrement par enregistrement : seul l'enregistrement sans prompt est mis de côté
+    assert prompts(db) == ['Après', 'Avant']
+    assert queue.stats()['quarantined'] == 1
+    with open(spill_path + '.bad', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [invalid]
+    assert not os.path.exists(spill_path)
+
+
+@pytest.mark.skipif(fcntl is None, reason="verrous de fichier indisponibles")
+def test_replay_is_skipped_while_another_process_replays(db, tmp_path):
+    spill_path = str(tmp_path / 'spill.jsonl')
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record('Débordé')) + '\n')
+
+    # Verrou de rejeu tenu par un autre worker (descripteur distinct, comme un autre processus)
+    with open(spill_path + '.replay.lock', 'a') as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        queue = WriteBehindQueue(db, flush_interval=0.01, spill_path=spill_path)
+        assert queue.flush(timeout=5)
+        assert prompts(db) == []
+        assert os.path.exists(spill_path)
+        fcntl.flock(other, fcntl.LOCK_UN)
+
+    # Verrou libéré : le passage suivant rejoue le débordement
+    queue.submit(record('Nouveau'))
+    assert queue.flush(timeout=5)
+    assert queue.flush(timeout=5)
+    queue.close()
+    assert prompts(db) == ['Débordé', 'Nouveau']
+
+
+def test_interrupted_replay_is_resumed(db, tmp_path):
+    spill_path = str(tmp_path / 'spill.jsonl')
+    with open(spill_path + '.replay', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record('Rejeu interrompu')) + '\n')
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record('Débordement courant')) + '\n')
+
+    queue = WriteBehindQueue(db, flush_interval=0.01, spill_path=spill_path)
+    # Le fichier courant est rejoué au passage suivant, une fois la file vide
+    assert queue.flush(timeout=5)
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    assert prompts(db) == ['Débordement courant', 'Rejeu interrompu']
+
+
+@pytest.mark.parametrize('policy, expected', [('spill', 'spilled'), ('drop', 'dropped')])
+def test_full_queue_policy(tmp_path, policy, expected):
+    database = BlockedDatabase(str(tmp_path))
+    queue = WriteBehindQueue(database, max_size=1, batch_size=1, flush_interval=0.01, policy=policy,
+                             spill_path=str(tmp_path / 'spill.jsonl'))
+    queue.submit(record('En cours'))
+    assert database.started.wait(5)
+    queue.submit(record('En file'))
+
+    accepted = queue.submit(record('De trop'))
+    assert accepted is (policy == 'spill')
+    assert queue.stats()[expected] == 1
+
+    database.release.set()
+    queue.close()
+    assert [item['prompt'] for item in database.records][:2] == ['En cours', 'En file']
+
+
+def test_unknown_policy_is_rejected(db):
+    with pytest.raises(ValueError):
+        WriteBehindQueue(db, policy='ignore')